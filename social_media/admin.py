@@ -4,9 +4,11 @@ from social_media.models import (
     Commentary,
     Profile,
     Post,
+    Tag,
 )
 
 
 admin.site.register(Commentary)
 admin.site.register(Profile)
 admin.site.register(Post)
+admin.site.register(Tag)
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class SocialMediaConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "social_media"
+
+    def ready(self) -> None:
+        import social_media.signals  # noqa: F401
+        # wrap connections for query counting from the first one opened
+        import social_media_api.query_metrics  # noqa: F401
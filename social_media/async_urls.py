@@ -0,0 +1,18 @@
+from django.urls import path
+
+from social_media.async_views import (
+    comment_list,
+    followed_posts,
+    post_detail,
+    post_list,
+)
+
+
+urlpatterns = [
+    path("posts/", post_list, name="post-list"),
+    path("posts/<int:pk>/", post_detail, name="post-detail"),
+    path("posts/<int:pk>/comments/", comment_list, name="post-comment"),
+    path("posts/followed-posts/", followed_posts, name="followed-posts"),
+]
+
+app_name = "social-async"
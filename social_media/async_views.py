@@ -0,0 +1,210 @@
+"""Async versions of the hot read endpoints
+
+Plain Django async views: under ASGI they wait on the database without
+holding a worker thread. Responses match the DRF endpoints except for
+pagination, which is keyset based and only links forward
+(``previous`` is always null). They pass the same throttles as the DRF
+views, and the post detail shares its cache entry with the DRF one.
+"""
+import base64
+import binascii
+import functools
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Q, QuerySet
+from django.http import HttpResponse
+from rest_framework.exceptions import (
+    APIException,
+    MethodNotAllowed,
+    NotAuthenticated,
+    NotFound,
+    Throttled,
+)
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+from social_media import cache, fast_serializers, timeline
+from social_media.fast_serializers import FastListSerializer
+from social_media.pagination import post_position_field
+from social_media.models import Commentary, Post
+from social_media.serializers import PostDetailSerializer
+from social_media.views import filter_posts
+from user.authentication import ClaimsJWTAuthentication
+
+
+CURSOR_QUERY_PARAM = "cursor"
+PAGE_SIZE_QUERY_PARAM = "page_size"
+
+
+def json_response(data, status: int = 200, headers=None) -> HttpResponse:
+    return HttpResponse(
+        JSONRenderer().render(data),
+        content_type="application/json",
+        status=status,
+        headers=headers,
+    )
+
+
+def authenticate(request):
+    authentication = ClaimsJWTAuthentication()
+    result = authentication.authenticate(request)
+    if result is None:
+        raise NotAuthenticated
+    return result[0]
+
+
+def check_throttles(request, view) -> None:
+    """Run the throttles of the DRF views, as APIView.check_throttles does"""
+    waits = []
+    for throttle_class in api_settings.DEFAULT_THROTTLE_CLASSES:
+        throttle = throttle_class()
+        if not throttle.allow_request(request, view):
+            waits.append(throttle.wait())
+    if waits:
+        known = [wait for wait in waits if wait is not None]
+        raise Throttled(max(known) if known else None)
+
+
+def async_api_view(view):
+    """Authenticate and throttle a GET-only async view like the DRF views,
+    render API errors as JSON"""
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs) -> HttpResponse:
+        try:
+            if request.method != "GET":
+                raise MethodNotAllowed(request.method)
+            request.user = await sync_to_async(authenticate)(request)
+            await sync_to_async(check_throttles)(request, view)
+            return await view(request, *args, **kwargs)
+        except APIException as exc:
+            headers = None
+            if exc.status_code == 401:
+                headers = {
+                    "WWW-Authenticate":
+                        ClaimsJWTAuthentication().authenticate_header(request)
+                }
+            elif getattr(exc, "wait", None) is not None:
+                headers = {"Retry-After": str(exc.wait)}
+            data = (exc.detail if isinstance(exc.detail, (list, dict))
+                    else {"detail": exc.detail})
+            return json_response(data, exc.status_code, headers)
+
+    return wrapper
+
+
+def get_page_size(request) -> int:
+    try:
+        size = int(request.GET[PAGE_SIZE_QUERY_PARAM])
+    except (KeyError, ValueError):
+        return settings.REST_FRAMEWORK["PAGE_SIZE"]
+    if size <= 0:
+        return settings.REST_FRAMEWORK["PAGE_SIZE"]
+    return min(size, settings.MAX_PAGE_SIZE)
+
+
+def encode_cursor(created_at: datetime, pk: int) -> str:
+    position = f"{created_at.isoformat()}|{pk}"
+    return base64.urlsafe_b64encode(position.encode()).decode()
+
+
+def decode_cursor(request) -> tuple[datetime, int] | None:
+    encoded = request.GET.get(CURSOR_QUERY_PARAM)
+    if not encoded:
+        return None
+    try:
+        created_at, pk = (base64.urlsafe_b64decode(encoded.encode())
+                          .decode().split("|"))
+        return datetime.fromisoformat(created_at), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise NotFound("Invalid cursor")
+
+
+async def keyset_page(request, queryset: QuerySet, fast: FastListSerializer,
+                      newest_first: bool = True) -> dict:
+    """One page of rows ordered by (created_at, id) after the cursor
+
+    Tag-filtered post lists are ordered by the equal PostTag.created_at.
+    """
+    field = post_position_field(queryset)
+    size = get_page_size(request)
+    position = decode_cursor(request)
+    if position is not None:
+        created_at, pk = position
+        lookup = "lt" if newest_first else "gt"
+        queryset = queryset.filter(
+            Q(**{f"{field}__{lookup}": created_at})
+            | Q(**{field: created_at, f"id__{lookup}": pk})
+        )
+    ordering = (f"-{field}", "-id") if newest_first else (field, "id")
+    rows = [
+        row async for row in
+        fast.values(queryset.order_by(*ordering))[:size + 1]
+    ]
+
+    next_url = None
+    if len(rows) > size:
+        rows = rows[:size]
+        next_url = replace_query_param(
+            request.build_absolute_uri(),
+            CURSOR_QUERY_PARAM,
+            encode_cursor(rows[-1][field], rows[-1]["id"]),
+        )
+    return {
+        "next": next_url,
+        "previous": None,
+        "results": fast.serialize(rows, request),
+    }
+
+
+@async_api_view
+async def post_list(request) -> HttpResponse:
+    """Posts of all users, newest first"""
+    async def build() -> dict:
+        posts = await sync_to_async(filter_posts)(
+            Post.objects.all(), request.GET
+        )
+        return await keyset_page(request, posts, fast_serializers.POSTS)
+
+    key = await cache.apost_list_key(request.get_full_path())
+    data, hit = await cache.acached_data(
+        key, request, build, timeout=settings.RESPONSE_CACHE["LIST_TIMEOUT"]
+    )
+    return json_response(data, headers={"X-Cache": "HIT" if hit else "MISS"})
+
+
+@async_api_view
+async def post_detail(request, pk: int) -> HttpResponse:
+    """Single post with its newest comments"""
+    async def build() -> dict:
+        try:
+            post = await Post.objects.for_detail().aget(pk=pk)
+        except Post.DoesNotExist:
+            raise NotFound
+        return PostDetailSerializer(post, context={"request": request}).data
+
+    # same key and data as the DRF post detail, either fills it for both
+    data, hit = await cache.acached_data(cache.post_key(pk), request, build)
+    return json_response(data, headers={"X-Cache": "HIT" if hit else "MISS"})
+
+
+@async_api_view
+async def comment_list(request, pk: int) -> HttpResponse:
+    """Comments of a post, oldest first"""
+    comments = Commentary.objects.filter(post_id=pk)
+    data = await keyset_page(
+        request, comments, fast_serializers.COMMENTS, newest_first=False
+    )
+    return json_response(data)
+
+
+@async_api_view
+async def followed_posts(request) -> HttpResponse:
+    """Posts by users followed by you, newest first"""
+    profile = await sync_to_async(getattr)(request.user, "profile")
+    followed = await sync_to_async(timeline.followed_posts_filter)(profile)
+    posts = Post.objects.filter(followed)
+    data = await keyset_page(request, posts, fast_serializers.POSTS)
+    return json_response(data)
@@ -0,0 +1,197 @@
+from contextlib import nullcontext
+from typing import Awaitable, Callable, Iterable
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.response import Response
+
+from social_media_api import db_router
+
+
+HITS_KEY = "response-cache:hits"
+MISSES_KEY = "response-cache:misses"
+POST_LIST_VERSION_KEY = "response-cache:post-list-version"
+POST_LIST_PREFIX = "response-cache:post-list:"
+POST_LIST_INVALIDATED_KEY = "response-cache:post-list-invalidated"
+# sites kept per entry before it starts over, bounds entries when any
+# host name is allowed
+MAX_SITES = 4
+
+
+def get_cache():
+    return caches[settings.RESPONSE_CACHE["ALIAS"]]
+
+
+def post_key(pk) -> str:
+    return f"response-cache:post:{pk}"
+
+
+def profile_key(pk) -> str:
+    return f"response-cache:profile:{pk}"
+
+
+def post_list_key(full_path: str) -> str:
+    version = get_cache().get_or_set(POST_LIST_VERSION_KEY, 1, None)
+    return f"{POST_LIST_PREFIX}{version}:{full_path}"
+
+
+async def apost_list_key(full_path: str) -> str:
+    version = await get_cache().aget_or_set(POST_LIST_VERSION_KEY, 1, None)
+    return f"{POST_LIST_PREFIX}{version}:{full_path}"
+
+
+def invalidated_key(key: str) -> str:
+    """Marker set for a while after the entry under key was dropped"""
+    if key.startswith(POST_LIST_PREFIX):
+        return POST_LIST_INVALIDATED_KEY
+    return f"{key}:invalidated"
+
+
+def _refill_reads(invalidated: bool):
+    # a replica may not have the change behind a fresh invalidation yet,
+    # refilling from it would cache the old rows for the whole timeout
+    return db_router.primary_reads() if invalidated else nullcontext()
+
+
+def site(request) -> str:
+    """Scheme and host the absolute URLs in a response are built from"""
+    return request.build_absolute_uri("/")
+
+
+def _with_site(entry: dict | None, request, data) -> dict:
+    entry = dict(entry or {})
+    if len(entry) >= MAX_SITES:
+        entry = {}
+    entry[site(request)] = data
+    return entry
+
+
+def _count(key: str) -> None:
+    cache = get_cache()
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def cached_response(key: str, request, build: Callable[[], Response],
+                    timeout: int | None = None) -> Response:
+    """Serve response data stored under key, or build and store it
+
+    Entries hold the data per site, payloads carry absolute URLs built
+    from the host of the request.
+    """
+    cache = get_cache()
+    entry = cache.get(key)
+    data = entry.get(site(request)) if entry else None
+    if data is not None:
+        _count(HITS_KEY)
+        return Response(data, headers={"X-Cache": "HIT"})
+
+    _count(MISSES_KEY)
+    with _refill_reads(cache.get(invalidated_key(key), False)):
+        response = build()
+    if response.status_code == 200:
+        cache.set(
+            key,
+            _with_site(entry, request, response.data),
+            timeout or settings.RESPONSE_CACHE["TIMEOUT"],
+        )
+    response["X-Cache"] = "MISS"
+    return response
+
+
+async def _acount(key: str) -> None:
+    cache = get_cache()
+    await cache.aadd(key, 0, None)
+    try:
+        await cache.aincr(key)
+    except ValueError:
+        await cache.aset(key, 1, None)
+
+
+async def acached_data(key: str, request, build: Callable[[], Awaitable],
+                       timeout: int | None = None) -> tuple[object, bool]:
+    """Async twin of cached_response: stored data and whether it was a hit
+
+    Entries are shared with the sync views, both store the same data.
+    """
+    cache = get_cache()
+    entry = await cache.aget(key)
+    data = entry.get(site(request)) if entry else None
+    if data is not None:
+        await _acount(HITS_KEY)
+        return data, True
+
+    await _acount(MISSES_KEY)
+    invalidated = await cache.aget(invalidated_key(key), False)
+    with _refill_reads(invalidated):
+        data = await build()
+    await cache.aset(
+        key,
+        _with_site(entry, request, data),
+        timeout or settings.RESPONSE_CACHE["TIMEOUT"],
+    )
+    return data, False
+
+
+def stats() -> dict:
+    cache = get_cache()
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / total, 4) if total else None,
+    }
+
+
+def _after_commit(func: Callable[[], None]) -> None:
+    # invalidate once the change is visible, so a concurrent reader
+    # cannot re-cache the old rows between delete and commit
+    transaction.on_commit(func)
+
+
+def _mark_invalidated(markers: list[str]) -> None:
+    """Make refills read the primary until replicas caught up"""
+    if db_router.replica_aliases():
+        get_cache().set_many(
+            dict.fromkeys(markers, True),
+            settings.REPLICA_ROUTING["STICKY_SECONDS"],
+        )
+
+
+def invalidate_posts(pks: Iterable, lists: bool = True) -> None:
+    """Drop cached post details, and post list pages unless not lists
+
+    Likes and comments only move counters, list pages show those up to
+    RESPONSE_CACHE["LIST_TIMEOUT"] late instead of all being dropped.
+    """
+    keys = [post_key(pk) for pk in pks]
+
+    def invalidate() -> None:
+        cache = get_cache()
+        cache.delete_many(keys)
+        markers = [invalidated_key(key) for key in keys]
+        if lists:
+            try:
+                cache.incr(POST_LIST_VERSION_KEY)
+            except ValueError:
+                cache.set(POST_LIST_VERSION_KEY, 2, None)
+            markers.append(POST_LIST_INVALIDATED_KEY)
+        _mark_invalidated(markers)
+
+    _after_commit(invalidate)
+
+
+def invalidate_profiles(pks: Iterable) -> None:
+    keys = [profile_key(pk) for pk in pks]
+
+    def invalidate() -> None:
+        get_cache().delete_many(keys)
+        _mark_invalidated([invalidated_key(key) for key in keys])
+
+    _after_commit(invalidate)
@@ -0,0 +1,141 @@
+import csv
+import json
+from typing import Callable, Iterable, Iterator
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, QuerySet
+
+from social_media.models import Commentary, Post, Profile
+
+
+PostLike = Profile.likes.through
+Follow = Profile.follows.through
+
+# rows joined into one chunk of the streamed response
+BUFFER_SIZE = 64 * 1024
+
+
+def profile_rows(profile_id: int) -> QuerySet:
+    return Profile.objects.filter(pk=profile_id).values(
+        "id",
+        "username",
+        "first_name",
+        "last_name",
+        "contacts",
+        "location",
+        "bio",
+    )
+
+
+def post_rows(profile_id: int) -> QuerySet:
+    return (Post.objects.filter(posted_by_id=profile_id)
+            .order_by("-created_at", "-id")
+            .values("id", "created_at", "body", "tags", "attachment"))
+
+
+def comment_rows(profile_id: int) -> QuerySet:
+    return (Commentary.objects.filter(user_id=profile_id)
+            .order_by("id")
+            .values("id", "post_id", "created_at", "body"))
+
+
+def like_rows(profile_id: int) -> QuerySet:
+    return (PostLike.objects.filter(profile_id=profile_id)
+            .order_by("post_id")
+            .values("post_id"))
+
+
+def following_rows(profile_id: int) -> QuerySet:
+    return (Follow.objects.filter(from_profile_id=profile_id)
+            .order_by("to_profile_id")
+            .values(profile_id=F("to_profile_id"),
+                    username=F("to_profile__username")))
+
+
+def follower_rows(profile_id: int) -> QuerySet:
+    return (Follow.objects.filter(to_profile_id=profile_id)
+            .order_by()
+            .values(profile_id=F("from_profile_id"),
+                    username=F("from_profile__username")))
+
+
+# record type and the rows of one profile exported under it
+SECTIONS: dict[str, Callable[[int], QuerySet]] = {
+    "profile": profile_rows,
+    "post": post_rows,
+    "comment": comment_rows,
+    "like": like_rows,
+    "following": following_rows,
+    "follower": follower_rows,
+}
+
+CSV_FIELDS = (
+    "type",
+    "id",
+    "username",
+    "first_name",
+    "last_name",
+    "contacts",
+    "location",
+    "bio",
+    "created_at",
+    "post_id",
+    "profile_id",
+    "body",
+    "tags",
+    "attachment",
+)
+
+
+def records(profile_id: int, chunk_size: int = 2000) -> Iterator[dict]:
+    """Every exported row of a profile, read through server-side cursors"""
+    for kind, rows in SECTIONS.items():
+        for row in rows(profile_id).iterator(chunk_size=chunk_size):
+            yield {"type": kind, **row}
+
+
+def ndjson_lines(rows: Iterable[dict]) -> Iterator[str]:
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + "\n"
+
+
+class _Echo:
+    """File-like object handing what csv.writer writes straight back"""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def csv_lines(rows: Iterable[dict]) -> Iterator[str]:
+    writer = csv.DictWriter(_Echo(), fieldnames=CSV_FIELDS, restval="")
+    yield writer.writeheader()
+    for row in rows:
+        yield writer.writerow(row)
+
+
+FORMATS = {
+    "ndjson": ("application/x-ndjson", ndjson_lines),
+    "csv": ("text/csv", csv_lines),
+}
+
+
+def buffered(lines: Iterable[str]) -> Iterator[str]:
+    """Join lines into chunks of about BUFFER_SIZE characters"""
+    chunk = []
+    size = 0
+    for line in lines:
+        chunk.append(line)
+        size += len(line)
+        if size >= BUFFER_SIZE:
+            yield "".join(chunk)
+            chunk = []
+            size = 0
+    if chunk:
+        yield "".join(chunk)
+
+
+def stream(profile_id: int, output: str,
+           chunk_size: int = 2000) -> Iterator[str]:
+    """Export of a profile in the given format, chunk by chunk"""
+    _, render = FORMATS[output]
+    return buffered(render(records(profile_id, chunk_size)))
@@ -0,0 +1,147 @@
+from typing import Callable, Iterable
+
+from django.conf import settings
+from django.db.models import QuerySet
+from django.utils import timezone
+from rest_framework import ISO_8601
+from rest_framework.settings import api_settings
+
+from social_media import images
+from social_media.models import Post, Profile
+
+
+class FastListSerializer:
+    """Read-only list serializer over ``.values()`` rows
+
+    Renders the same output as the matching ModelSerializer without
+    building model instances or walking DRF fields for every row.
+    """
+
+    def __init__(self, fields: dict[str, tuple[str, str]]) -> None:
+        self.fields = fields
+        self.sources = tuple(source for source, _ in fields.values())
+
+    def related(self, prefix: str) -> "FastListSerializer":
+        """The same output read through a relation of another model's rows"""
+        return FastListSerializer({
+            name: (f"{prefix}__{source}", kind)
+            for name, (source, kind) in self.fields.items()
+        })
+
+    def values(self, queryset: QuerySet) -> QuerySet:
+        # annotations stay in the rows, cursor pagination may page on them
+        return queryset.values(*self.sources, *queryset.query.annotations)
+
+    def serialize(self, rows: Iterable[dict], request=None) -> list[dict]:
+        accessors = [
+            (name, source, self._converter(kind, source, request))
+            for name, (source, kind) in self.fields.items()
+        ]
+        return [
+            {
+                name: None if row[source] is None else convert(row[source])
+                for name, source, convert in accessors
+            }
+            for row in rows
+        ]
+
+    def _converter(self, kind: str, source: str, request) -> Callable:
+        if kind == "str":
+            return str
+        if kind == "int":
+            return int
+        if kind == "datetime":
+            return datetime_converter()
+        if kind == "file":
+            return file_converter(self.storage_for(source), request)
+        if kind == "variants":
+            return variants_converter(self.storage_for(source), request)
+        raise ValueError(f"unknown field kind {kind!r}")
+
+    @staticmethod
+    def storage_for(source: str):
+        model, field = FILE_FIELDS[source.rsplit("__", 1)[-1]]
+        return model._meta.get_field(field).storage
+
+
+def datetime_converter() -> Callable:
+    output_format = api_settings.DATETIME_FORMAT
+    current_timezone = (timezone.get_current_timezone()
+                        if settings.USE_TZ else None)
+
+    def convert(value):
+        if output_format is None:
+            return value
+        if current_timezone is not None:
+            if timezone.is_aware(value):
+                value = value.astimezone(current_timezone)
+            else:
+                value = timezone.make_aware(value, current_timezone)
+        if output_format.lower() == ISO_8601:
+            value = value.isoformat()
+            if value.endswith("+00:00"):
+                value = value[:-6] + "Z"
+            return value
+        return value.strftime(output_format)
+
+    return convert
+
+
+def file_converter(storage, request) -> Callable:
+    use_url = api_settings.UPLOADED_FILES_USE_URL
+
+    def convert(name):
+        if not name:
+            return None
+        if not use_url:
+            return name
+        url = storage.url(name)
+        return request.build_absolute_uri(url) if request is not None else url
+
+    return convert
+
+
+def variants_converter(storage, request) -> Callable:
+    def convert(variants):
+        return images.variant_urls(variants, storage, request)
+
+    return convert
+
+
+FILE_FIELDS = {
+    "attachment": (Post, "attachment"),
+    "attachment_variants": (Post, "attachment"),
+    "profile_picture": (Profile, "profile_picture"),
+    "picture_variants": (Profile, "profile_picture"),
+}
+
+POSTS = FastListSerializer({
+    "id": ("id", "int"),
+    "posted_by": ("posted_by__username", "str"),
+    "created_at": ("created_at", "datetime"),
+    "body": ("body", "str"),
+    "tags": ("tags", "str"),
+    "attachment": ("attachment", "file"),
+    "attachment_variants": ("attachment_variants", "variants"),
+    "likes": ("like_count", "int"),
+    "commented": ("comment_count", "int"),
+})
+
+COMMENTS = FastListSerializer({
+    "id": ("id", "int"),
+    "user": ("user__username", "str"),
+    "created_at": ("created_at", "datetime"),
+    "body": ("body", "str"),
+})
+
+PROFILES = FastListSerializer({
+    "id": ("id", "int"),
+    "username": ("username", "str"),
+    "first_name": ("first_name", "str"),
+    "last_name": ("last_name", "str"),
+    "contacts": ("contacts", "str"),
+    "location": ("location", "str"),
+    "bio": ("bio", "str"),
+    "profile_picture": ("profile_picture", "file"),
+    "picture_variants": ("picture_variants", "variants"),
+})
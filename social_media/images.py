@@ -0,0 +1,222 @@
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db.models import Model
+from PIL import Image, ImageOps
+
+from social_media import cache
+from social_media.models import Post, Profile
+from task_queue.registry import enqueue
+
+
+# model -> (image field, field holding its variants)
+IMAGE_FIELDS = {
+    Post: ("attachment", "attachment_variants"),
+    Profile: ("profile_picture", "picture_variants"),
+}
+
+ORIENTATION_TAG = 0x0112
+# metadata other than EXIF that Pillow reads into Image.info
+METADATA_KEYS = ("xmp", "XML:com.adobe.xmp", "comment")
+
+
+def _encode(image: Image.Image) -> tuple[bytes, str]:
+    buffer = BytesIO()
+    # nothing but pixels is written, so EXIF (camera, GPS) and other
+    # metadata of the upload does not reach the variants
+    if image.mode in ("RGBA", "LA", "P"):
+        image.save(buffer, "PNG", optimize=True)
+        return buffer.getvalue(), ".png"
+    image.convert("RGB").save(
+        buffer,
+        "JPEG",
+        quality=settings.IMAGE_PROCESSING["QUALITY"],
+        optimize=True,
+        progressive=True,
+    )
+    return buffer.getvalue(), ".jpg"
+
+
+def make_variants(storage, name: str) -> dict:
+    """Write resized copies of a stored image, return their names and sizes"""
+    sizes = sorted(
+        settings.IMAGE_PROCESSING["VARIANTS"].items(),
+        key=lambda item: item[1],
+        reverse=True,
+    )
+    root, _ = os.path.splitext(name)
+    with storage.open(name) as file, Image.open(file) as original:
+        width, height = original.size
+        if original.getexif().get(ORIENTATION_TAG) in (5, 6, 7, 8):
+            width, height = height, width
+        # let the JPEG decoder scale down while reading big uploads
+        original.draft("RGB", (sizes[0][1], sizes[0][1]))
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "RGBA", "L", "LA"):
+            image = image.convert(
+                "RGBA" if "transparency" in image.info else "RGB"
+            )
+
+        variants = {"source": name, "width": width, "height": height}
+        for variant, size in sizes:
+            # each smaller variant is scaled from the previous one
+            image = image.copy()
+            image.thumbnail((size, size), Image.Resampling.LANCZOS)
+            content, extension = _encode(image)
+            variants[variant] = {
+                "name": storage.save(
+                    f"{root}-{variant}{extension}", ContentFile(content)
+                ),
+                "width": image.width,
+                "height": image.height,
+            }
+    return variants
+
+
+def strip_metadata(file) -> ContentFile | None:
+    """Copy of an upload without EXIF (camera, GPS) or other metadata
+
+    The EXIF orientation is applied to the pixels. None when the upload
+    carries no metadata and can be stored as is. JPEG and WebP keep
+    their format, anything else is stored as PNG.
+    """
+    file.seek(0)
+    with Image.open(file) as original:
+        has_metadata = bool(original.getexif()) or any(
+            key in original.info for key in METADATA_KEYS
+        )
+        if not has_metadata:
+            file.seek(0)
+            return None
+        image_format = original.format
+        image = ImageOps.exif_transpose(original)
+
+    buffer = BytesIO()
+    # color profiles stay, PNG would copy EXIF over unless told not to
+    options = {"icc_profile": original.info.get("icc_profile"), "exif": b""}
+    if image_format == "JPEG":
+        image.convert("RGB").save(buffer, "JPEG", quality=95, **options)
+        extension = ".jpg"
+    elif image_format == "WEBP":
+        image.save(buffer, "WEBP", quality=95, **options)
+        extension = ".webp"
+    else:
+        image.save(buffer, "PNG", optimize=True, **options)
+        extension = ".png"
+    root, _ = os.path.splitext(os.path.basename(file.name))
+    return ContentFile(buffer.getvalue(), name=f"{root}{extension}")
+
+
+def strip_upload(instance: Model) -> None:
+    """Replace a not yet stored upload of instance by its stripped copy"""
+    field, _ = IMAGE_FIELDS[type(instance)]
+    upload = getattr(instance, field)
+    if not upload or upload._committed:
+        return
+    stripped = strip_metadata(upload)
+    if stripped is not None:
+        setattr(instance, field, stripped)
+
+
+def strip_stored(model: type[Model], pk: int) -> bool:
+    """Rewrite an image stored before uploads were stripped, True if it was
+
+    The variants were made from the same pixels and are kept.
+    """
+    field, variants_field = IMAGE_FIELDS[model]
+    row = model.objects.filter(pk=pk).values(field, variants_field).first()
+    if row is None or not row[field]:
+        return False
+    name, variants = row[field], row[variants_field]
+    storage = model._meta.get_field(field).storage
+    with storage.open(name) as file:
+        stripped = strip_metadata(file)
+    if stripped is None:
+        return False
+
+    directory = os.path.dirname(name)
+    new_name = storage.save(
+        os.path.join(directory, stripped.name), stripped
+    )
+    if variants.get("source") == name:
+        variants = {**variants, "source": new_name}
+    updated = model.objects.filter(pk=pk, **{field: name}).update(
+        **{field: new_name, variants_field: variants}
+    )
+    # the row got another image meanwhile, which was stripped on upload
+    storage.delete(name if updated else new_name)
+    if updated and model is Post:
+        cache.invalidate_posts([pk])
+    elif updated:
+        cache.invalidate_profiles([pk])
+    return bool(updated)
+
+
+def variant_urls(variants: dict, storage, request=None) -> dict | None:
+    """Public URLs and sizes of the processed variants, if there are any"""
+    if not variants:
+        return None
+    urls = {}
+    for variant in settings.IMAGE_PROCESSING["VARIANTS"]:
+        if variant not in variants:
+            continue
+        url = storage.url(variants[variant]["name"])
+        if request is not None:
+            url = request.build_absolute_uri(url)
+        urls[variant] = {
+            "url": url,
+            "width": variants[variant]["width"],
+            "height": variants[variant]["height"],
+        }
+    return urls
+
+
+def variant_names(variants: dict) -> list[str]:
+    return [
+        value["name"] for value in variants.values()
+        if isinstance(value, dict)
+    ]
+
+
+def process(model: type[Model], pk: int) -> None:
+    """Generate variants for the current image of one row"""
+    field, variants_field = IMAGE_FIELDS[model]
+    row = model.objects.filter(pk=pk).values(field, variants_field).first()
+    if row is None:
+        return
+    name, old = row[field] or "", row[variants_field]
+    if name == old.get("source", ""):
+        return
+
+    storage = model._meta.get_field(field).storage
+    variants = make_variants(storage, name) if name else {}
+    updated = model.objects.filter(pk=pk, **{field: name}).update(
+        **{variants_field: variants}
+    )
+    # the row got another image meanwhile, its own job takes over
+    stale = variant_names(old if updated else variants)
+    for stale_name in stale:
+        storage.delete(stale_name)
+
+    if updated and model is Post:
+        cache.invalidate_posts([pk])
+    elif updated:
+        cache.invalidate_profiles([pk])
+
+
+def schedule(instance: Model) -> None:
+    """Queue variant generation for the image of instance"""
+    enqueue(
+        "social_media.tasks.process_image",
+        args=(instance._meta.label_lower, instance.pk),
+    )
+
+
+def needs_processing(instance: Model, update_fields=None) -> bool:
+    field, variants_field = IMAGE_FIELDS[type(instance)]
+    if update_fields is not None and field not in update_fields:
+        return False
+    name = getattr(instance, field).name or ""
+    return name != getattr(instance, variants_field).get("source", "")
@@ -0,0 +1,140 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from social_media import fast_serializers
+from social_media.models import Commentary, Post, Profile
+from social_media.serializers import (
+    CommentarySerializer,
+    PostSerializer,
+    ProfileSerializer,
+)
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare list serialization through DRF serializers and the "
+        ".values() fast path on generated rows (rolled back afterwards)"
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--rows",
+            type=int,
+            nargs="+",
+            default=[1000, 10000, 100000],
+        )
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options) -> None:
+        self.stdout.write(
+            f"{'serializer':<22}{'rows':>8}{'drf, s':>10}"
+            f"{'fast, s':>10}{'speedup':>9}"
+        )
+        try:
+            with transaction.atomic():
+                self.seed(max(options["rows"]))
+                for rows in options["rows"]:
+                    self.compare(rows, options["repeat"])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, rows: int) -> None:
+        user = get_user_model().objects.create_user(
+            "benchmark-serializers@example.com"
+        )
+        profile = Profile.objects.create(
+            user=user, username="benchmark-serializers"
+        )
+        posts = Post.objects.bulk_create(
+            [
+                Post(posted_by=profile, body=f"post {i}", tags="bench")
+                for i in range(rows)
+            ],
+            batch_size=5000,
+        )
+        Commentary.objects.bulk_create(
+            [
+                Commentary(user=profile, post=posts[0], body=f"comment {i}")
+                for i in range(rows)
+            ],
+            batch_size=5000,
+        )
+        users = get_user_model().objects.bulk_create(
+            [
+                get_user_model()(email=f"benchmark-{i}@example.com")
+                for i in range(rows)
+            ],
+            batch_size=5000,
+        )
+        Profile.objects.bulk_create(
+            [
+                Profile(user=user, username=f"benchmark-{i}")
+                for i, user in enumerate(users)
+            ],
+            batch_size=5000,
+        )
+        self.profile = profile
+
+    def compare(self, rows: int, repeat: int) -> None:
+        cases = (
+            (
+                "PostSerializer",
+                Post.objects.select_related("posted_by")
+                .filter(posted_by=self.profile),
+                PostSerializer,
+                fast_serializers.POSTS,
+            ),
+            (
+                "CommentarySerializer",
+                Commentary.objects.select_related("user")
+                .filter(user=self.profile),
+                CommentarySerializer,
+                fast_serializers.COMMENTS,
+            ),
+            (
+                "ProfileSerializer",
+                Profile.objects.filter(username__startswith="benchmark-"),
+                ProfileSerializer,
+                fast_serializers.PROFILES,
+            ),
+        )
+        renderer = JSONRenderer()
+        for name, queryset, serializer_class, fast in cases:
+            queryset = queryset.order_by("id")[:rows]
+
+            def drf() -> bytes:
+                data = serializer_class(list(queryset), many=True).data
+                return renderer.render(data)
+
+            def values() -> bytes:
+                page = list(fast.values(queryset))
+                return renderer.render(fast.serialize(page))
+
+            drf_time, drf_output = self.measure(drf, repeat)
+            fast_time, fast_output = self.measure(values, repeat)
+            if drf_output != fast_output:
+                raise CommandError(f"{name}: fast path output differs")
+
+            self.stdout.write(
+                f"{name:<22}{rows:>8}{drf_time:>10.3f}"
+                f"{fast_time:>10.3f}{drf_time / fast_time:>8.1f}x"
+            )
+
+    @staticmethod
+    def measure(func, repeat: int) -> tuple[float, bytes]:
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            output = func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, output
@@ -0,0 +1,53 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from social_media import export
+from social_media.models import Profile
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream the profile, posts, comments, likes and follows of one "
+        "user as NDJSON or CSV"
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--user", required=True, help="Email of the user")
+        parser.add_argument(
+            "--output",
+            choices=list(export.FORMATS),
+            default="ndjson",
+        )
+        parser.add_argument(
+            "--file",
+            help="Write the export to this path instead of stdout",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Rows fetched per round trip of the server-side cursors",
+        )
+
+    def handle(self, *args, **options) -> None:
+        user = get_user_model().objects.filter(email=options["user"]).first()
+        if user is None:
+            raise CommandError(f"no user {options['user']}")
+        profile_id = (Profile.objects.filter(user=user)
+                      .values_list("id", flat=True).first())
+        if profile_id is None:
+            raise CommandError(f"user {options['user']} has no profile")
+
+        chunks = export.stream(
+            profile_id, options["output"], options["chunk_size"]
+        )
+        if not options["file"]:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
+            return
+
+        with open(options["file"], "w", newline="", encoding="utf-8") as file:
+            file.writelines(chunks)
+        self.stderr.write(self.style.SUCCESS(
+            f"exported user {options['user']} to {options['file']}"
+        ))
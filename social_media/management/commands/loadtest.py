@@ -0,0 +1,126 @@
+import http.client
+import statistics
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+
+
+DEFAULT_PATHS = (
+    "/api/social/posts/",
+    "/api/social/posts/followed-posts/",
+)
+ASYNC_PREFIX = "/api/social/async/"
+SYNC_PREFIX = "/api/social/"
+
+
+class Command(BaseCommand):
+    help = (
+        "Fire concurrent GET requests at a running server and report "
+        "requests/sec and latency percentiles, optionally for the sync "
+        "and async version of every path side by side"
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--url", default="http://localhost:8000")
+        parser.add_argument("paths", nargs="*", default=DEFAULT_PATHS)
+        parser.add_argument("--concurrency", type=int, default=32)
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument(
+            "--user",
+            help="Email of the user to send requests as (JWT minted locally)",
+        )
+        parser.add_argument("--token", help="JWT access token to send")
+        parser.add_argument(
+            "--compare",
+            action="store_true",
+            help="Also run the /api/social/async/ twin of every path",
+        )
+
+    def handle(self, *args, **options) -> None:
+        headers = {"Accept": "application/json"}
+        token = options["token"]
+        if options["user"]:
+            user = get_user_model().objects.filter(
+                email=options["user"]
+            ).first()
+            if user is None:
+                raise CommandError(f"no user {options['user']}")
+            token = str(AccessToken.for_user(user))
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+
+        paths = list(options["paths"])
+        if options["compare"]:
+            paths = [
+                twin for path in paths for twin in (
+                    path, path.replace(SYNC_PREFIX, ASYNC_PREFIX, 1)
+                )
+            ]
+
+        self.stdout.write(
+            f"{'path':<45}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}"
+            f"{'p99 ms':>9}{'errors':>8}"
+        )
+        for path in paths:
+            self.report(path, *self.run(
+                options["url"], path, headers,
+                options["concurrency"], options["requests"],
+            ))
+
+    @staticmethod
+    def run(url: str, path: str, headers: dict, concurrency: int,
+            requests: int) -> tuple[float, list[float], int]:
+        target = urlsplit(url)
+        latencies = []
+        errors = 0
+        remaining = iter(range(requests))
+        lock = threading.Lock()
+
+        def client() -> None:
+            nonlocal errors
+            # one keep-alive connection per simulated client
+            connection = http.client.HTTPConnection(
+                target.hostname, target.port, timeout=30
+            )
+            while True:
+                with lock:
+                    if next(remaining, None) is None:
+                        break
+                start = time.perf_counter()
+                try:
+                    connection.request("GET", path, headers=headers)
+                    response = connection.getresponse()
+                    response.read()
+                    failed = response.status >= 400
+                except (OSError, http.client.HTTPException):
+                    connection.close()
+                    failed = True
+                elapsed = time.perf_counter() - start
+                with lock:
+                    latencies.append(elapsed)
+                    errors += failed
+            connection.close()
+
+        threads = [threading.Thread(target=client) for _ in range(concurrency)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - start, latencies, errors
+
+    def report(self, path: str, duration: float, latencies: list[float],
+               errors: int) -> None:
+        if len(latencies) < 2:
+            self.stdout.write(f"{path:<45}{'no requests completed':>44}")
+            return
+        percentiles = statistics.quantiles(latencies, n=100)
+        self.stdout.write(
+            f"{path:<45}{len(latencies) / duration:>9.1f}"
+            f"{percentiles[49] * 1000:>9.1f}{percentiles[94] * 1000:>9.1f}"
+            f"{percentiles[98] * 1000:>9.1f}{errors:>8}"
+        )
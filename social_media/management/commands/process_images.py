@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from social_media import images
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate missing or outdated image variants for post attachments "
+        "and profile pictures, --strip-originals also removes metadata "
+        "from images stored before uploads were stripped"
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--strip-originals", action="store_true")
+
+    def handle(self, *args, **options) -> None:
+        processed = stripped = 0
+        for model, (field, _) in images.IMAGE_FIELDS.items():
+            rows = (model.objects.exclude(**{field: ""})
+                    .exclude(**{f"{field}__isnull": True})
+                    .order_by("pk").values_list("pk", flat=True))
+            for pk in rows.iterator(chunk_size=options["batch_size"]):
+                try:
+                    if options["strip_originals"]:
+                        stripped += images.strip_stored(model, pk)
+                    images.process(model, pk)
+                except Exception as error:
+                    self.stderr.write(
+                        f"{model.__name__} {pk}: {error}"
+                    )
+                    continue
+                processed += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"checked {processed} images, stripped {stripped} originals"
+        ))
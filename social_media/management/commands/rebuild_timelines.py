@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from social_media import timeline
+from social_media.models import Profile
+
+
+class Command(BaseCommand):
+    help = "Rebuild stored home timelines from the current follow graph"
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "profiles",
+            nargs="*",
+            type=int,
+            help="profile ids to rebuild, all profiles when omitted",
+        )
+
+    def handle(self, *args, **options) -> None:
+        profiles = Profile.objects.all()
+        if options["profiles"]:
+            profiles = profiles.filter(id__in=options["profiles"])
+
+        count = 0
+        for profile in profiles.iterator(chunk_size=500):
+            timeline.rebuild(profile)
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f"rebuilt {count} timelines"))
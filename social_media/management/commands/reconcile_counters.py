@@ -0,0 +1,100 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from social_media.models import Commentary, Post, Profile
+
+
+Follow = Profile.follows.through
+
+
+def actual_like_count() -> Coalesce:
+    likes = (Profile.likes.through.objects.filter(post_id=OuterRef("pk"))
+             .order_by().values("post_id")
+             .annotate(n=Count("pk")).values("n"))
+    return Coalesce(Subquery(likes), 0)
+
+
+def actual_comment_count() -> Coalesce:
+    comments = (Commentary.objects.filter(post_id=OuterRef("pk"))
+                .order_by().values("post_id")
+                .annotate(n=Count("pk")).values("n"))
+    return Coalesce(Subquery(comments), 0)
+
+
+def actual_follower_count() -> Coalesce:
+    followers = (Follow.objects.filter(to_profile_id=OuterRef("pk"))
+                 .order_by().values("to_profile_id")
+                 .annotate(n=Count("pk")).values("n"))
+    return Coalesce(Subquery(followers), 0)
+
+
+def actual_following_count() -> Coalesce:
+    following = (Follow.objects.filter(from_profile_id=OuterRef("pk"))
+                 .order_by().values("from_profile_id")
+                 .annotate(n=Count("pk")).values("n"))
+    return Coalesce(Subquery(following), 0)
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount stored like/comment counters on posts and "
+        "follower/following counters on profiles that drifted"
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options) -> None:
+        batch_size = options["batch_size"]
+        posts = self.reconcile(
+            Post,
+            {
+                "like_count": actual_like_count,
+                "comment_count": actual_comment_count,
+            },
+            batch_size,
+        )
+        profiles = self.reconcile(
+            Profile,
+            {
+                "follower_count": actual_follower_count,
+                "following_count": actual_following_count,
+            },
+            batch_size,
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"reconciled {posts} posts and {profiles} profiles"
+        ))
+
+    def reconcile(self, model, counters: dict, batch_size: int) -> int:
+        """Walk rows in id batches, recount the ones whose counters drifted"""
+        last_id = 0
+        fixed = 0
+        while True:
+            batch = list(
+                model.objects.filter(id__gt=last_id).order_by("id")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not batch:
+                break
+            last_id = batch[-1]
+
+            drifted = Q()
+            for field in counters:
+                drifted |= ~Q(**{field: F(f"actual_{field}")})
+            drifted_ids = list(
+                model.objects.filter(id__in=batch)
+                .annotate(**{
+                    f"actual_{field}": actual()
+                    for field, actual in counters.items()
+                })
+                .filter(drifted)
+                .values_list("id", flat=True)
+            )
+            if drifted_ids:
+                fixed += model.objects.filter(id__in=drifted_ids).update(**{
+                    field: actual() for field, actual in counters.items()
+                })
+        return fixed
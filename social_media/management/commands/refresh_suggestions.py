@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from social_media import suggestions
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute who-to-follow suggestions from friends-of-friends and "
+        "co-likers of every profile"
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Profiles whose suggestions are replaced per transaction",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=10000,
+            help="Rows fetched per round trip while loading the edge lists",
+        )
+
+    def handle(self, *args, **options) -> None:
+        counts = suggestions.refresh(
+            batch_size=options["batch_size"],
+            chunk_size=options["chunk_size"],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"stored {counts['suggestions']} suggestions for "
+            f"{counts['profiles']} profiles"
+        ))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from social_media import trending
+
+
+class Command(BaseCommand):
+    help = "Recompute trending posts and tags from recent activity"
+
+    def handle(self, *args, **options) -> None:
+        counts = trending.refresh()
+        self.stdout.write(self.style.SUCCESS(
+            f"scored {counts['post']} posts and {counts['tag']} tags"
+        ))
@@ -0,0 +1,596 @@
+import json
+import os
+import random
+import statistics
+import time
+import uuid
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from io import BytesIO
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client, override_settings
+from django.urls import URLPattern, URLResolver, get_resolver, resolve
+from PIL import Image
+
+from social_media import timeline
+from social_media.management.commands.seed_benchmark import PASSWORD, PREFIX
+from social_media.models import Commentary, Post, Profile
+from social_media_api import query_metrics
+from user.authentication import ClaimsRefreshToken
+
+
+# endpoints of these url prefixes must all have a scenario
+COVERED_PREFIXES = ("api/social/", "api/user/")
+EXCLUDED_PREFIXES = ("api/social/async/",)
+DEFAULT_BASELINE = os.path.join(
+    settings.BASE_DIR, "benchmarks", "baseline.json"
+)
+
+
+class Rollback(Exception):
+    pass
+
+
+@dataclass
+class Scenario:
+    """One request, repeated with a different user and objects every time
+
+    ``path`` and ``data`` are formatted with the ids of the iteration.
+    Scenarios that write, staff scenarios (whose user is made staff for
+    the request) and fresh user scenarios (sent by a user created for the
+    request) run inside a transaction that is rolled back.
+    """
+    name: str
+    method: str
+    path: str
+    data: dict | None = None
+    writes: bool = False
+    authenticated: bool = True
+    staff: bool = False
+    fresh_user: bool = False
+    multipart: bool = False
+    stored_file: str | None = None
+
+
+SCENARIOS = (
+    Scenario("api root", "get", "/api/social/"),
+    Scenario("profile list", "get", "/api/social/profiles/"),
+    Scenario(
+        "profile list filtered",
+        "get",
+        f"/api/social/profiles/?username={PREFIX}1",
+    ),
+    Scenario("profile detail", "get", "/api/social/profiles/{other}/"),
+    Scenario(
+        "profile followers", "get", "/api/social/profiles/{other}/followers/"
+    ),
+    Scenario(
+        "profile following", "get", "/api/social/profiles/{other}/following/"
+    ),
+    Scenario(
+        "profile suggestions", "get", "/api/social/profiles/suggestions/"
+    ),
+    Scenario("user profile", "get", "/api/social/profiles/user-profile/"),
+    Scenario(
+        "followed profiles", "get", "/api/social/profiles/followed-profiles/"
+    ),
+    Scenario(
+        "following profiles", "get", "/api/social/profiles/following-profiles/"
+    ),
+    Scenario(
+        "create profile",
+        "post",
+        "/api/social/profiles/",
+        {"username": "{new}"},
+        writes=True,
+        fresh_user=True,
+    ),
+    Scenario(
+        "update profile",
+        "patch",
+        "/api/social/profiles/{profile}/",
+        {"bio": "benchmark bio {new}"},
+        writes=True,
+    ),
+    Scenario(
+        "delete profile",
+        "delete",
+        "/api/social/profiles/{profile}/",
+        writes=True,
+    ),
+    Scenario(
+        "upload profile picture",
+        "post",
+        "/api/social/profiles/{profile}/upload-profile-picture/",
+        {"username": "{username}"},
+        writes=True,
+        multipart=True,
+        stored_file="profile_picture",
+    ),
+    Scenario(
+        "toggle follow",
+        "get",
+        "/api/social/profiles/{other}/toggle-follow/",
+        writes=True,
+    ),
+    Scenario(
+        "bulk follow",
+        "post",
+        "/api/social/profiles/bulk-follow/",
+        {"action": "follow", "ids": "{others}"},
+        writes=True,
+    ),
+    Scenario("post list", "get", "/api/social/posts/"),
+    Scenario("post list by tag", "get", "/api/social/posts/?tags={tag}"),
+    Scenario("post detail", "get", "/api/social/posts/{post}/"),
+    Scenario(
+        "create post",
+        "post",
+        "/api/social/posts/",
+        {"body": "benchmark post {new}", "tags": "{tag}"},
+        writes=True,
+    ),
+    Scenario(
+        "update post",
+        "patch",
+        "/api/social/posts/{own_post}/",
+        {"body": "benchmark edit {new}"},
+        writes=True,
+    ),
+    Scenario(
+        "delete post", "delete", "/api/social/posts/{own_post}/", writes=True
+    ),
+    Scenario("comment list", "get", "/api/social/posts/{post}/comments/"),
+    Scenario(
+        "create comment",
+        "post",
+        "/api/social/posts/{post}/comments/",
+        {"body": "benchmark comment {new}"},
+        writes=True,
+    ),
+    Scenario(
+        "comment detail",
+        "get",
+        "/api/social/posts/{comment_post}/comments/{comment}/",
+    ),
+    Scenario(
+        "update comment",
+        "patch",
+        "/api/social/posts/{own_comment_post}/comments/{own_comment}/",
+        {"body": "benchmark edit {new}"},
+        writes=True,
+    ),
+    Scenario(
+        "delete comment",
+        "delete",
+        "/api/social/posts/{own_comment_post}/comments/{own_comment}/",
+        writes=True,
+    ),
+    Scenario(
+        "toggle like",
+        "get",
+        "/api/social/posts/{post}/toggle-like/",
+        writes=True,
+    ),
+    Scenario(
+        "bulk like",
+        "post",
+        "/api/social/posts/bulk-like/",
+        {"action": "like", "ids": "{posts}"},
+        writes=True,
+    ),
+    Scenario("user posts", "get", "/api/social/posts/user-posts/"),
+    Scenario("liked posts", "get", "/api/social/posts/liked-posts/"),
+    Scenario("followed posts", "get", "/api/social/posts/followed-posts/"),
+    Scenario("tag list", "get", "/api/social/tags/"),
+    Scenario("trending", "get", "/api/social/trending/"),
+    Scenario("cache stats", "get", "/api/social/cache-stats/", staff=True),
+    Scenario(
+        "throttle stats", "get", "/api/social/throttle-stats/", staff=True
+    ),
+    Scenario("search posts", "get", "/api/social/search/posts/?q={word}"),
+    Scenario(
+        "search profiles", "get", "/api/social/search/profiles/?q={word}"
+    ),
+    Scenario(
+        "register",
+        "post",
+        "/api/user/register/",
+        {"email": "{new}@example.com", "password": PASSWORD},
+        writes=True,
+        authenticated=False,
+    ),
+    Scenario(
+        "obtain token",
+        "post",
+        "/api/user/token/",
+        {"email": "{email}", "password": PASSWORD},
+        authenticated=False,
+    ),
+    Scenario(
+        "refresh token",
+        "post",
+        "/api/user/token/refresh/",
+        {"refresh": "{refresh}"},
+        authenticated=False,
+    ),
+    Scenario(
+        "revoke token", "post", "/api/user/token/revoke/", {}, writes=True
+    ),
+    Scenario("manage user", "get", "/api/user/me/"),
+    Scenario(
+        "update user",
+        "patch",
+        "/api/user/me/",
+        {"password": "{new}"},
+        writes=True,
+    ),
+)
+
+
+@dataclass
+class Result:
+    latencies: list[float] = field(default_factory=list)
+    queries: list[int] = field(default_factory=list)
+    errors: int = 0
+
+    def summary(self) -> dict:
+        percentiles = statistics.quantiles(self.latencies, n=100)
+        return {
+            "p50": round(percentiles[49] * 1000, 2),
+            "p95": round(percentiles[94] * 1000, 2),
+            "p99": round(percentiles[98] * 1000, 2),
+            "queries": max(self.queries),
+            "errors": self.errors,
+        }
+
+
+def endpoint_routes() -> set[str]:
+    """Routes of every endpoint under COVERED_PREFIXES"""
+    routes = set()
+
+    def walk(patterns, prefix: str) -> None:
+        for pattern in patterns:
+            # joined the way ResolverMatch.route joins them
+            route = prefix + str(pattern.pattern).removeprefix("^")
+            if isinstance(pattern, URLResolver):
+                walk(pattern.url_patterns, route)
+            elif isinstance(pattern, URLPattern):
+                routes.add(route)
+
+    walk(get_resolver().url_patterns, "")
+    return {
+        route for route in routes
+        if route.startswith(COVERED_PREFIXES)
+        and not route.startswith(EXCLUDED_PREFIXES)
+        # format suffix twins added by the DRF router
+        and "<format>" not in route
+    }
+
+
+class AnyId(dict):
+    """format_map() mapping that turns every placeholder into an id"""
+
+    def __missing__(self, key: str) -> int:
+        return 1
+
+
+def tiny_png() -> bytes:
+    buffer = BytesIO()
+    Image.new("RGB", (64, 64), "teal").save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+class Command(BaseCommand):
+    help = (
+        "Time every API endpoint in-process against the seed_benchmark "
+        "dataset, report latency percentiles and query counts and compare "
+        "them with a stored baseline"
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--iterations", type=int, default=50)
+        parser.add_argument("--warmup", type=int, default=3)
+        parser.add_argument(
+            "--users",
+            type=int,
+            default=20,
+            help="Seeded users the requests are spread across",
+        )
+        parser.add_argument(
+            "--only",
+            nargs="+",
+            default=(),
+            help="Run scenarios whose name contains any of these words",
+        )
+        parser.add_argument(
+            "--cold-cache",
+            action="store_true",
+            help="Clear the cache before every request",
+        )
+        parser.add_argument(
+            "--throttle",
+            action="store_true",
+            help="Keep rate limiting on (most iterations would get 429s)",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+        parser.add_argument(
+            "--save-baseline",
+            action="store_true",
+            help="Store this run as the new baseline",
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.2,
+            help="Allowed p95 slowdown against the baseline (0.2 = 20%%)",
+        )
+
+    def handle(self, *args, **options) -> None:
+        throttling = {**settings.THROTTLING, "ENABLED": options["throttle"]}
+        with override_settings(THROTTLING=throttling):
+            self.run(options)
+
+    def run(self, options: dict) -> None:
+        self.check_coverage()
+        self.random = random.Random(options["seed"])
+        self.load_fixtures(options["users"])
+
+        scenarios = [
+            scenario for scenario in SCENARIOS
+            if not options["only"]
+            or any(word in scenario.name for word in options["only"])
+        ]
+        if options["iterations"] < 2:
+            raise CommandError("--iterations must be at least 2")
+
+        self.stdout.write(
+            f"{'scenario':<26}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+            f"{'queries':>9}{'errors':>8}"
+        )
+        results = {}
+        for scenario in scenarios:
+            for i in range(options["warmup"]):
+                self.request(scenario, i, options["cold_cache"])
+            result = Result()
+            for i in range(options["iterations"]):
+                elapsed, queries, ok = self.request(
+                    scenario, i, options["cold_cache"]
+                )
+                result.latencies.append(elapsed)
+                result.queries.append(queries)
+                result.errors += not ok
+            summary = results[scenario.name] = result.summary()
+            self.stdout.write(
+                f"{scenario.name:<26}{summary['p50']:>9.1f}"
+                f"{summary['p95']:>9.1f}{summary['p99']:>9.1f}"
+                f"{summary['queries']:>9}{summary['errors']:>8}"
+            )
+
+        baseline = self.load_baseline(options["baseline"])
+        regressions = []
+        if baseline:
+            regressions = self.compare(
+                results, baseline, options["tolerance"]
+            )
+        if options["save_baseline"]:
+            self.save_baseline(options["baseline"], results)
+        if regressions:
+            raise CommandError(
+                "regressed against the baseline: " + ", ".join(regressions)
+            )
+
+    def check_coverage(self) -> None:
+        covered = {
+            resolve(scenario.path.split("?")[0].format_map(AnyId())).route
+            for scenario in SCENARIOS
+        }
+        missing = endpoint_routes() - covered
+        if missing:
+            raise CommandError(
+                "endpoints without a benchmark scenario: "
+                + ", ".join(sorted(missing))
+            )
+
+    def load_fixtures(self, count: int) -> None:
+        """Pick the users and objects the scenarios are run against"""
+        profiles = list(
+            Profile.objects.filter(
+                username__startswith=PREFIX,
+                posts__isnull=False,
+                comments__isnull=False,
+            )
+            .select_related("user").distinct().order_by("id")[:count]
+        )
+        if not profiles:
+            raise CommandError("no seeded data found, run seed_benchmark")
+        self.users = []
+        for profile in profiles:
+            # stored timelines are only seeded for the profiles in use
+            timeline.rebuild(profile)
+            comment = (Commentary.objects.filter(user=profile)
+                       .values("id", "post_id").first())
+            self.users.append({
+                "user": profile.user,
+                "profile": profile.id,
+                "username": profile.username,
+                "email": profile.user.email,
+                "refresh": str(ClaimsRefreshToken.for_user(profile.user)),
+                "own_post": profile.posts.values_list(
+                    "id", flat=True
+                ).first(),
+                "own_comment": comment["id"],
+                "own_comment_post": comment["post_id"],
+            })
+
+        self.profile_ids = self.sample_ids(Profile, count * 10)
+        self.post_ids = self.sample_ids(Post, count * 10)
+        self.comments = []
+        for pk in self.sample_ids(Commentary, count * 10):
+            comment = (Commentary.objects.filter(id__gte=pk)
+                       .order_by("id").values("id", "post_id").first())
+            self.comments.append(comment)
+        self.tags = list(
+            Post.objects.filter(id__in=self.post_ids, tags__isnull=False)
+            .values_list("tags", flat=True)
+        ) or ["benchmark"]
+        self.words = [
+            body.split()[0] for body in Post.objects.filter(
+                id__in=self.post_ids
+            ).values_list("body", flat=True)
+        ] or ["benchmark"]
+
+    def sample_ids(self, model, count: int) -> list[int]:
+        """Ids spread over the table without an ORDER BY random()"""
+        ids = model.objects.order_by("id").values_list("id", flat=True)
+        first, last = ids.first(), ids.last()
+        sample = set()
+        for _ in range(count):
+            pk = ids.filter(id__gte=self.random.randint(first, last)).first()
+            sample.add(pk)
+        return sorted(sample)
+
+    def context(self, iteration: int) -> dict:
+        user = self.users[iteration % len(self.users)]
+        comment = self.random.choice(self.comments)
+        return {
+            **user,
+            "other": self.random.choice(self.profile_ids),
+            "others": self.random.sample(
+                self.profile_ids, min(10, len(self.profile_ids))
+            ),
+            "post": self.random.choice(self.post_ids),
+            "posts": self.random.sample(
+                self.post_ids, min(10, len(self.post_ids))
+            ),
+            "comment": comment["id"],
+            "comment_post": comment["post_id"],
+            "tag": self.random.choice(self.tags).split(",")[0],
+            "word": self.random.choice(self.words),
+            "new": f"{PREFIX}{uuid.uuid4().hex[:12]}",
+        }
+
+    @staticmethod
+    def format_data(data, values: dict):
+        if isinstance(data, dict):
+            return {
+                key: Command.format_data(value, values)
+                for key, value in data.items()
+            }
+        # "{others}" style placeholders are replaced by the value itself
+        if (isinstance(data, str) and data.startswith("{")
+                and data.endswith("}") and data[1:-1] in values):
+            return values[data[1:-1]]
+        if isinstance(data, str):
+            return data.format_map(values)
+        return data
+
+    def request(self, scenario: Scenario, iteration: int,
+                cold_cache: bool) -> tuple[float, int, bool]:
+        values = self.context(iteration)
+        client = Client()
+        path = scenario.path.format_map(values)
+        data = self.format_data(scenario.data, values)
+        kwargs = {}
+        if scenario.multipart:
+            data["profile_picture"] = SimpleUploadedFile(
+                "benchmark.png", tiny_png(), content_type="image/png"
+            )
+        elif data is not None:
+            kwargs["content_type"] = "application/json"
+        send = getattr(client, scenario.method)
+        if cold_cache:
+            cache.clear()
+
+        rolled_back = scenario.writes or scenario.staff or scenario.fresh_user
+        response = None
+        try:
+            with transaction.atomic() if rolled_back else nullcontext():
+                user = values["user"]
+                if scenario.fresh_user:
+                    user = get_user_model().objects.create(
+                        email=f"{values['new']}@example.com"
+                    )
+                if scenario.staff:
+                    get_user_model().objects.filter(pk=user.pk).update(
+                        is_staff=True
+                    )
+                if scenario.authenticated:
+                    token = ClaimsRefreshToken.for_user(user).access_token
+                    client.defaults["HTTP_AUTHORIZATION"] = f"Bearer {token}"
+                with query_metrics.capture() as metrics:
+                    start = time.perf_counter()
+                    response = send(path, data, **kwargs)
+                    elapsed = time.perf_counter() - start
+                if rolled_back:
+                    raise Rollback
+        except Rollback:
+            pass
+        finally:
+            if scenario.stored_file and response is not None:
+                self.delete_stored_file(response, scenario.stored_file)
+
+        return elapsed, metrics.count, response.status_code < 400
+
+    @staticmethod
+    def delete_stored_file(response, name: str) -> None:
+        """Uploads are not rolled back with the database"""
+        path = urlsplit(response.json().get(name) or "").path
+        if path.startswith(settings.MEDIA_URL):
+            default_storage.delete(path[len(settings.MEDIA_URL):])
+
+    def load_baseline(self, path: str) -> dict:
+        if not os.path.exists(path):
+            return {}
+        with open(path) as file:
+            return json.load(file)["scenarios"]
+
+    def save_baseline(self, path: str, results: dict) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            json.dump(
+                {
+                    "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "profiles": Profile.objects.count(),
+                    "posts": Post.objects.count(),
+                    "scenarios": results,
+                },
+                file,
+                indent=2,
+            )
+        self.stdout.write(self.style.SUCCESS(f"baseline saved to {path}"))
+
+    def compare(self, results: dict, baseline: dict,
+                tolerance: float) -> list[str]:
+        self.stdout.write(
+            f"\n{'scenario':<26}{'p95 ms':>9}{'baseline':>10}{'change':>9}"
+            f"{'queries':>9}{'baseline':>10}"
+        )
+        regressions = []
+        for name, summary in results.items():
+            before = baseline.get(name)
+            if before is None:
+                continue
+            change = summary["p95"] / before["p95"] - 1 if before["p95"] else 0
+            regressed = (change > tolerance
+                         or summary["queries"] > before["queries"])
+            if regressed:
+                regressions.append(name)
+            line = (
+                f"{name:<26}{summary['p95']:>9.1f}{before['p95']:>10.1f}"
+                f"{change:>+9.0%}{summary['queries']:>9}"
+                f"{before['queries']:>10}"
+            )
+            self.stdout.write(
+                self.style.ERROR(line) if regressed else line
+            )
+        return regressions
@@ -0,0 +1,365 @@
+import itertools
+import random
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from social_media import search, trending
+from social_media.models import (
+    ActivityBucket,
+    Commentary,
+    Post,
+    PostTag,
+    Profile,
+    Tag,
+)
+
+
+# every seeded user and profile is named after this prefix
+PREFIX = "bench-"
+PASSWORD = "benchmark"
+SYLLABLES = ("ka", "lo", "mi", "ra", "su", "te", "vo", "ni", "pe", "zu")
+# pareto shape of the number of profiles each profile follows
+FOLLOW_SHAPE = 2.0
+
+Follow = Profile.follows.through
+PostLike = Profile.likes.through
+
+
+def zipf_weights(size: int, exponent: float) -> list[float]:
+    """Cumulative weights where item n is picked ~1/n**exponent as often"""
+    return list(itertools.accumulate(
+        1 / (rank + 1) ** exponent for rank in range(size)
+    ))
+
+
+@contextmanager
+def keep_timestamps(*fields):
+    """Let bulk_create store the given created_at values"""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-generate a large synthetic dataset (power-law follow graph, "
+        "posts, tags, likes and comments) for run_benchmark"
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--profiles", type=int, default=100000)
+        parser.add_argument("--posts", type=int, default=5000000)
+        parser.add_argument(
+            "--follows",
+            type=float,
+            default=50,
+            help="Mean number of profiles each profile follows",
+        )
+        parser.add_argument("--likes-per-post", type=float, default=4)
+        parser.add_argument("--comments-per-post", type=float, default=1)
+        parser.add_argument(
+            "--tags",
+            type=int,
+            default=500,
+            help="Size of the tag vocabulary (at most 1000)",
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=365,
+            help="Posts are spread over this many past days",
+        )
+        parser.add_argument(
+            "--exponent",
+            type=float,
+            default=1.1,
+            help="Zipf exponent of profile popularity and tag usage",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Delete previously seeded data first",
+        )
+
+    def handle(self, *args, **options) -> None:
+        users = get_user_model().objects.filter(email__startswith=PREFIX)
+        if users.exists():
+            if not options["clear"]:
+                raise CommandError(
+                    "benchmark data already present, pass --clear to replace"
+                )
+            self.step("clearing previous data", users.delete)
+
+        self.random = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        self.now = timezone.now()
+        self.words = [
+            "".join(word) for word in itertools.product(SYLLABLES, repeat=3)
+        ]
+        self.random.shuffle(self.words)
+
+        self.profile_ids = self.step(
+            "profiles", self.seed_profiles, options["profiles"]
+        )
+        # popularity rank is independent of the id order
+        self.ranked = self.profile_ids[:]
+        self.random.shuffle(self.ranked)
+        self.popularity = zipf_weights(
+            len(self.ranked), options["exponent"]
+        )
+
+        self.step("follows", self.seed_follows, options["follows"])
+        self.tag_ids = self.step("tags", self.seed_tags, options["tags"])
+        self.tag_weights = zipf_weights(
+            len(self.tag_ids), options["exponent"]
+        )
+        self.step(
+            "posts, likes and comments",
+            self.seed_posts,
+            options["posts"],
+            options["likes_per_post"],
+            options["comments_per_post"],
+            options["days"],
+        )
+        self.step("trending", trending.refresh)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"seeded {len(self.profile_ids)} profiles and "
+            f"{options['posts']} posts; run rebuild_timelines for home "
+            f"feeds beyond the profiles run_benchmark uses"
+        ))
+
+    def step(self, name: str, func, *args):
+        self.stdout.write(f"{name}...", ending="")
+        self.stdout.flush()
+        start = time.perf_counter()
+        result = func(*args)
+        self.stdout.write(f" {time.perf_counter() - start:.1f}s")
+        return result
+
+    def batches(self, total: int):
+        for start in range(0, total, self.batch_size):
+            yield range(start, min(start + self.batch_size, total))
+
+    def sentence(self, low: int, high: int) -> str:
+        return " ".join(
+            self.random.choices(self.words, k=self.random.randint(low, high))
+        )
+
+    def comment_time(self, post: Post):
+        return (post.created_at
+                + (self.now - post.created_at) * self.random.random())
+
+    def seed_profiles(self, total: int) -> list[int]:
+        # hashing once keeps the seeded accounts usable for token requests
+        password = make_password(PASSWORD)
+        user_model = get_user_model()
+        profile_ids = []
+        for batch in self.batches(total):
+            with transaction.atomic():
+                users = user_model.objects.bulk_create([
+                    user_model(email=f"{PREFIX}{i}@example.com",
+                               password=password)
+                    for i in batch
+                ])
+                profiles = Profile.objects.bulk_create([
+                    Profile(
+                        user=user,
+                        username=f"{PREFIX}{i}",
+                        first_name=self.random.choice(self.words).title(),
+                        last_name=self.random.choice(self.words).title(),
+                        bio=self.sentence(3, 12),
+                    )
+                    for i, user in zip(batch, users)
+                ])
+                ids = [profile.id for profile in profiles]
+                if search.uses_postgres():
+                    Profile.objects.filter(id__in=ids).update(
+                        search_vector=search.profile_vector()
+                    )
+            profile_ids.extend(ids)
+        return profile_ids
+
+    def seed_follows(self, mean: float) -> None:
+        scale = mean * (FOLLOW_SHAPE - 1) / FOLLOW_SHAPE
+        limit = len(self.profile_ids) - 1
+        follows = []
+        following = {}
+        followers = Counter()
+        for follower_id in self.profile_ids:
+            count = min(
+                int(self.random.paretovariate(FOLLOW_SHAPE) * scale), limit
+            )
+            targets = set(self.random.choices(
+                self.ranked, cum_weights=self.popularity, k=count
+            ))
+            targets.discard(follower_id)
+            following[follower_id] = len(targets)
+            followers.update(targets)
+            follows.extend(
+                Follow(from_profile_id=follower_id, to_profile_id=target_id)
+                for target_id in targets
+            )
+            if len(follows) >= self.batch_size:
+                Follow.objects.bulk_create(follows, ignore_conflicts=True)
+                follows = []
+        Follow.objects.bulk_create(follows, ignore_conflicts=True)
+
+        # bulk_create skips m2m_changed, so the counters are stored here
+        Profile.objects.bulk_update(
+            [
+                Profile(
+                    id=pk,
+                    follower_count=followers[pk],
+                    following_count=following[pk],
+                )
+                for pk in self.profile_ids
+            ],
+            ["follower_count", "following_count"],
+            batch_size=self.batch_size,
+        )
+
+    def seed_tags(self, total: int) -> list[int]:
+        names = self.words[:total]
+        Tag.objects.bulk_create(
+            [Tag(name=name) for name in names], ignore_conflicts=True
+        )
+        ids = dict(
+            Tag.objects.filter(name__in=names).values_list("name", "id")
+        )
+        return [ids[name] for name in names]
+
+    def seed_posts(self, total: int, likes_per_post: float,
+                   comments_per_post: float, days: int) -> None:
+        tag_names = dict(zip(self.tag_ids, self.words))
+        tag_counts = Counter()
+        # activity inside the trending window, attributed to the slot the
+        # post was created in
+        window_start = self.now - timedelta(
+            hours=settings.TRENDING["WINDOW_HOURS"]
+        )
+        activity = defaultdict(Counter)
+        position_weights = zipf_weights(self.batch_size, 1.0)
+
+        post_fields = (Post._meta.get_field("created_at"),
+                       Commentary._meta.get_field("created_at"))
+        with keep_timestamps(*post_fields):
+            for batch in self.batches(total):
+                size = len(batch)
+                authors = self.random.choices(
+                    self.ranked, cum_weights=self.popularity, k=size
+                )
+                post_tags = [
+                    set(self.random.choices(
+                        self.tag_ids,
+                        cum_weights=self.tag_weights,
+                        k=self.random.randint(0, 3),
+                    ))
+                    for _ in batch
+                ]
+                likes = {
+                    (self.random.choice(self.profile_ids), position)
+                    for position in self.random.choices(
+                        range(size),
+                        cum_weights=position_weights[:size],
+                        k=round(size * likes_per_post),
+                    )
+                }
+                commented = self.random.choices(
+                    range(size),
+                    cum_weights=position_weights[:size],
+                    k=round(size * comments_per_post),
+                )
+                like_counts = Counter(position for _, position in likes)
+                comment_counts = Counter(commented)
+
+                posts = [
+                    Post(
+                        posted_by_id=author_id,
+                        created_at=self.now - timedelta(
+                            seconds=self.random.uniform(0, days * 86400)
+                        ),
+                        body=self.sentence(4, 30),
+                        tags=", ".join(tag_names[pk] for pk in tags) or None,
+                        like_count=like_counts[position],
+                        comment_count=comment_counts[position],
+                    )
+                    for position, (author_id, tags) in enumerate(
+                        zip(authors, post_tags)
+                    )
+                ]
+                with transaction.atomic():
+                    posts = Post.objects.bulk_create(posts)
+                    PostTag.objects.bulk_create([
+                        PostTag(post=post, tag_id=tag_id,
+                                created_at=post.created_at)
+                        for post, tags in zip(posts, post_tags)
+                        for tag_id in tags
+                    ])
+                    PostLike.objects.bulk_create([
+                        PostLike(profile_id=profile_id,
+                                 post_id=posts[position].id)
+                        for profile_id, position in likes
+                    ])
+                    Commentary.objects.bulk_create([
+                        Commentary(
+                            user_id=self.random.choice(self.profile_ids),
+                            post=posts[position],
+                            created_at=self.comment_time(posts[position]),
+                            body=self.sentence(2, 20),
+                        )
+                        for position in commented
+                    ])
+                    if search.uses_postgres():
+                        Post.objects.filter(
+                            id__in=[post.id for post in posts]
+                        ).update(search_vector=search.post_vector())
+
+                for post, tags in zip(posts, post_tags):
+                    tag_counts.update(tags)
+                    if post.created_at < window_start or not (
+                        post.like_count or post.comment_count
+                    ):
+                        continue
+                    bucket = trending.bucket_start(post.created_at)
+                    for kind, object_id in itertools.chain(
+                        [("post", post.id)],
+                        (("tag", tag_id) for tag_id in tags),
+                    ):
+                        counts = activity[kind, object_id, bucket]
+                        counts["likes"] += post.like_count
+                        counts["comments"] += post.comment_count
+
+        by_amount = defaultdict(list)
+        for tag_id, amount in tag_counts.items():
+            by_amount[amount].append(tag_id)
+        for amount, tag_ids in by_amount.items():
+            Tag.objects.filter(id__in=tag_ids).update(
+                post_count=F("post_count") + amount
+            )
+
+        ActivityBucket.objects.bulk_create(
+            [
+                ActivityBucket(kind=kind, object_id=object_id, bucket=bucket,
+                               **counts)
+                for (kind, object_id, bucket), counts in activity.items()
+            ],
+            batch_size=self.batch_size,
+            ignore_conflicts=True,
+        )
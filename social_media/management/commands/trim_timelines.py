@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from social_media import timeline
+
+
+class Command(BaseCommand):
+    help = (
+        "Trim stored home timelines down to the configured depth, "
+        "e.g. after lowering TIMELINE_DEPTH; the worker also does this "
+        "every TIMELINE_TRIM_INTERVAL seconds while posts fan out"
+    )
+
+    def handle(self, *args, **options) -> None:
+        removed = timeline.get_backend().trim_overflow()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"removed {removed} timeline entries"
+        ))
@@ -1,18 +1,46 @@
 import time
-from django.core.management.base import BaseCommand
-from django.db import connections
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
 from django.db.utils import OperationalError
 
 
 class Command(BaseCommand):
+    help = "Block until the database accepts connections"
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=60,
+            help="Seconds to keep trying before giving up",
+        )
+        parser.add_argument("--max-delay", type=float, default=5)
+
     def handle(self, *args, **options) -> None:
         self.stdout.write("waiting for db connection")
-        db_conn = None
-        while not db_conn:
+        connection = connections[options["database"]]
+        deadline = time.monotonic() + options["timeout"]
+        delay = 0.25
+        while True:
             try:
-                db_conn = connections["default"]
-            except OperationalError:
-                self.stdout.write("database is not ready, retry in 1 second..")
-                time.sleep(1)
+                connection.ensure_connection()
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                break
+            except OperationalError as error:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise CommandError(
+                        f"database is still unavailable: {error}"
+                    )
+                delay = min(delay * 2, options["max_delay"], remaining)
+                self.stdout.write(
+                    f"database is not ready, retry in {delay:.1f} seconds.."
+                )
+                connection.close()
+                time.sleep(delay)
 
+        connection.close()
         self.stdout.write(self.style.SUCCESS("database is up!"))
@@ -0,0 +1,25 @@
+# Generated by Django 4.2 on 2026-10-18 18:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social_media', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='post',
+            options={'ordering': ['-created_at', '-id']},
+        ),
+        migrations.AlterModelOptions(
+            name='profile',
+            options={'ordering': ['username']},
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['posted_by', '-created_at', '-id'], name='post_author_feed_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2 on 2026-10-18 18:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social_media', '0002_post_feed_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='social_media.profile')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to='social_media.profile')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='social_media.post')),
+            ],
+            options={
+                'verbose_name_plural': 'timeline entries',
+                'ordering': ['-created_at', '-post_id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['owner', '-created_at', '-post'], name='timeline_owner_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['owner', 'author'], name='timeline_owner_author_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='timelineentry',
+            constraint=models.UniqueConstraint(fields=('owner', 'post'), name='unique_timeline_entry'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2 on 2026-10-18 18:49
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Post = apps.get_model('social_media', 'Post')
+    Profile = apps.get_model('social_media', 'Profile')
+    Commentary = apps.get_model('social_media', 'Commentary')
+
+    likes = (Profile.likes.through.objects.filter(post_id=OuterRef('pk'))
+             .order_by().values('post_id').annotate(n=Count('pk')).values('n'))
+    comments = (Commentary.objects.filter(post_id=OuterRef('pk'))
+                .order_by().values('post_id').annotate(n=Count('pk')).values('n'))
+    Post.objects.update(
+        like_count=Coalesce(Subquery(likes), 0),
+        comment_count=Coalesce(Subquery(comments), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social_media', '0003_timeline_entry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
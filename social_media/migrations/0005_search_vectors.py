@@ -0,0 +1,50 @@
+# Generated by Django 4.2 on 2026-10-18 18:50
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+
+def fill_search_vectors(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Post = apps.get_model('social_media', 'Post')
+    Profile = apps.get_model('social_media', 'Profile')
+    Post.objects.update(
+        search_vector=SearchVector('tags', weight='A', config='english')
+        + SearchVector('body', weight='B', config='english')
+    )
+    Profile.objects.update(
+        search_vector=SearchVector('username', weight='A', config='simple')
+        + SearchVector('first_name', 'last_name', weight='B', config='simple')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social_media', '0004_post_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_search_vectors, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='post',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='post_search_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='profile',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='profile_search_gin'),
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 4.2 on 2026-10-18 18:51
+
+import re
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def split_tags(apps, schema_editor):
+    Post = apps.get_model('social_media', 'Post')
+    Tag = apps.get_model('social_media', 'Tag')
+    PostTag = apps.get_model('social_media', 'PostTag')
+
+    tag_ids = {}
+    links = []
+    posts = Post.objects.exclude(tags__isnull=True).exclude(tags='')
+    for post in posts.only('id', 'tags', 'created_at').iterator(chunk_size=2000):
+        names = {name[:100] for name in re.findall(r'[\w-]+', post.tags.lower())}
+        for name in names:
+            if name not in tag_ids:
+                tag_ids[name] = Tag.objects.create(name=name).id
+            links.append(PostTag(
+                post_id=post.id, tag_id=tag_ids[name], created_at=post.created_at
+            ))
+            if len(links) >= 2000:
+                PostTag.objects.bulk_create(links)
+                links = []
+    PostTag.objects.bulk_create(links)
+
+    links_per_tag = (
+        PostTag.objects.filter(tag_id=models.OuterRef('pk')).order_by()
+        .values('tag_id').annotate(n=models.Count('pk')).values('n')
+    )
+    Tag.objects.update(post_count=models.Subquery(links_per_tag))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social_media', '0005_search_vectors'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('post_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PostTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='post_tags', to='social_media.post')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='post_tags', to='social_media.tag')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='posttag',
+            index=models.Index(fields=['tag', '-created_at'], name='post_tag_recent_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='posttag',
+            constraint=models.UniqueConstraint(fields=('post', 'tag'), name='unique_post_tag'),
+        ),
+        migrations.RunPython(split_tags, migrations.RunPython.noop),
+    ]
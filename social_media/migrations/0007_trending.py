@@ -0,0 +1,50 @@
+# Generated by Django 4.2 on 2026-10-18 18:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social_media', '0006_tags'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('post', 'post'), ('tag', 'tag')], max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('bucket', models.DateTimeField()),
+                ('likes', models.PositiveIntegerField(default=0)),
+                ('comments', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TrendingItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('post', 'post'), ('tag', 'tag')], max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('rank', models.PositiveIntegerField()),
+                ('score', models.FloatField()),
+                ('refreshed_at', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ['kind', 'rank'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='trendingitem',
+            index=models.Index(fields=['kind', 'rank'], name='trending_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activitybucket',
+            index=models.Index(fields=['bucket'], name='activity_bucket_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='activitybucket',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id', 'bucket'), name='unique_activity_bucket'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2 on 2026-10-18 18:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social_media', '0007_trending'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='attachment_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='picture_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2 on 2026-10-18 19:26
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Profile = apps.get_model('social_media', 'Profile')
+    Follow = Profile.follows.through
+
+    followers = (Follow.objects.filter(to_profile_id=OuterRef('pk'))
+                 .order_by().values('to_profile_id')
+                 .annotate(n=Count('pk')).values('n'))
+    following = (Follow.objects.filter(from_profile_id=OuterRef('pk'))
+                 .order_by().values('from_profile_id')
+                 .annotate(n=Count('pk')).values('n'))
+    Profile.objects.update(
+        follower_count=Coalesce(Subquery(followers), 0),
+        following_count=Coalesce(Subquery(following), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social_media', '0008_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='follower_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2 on 2026-10-18 19:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social_media', '0009_profile_follow_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Suggestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveIntegerField()),
+                ('score', models.FloatField()),
+                ('mutual_follows', models.PositiveIntegerField(default=0)),
+                ('co_likes', models.PositiveIntegerField(default=0)),
+                ('refreshed_at', models.DateTimeField()),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='suggestions', to='social_media.profile')),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='social_media.profile')),
+            ],
+            options={
+                'ordering': ['owner', 'rank'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='suggestion',
+            index=models.Index(fields=['owner', 'rank'], name='suggestion_rank_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='suggestion',
+            constraint=models.UniqueConstraint(fields=('owner', 'profile'), name='unique_suggestion'),
+        ),
+    ]
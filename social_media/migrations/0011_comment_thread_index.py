@@ -0,0 +1,21 @@
+# Generated by Django 4.2 on 2026-10-18 19:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social_media', '0010_suggestions'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='commentary',
+            options={'ordering': ['created_at', 'id'], 'verbose_name_plural': 'commentaries'},
+        ),
+        migrations.AddIndex(
+            model_name='commentary',
+            index=models.Index(fields=['post', 'created_at', 'id'], name='comment_post_thread_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2 on 2026-10-18 21:40
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social_media', '0011_comment_thread_index'),
+    ]
+
+    # the auto-created through table of Profile.follows takes no Meta
+    # indexes; these let follower/following pages walk rows by id
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX follow_to_profile_id_idx '
+            'ON social_media_profile_follows (to_profile_id, id);',
+            'DROP INDEX follow_to_profile_id_idx;',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX follow_from_profile_id_idx '
+            'ON social_media_profile_follows (from_profile_id, id);',
+            'DROP INDEX follow_from_profile_id_idx;',
+        ),
+    ]
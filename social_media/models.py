@@ -1,6 +1,10 @@
 import os
 import uuid
+from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models import Prefetch
 from django.utils.text import slugify
 
 from social_media_api.settings import AUTH_USER_MODEL
@@ -18,6 +22,44 @@ def get_image_file_path(instance, filename) -> str:
     return os.path.join("upload/", dir_name, fullname)
 
 
+class Tag(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+    post_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ["name"]
+
+    def __str__(self) -> str:
+        return self.name
+
+
+class PostQuerySet(models.QuerySet):
+    FEED_FIELDS = (
+        "id",
+        "posted_by__username",
+        "created_at",
+        "body",
+        "tags",
+        "attachment",
+        "attachment_variants",
+        "like_count",
+        "comment_count",
+    )
+
+    def for_feed(self) -> "PostQuerySet":
+        """Posts with the author joined and only the listed columns loaded"""
+        return self.select_related("posted_by").only(*self.FEED_FIELDS)
+
+    def for_detail(self) -> "PostQuerySet":
+        """Posts with the author and the newest comments in latest_comments"""
+        latest = (Commentary.objects.select_related("user")
+                  .order_by("-created_at", "-id")
+                  [:settings.POST_DETAIL_COMMENTS])
+        return self.select_related("posted_by").prefetch_related(
+            Prefetch("comments", queryset=latest, to_attr="latest_comments")
+        )
+
+
 class Post(models.Model):
     posted_by = models.ForeignKey(
         to="Profile",
@@ -32,14 +74,62 @@ class Post(models.Model):
         null=True,
         blank=True
     )
+    attachment_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False
+    )
+    like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
-        ordering = ["-created_at"]
+        ordering = ["-created_at", "-id"]
+        indexes = [
+            models.Index(
+                fields=["posted_by", "-created_at", "-id"],
+                name="post_author_feed_idx",
+            ),
+            GinIndex(fields=["search_vector"], name="post_search_gin"),
+        ]
 
     def __str__(self) -> str:
         return f"post # {self.id}"
 
 
+class PostTag(models.Model):
+    post = models.ForeignKey(
+        to=Post,
+        on_delete=models.CASCADE,
+        related_name="post_tags"
+    )
+    tag = models.ForeignKey(
+        to=Tag,
+        on_delete=models.CASCADE,
+        related_name="post_tags"
+    )
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["post", "tag"],
+                name="unique_post_tag",
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["tag", "-created_at"],
+                name="post_tag_recent_idx",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"tag {self.tag_id} on post {self.post_id}"
+
+
 class Profile(models.Model):
     user = models.OneToOneField(
         AUTH_USER_MODEL,
@@ -57,20 +147,31 @@ class Profile(models.Model):
         null=True,
         blank=True
     )
+    picture_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False
+    )
     follows = models.ManyToManyField(
         to="self",
         blank=True,
         symmetrical=False,
         related_name="followed_by",
     )
+    follower_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
     likes = models.ManyToManyField(
         to=Post,
         blank=True,
         related_name="liked",
     )
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         ordering = ["username"]
+        indexes = [
+            GinIndex(fields=["search_vector"], name="profile_search_gin"),
+        ]
 
     def __str__(self) -> str:
         return self.username
@@ -91,8 +192,132 @@ class Commentary(models.Model):
     body = models.CharField(max_length=255)
 
     class Meta:
-        ordering = ["created_at"]
+        ordering = ["created_at", "id"]
         verbose_name_plural = "commentaries"
+        indexes = [
+            models.Index(
+                fields=["post", "created_at", "id"],
+                name="comment_post_thread_idx",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"comment {self.id} for post {self.post_id}"
+
+
+class TimelineEntry(models.Model):
+    owner = models.ForeignKey(
+        to=Profile,
+        on_delete=models.CASCADE,
+        related_name="timeline"
+    )
+    post = models.ForeignKey(
+        to=Post,
+        on_delete=models.CASCADE,
+        related_name="+"
+    )
+    author = models.ForeignKey(
+        to=Profile,
+        on_delete=models.CASCADE,
+        related_name="+"
+    )
+    created_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ["-created_at", "-post_id"]
+        verbose_name_plural = "timeline entries"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["owner", "post"],
+                name="unique_timeline_entry",
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["owner", "-created_at", "-post"],
+                name="timeline_owner_idx",
+            ),
+            models.Index(
+                fields=["owner", "author"],
+                name="timeline_owner_author_idx",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"post {self.post_id} in timeline of {self.owner_id}"
+
+
+class ActivityBucket(models.Model):
+    """Likes and comments an object got during one time slot"""
+    KIND_CHOICES = (("post", "post"), ("tag", "tag"))
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    bucket = models.DateTimeField()
+    likes = models.PositiveIntegerField(default=0)
+    comments = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["kind", "object_id", "bucket"],
+                name="unique_activity_bucket",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["bucket"], name="activity_bucket_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.kind} {self.object_id} at {self.bucket}"
+
+
+class TrendingItem(models.Model):
+    kind = models.CharField(max_length=10, choices=ActivityBucket.KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    rank = models.PositiveIntegerField()
+    score = models.FloatField()
+    refreshed_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ["kind", "rank"]
+        indexes = [
+            models.Index(fields=["kind", "rank"], name="trending_rank_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"#{self.rank} trending {self.kind} {self.object_id}"
+
+
+class Suggestion(models.Model):
+    """Profile worth following for owner, precomputed by refresh_suggestions"""
+    owner = models.ForeignKey(
+        to=Profile,
+        on_delete=models.CASCADE,
+        related_name="suggestions"
+    )
+    profile = models.ForeignKey(
+        to=Profile,
+        on_delete=models.CASCADE,
+        related_name="+"
+    )
+    rank = models.PositiveIntegerField()
+    score = models.FloatField()
+    mutual_follows = models.PositiveIntegerField(default=0)
+    co_likes = models.PositiveIntegerField(default=0)
+    refreshed_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ["owner", "rank"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["owner", "profile"],
+                name="unique_suggestion",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["owner", "rank"], name="suggestion_rank_idx"),
+        ]
 
     def __str__(self) -> str:
-        return f"comment {self.id} for post {self.post.id}"
+        return f"#{self.rank} suggestion {self.profile_id} for {self.owner_id}"
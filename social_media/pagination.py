@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.db.models import QuerySet
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+
+
+# annotation holding PostTag.created_at on tag-filtered post lists
+TAGGED_AT = "tagged_at"
+
+
+def post_position_field(queryset: QuerySet) -> str:
+    """Column a post list is ordered and paged on
+
+    PostTag rows copy the created_at of their post, so tag-filtered lists
+    page on the PostTag column and its (tag, -created_at) index instead.
+    """
+    if TAGGED_AT in queryset.query.annotations:
+        return TAGGED_AT
+    return "created_at"
+
+
+class PostCursorPagination(CursorPagination):
+    """Keyset pagination over (created_at, id), newest first"""
+    ordering = ("-created_at", "-id")
+    page_size_query_param = "page_size"
+    max_page_size = settings.MAX_PAGE_SIZE
+
+    def get_ordering(self, request, queryset, view) -> tuple[str, str]:
+        return (f"-{post_position_field(queryset)}", "-id")
+
+
+class CommentCursorPagination(CursorPagination):
+    """Keyset pagination over (created_at, id), oldest first
+
+    Comment lists are filtered to one post, so pages walk the
+    (post, created_at, id) index of Commentary.
+    """
+    ordering = ("created_at", "id")
+    page_size_query_param = "page_size"
+    max_page_size = settings.MAX_PAGE_SIZE
+
+
+class FollowCursorPagination(CursorPagination):
+    """Keyset pagination over follow rows by id, newest follow first
+
+    Pages carry no total, profiles store their follower/following counts.
+    """
+    ordering = ("-id",)
+    page_size_query_param = "page_size"
+    max_page_size = settings.MAX_PAGE_SIZE
+
+
+class CappedLimitOffsetPagination(LimitOffsetPagination):
+    max_limit = settings.MAX_PAGE_SIZE
@@ -11,7 +11,7 @@ class IsOwnerOrReadOnlyComment(BasePermission):
     def has_object_permission(self, request, view, obj):
         return (
             request.method in SAFE_METHODS
-            or obj.user == request.user.profile
+            or obj.user_id == request.user.profile.pk
         )
 
 
@@ -25,7 +25,7 @@ class IsOwnerOrReadOnlyPost(BasePermission):
     def has_object_permission(self, request, view, obj):
         return (
             request.method in SAFE_METHODS
-            or obj.posted_by == request.user.profile
+            or obj.posted_by_id == request.user.profile.pk
         )
 
 
@@ -39,5 +39,5 @@ class IsOwnerOrReadOnlyProfile(BasePermission):
     def has_object_permission(self, request, view, obj):
         return (
             request.method in SAFE_METHODS
-            or obj.user == request.user
+            or obj.user_id == request.user.pk
         )
@@ -0,0 +1,292 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+from django.db.models.signals import m2m_changed
+
+from social_media import tasks
+from social_media.models import Commentary, Post, Profile
+
+
+PostLike = Profile.likes.through
+Follow = Profile.follows.through
+
+
+def _send_m2m_changed(sender, instance, action, model, pk_set) -> None:
+    # bulk writes on the through table bypass the related manager, so
+    # announce them the way add()/remove() would for signal receivers
+    m2m_changed.send(
+        sender=sender,
+        instance=instance,
+        action=action,
+        reverse=False,
+        model=model,
+        pk_set=set(pk_set),
+        using=instance._state.db,
+    )
+
+
+def _lock(profile: Profile) -> None:
+    # serialize like/follow writes of one profile, so concurrent toggles
+    # see each other's rows instead of both inserting or both deleting
+    Profile.objects.select_for_update().filter(pk=profile.pk).exists()
+
+
+def _lock_follow(profile: Profile, profile_ids) -> None:
+    # follows update the counters of both ends; taking every row lock up
+    # front in pk order keeps A following B while B follows A from
+    # locking the two rows in opposite order and deadlocking
+    list(
+        Profile.objects.select_for_update()
+        .filter(pk__in={profile.pk, *profile_ids})
+        .order_by("pk").values_list("pk", flat=True)
+    )
+
+
+def followed_ids(profile: Profile, reverse: bool,
+                 pk_set: set[int] | None = None) -> set[int]:
+    """Ids at the other end of the profile's follow edges
+
+    Profiles it follows, or its followers when reverse, limited to pk_set.
+    """
+    if reverse:
+        edges = Follow.objects.filter(to_profile_id=profile.pk)
+        column = "from_profile_id"
+    else:
+        edges = Follow.objects.filter(from_profile_id=profile.pk)
+        column = "to_profile_id"
+    if pk_set is not None:
+        edges = edges.filter(**{f"{column}__in": pk_set})
+    return set(edges.values_list(column, flat=True))
+
+
+def _shift(queryset, field: str, delta: int) -> None:
+    queryset.update(**{field: Greatest(F(field) + delta, 0)})
+
+
+def _backfill_shrunk_audiences(profile_ids, removed: int) -> None:
+    # authors whose follower count just fell to the fan-out limit switch
+    # from being read on demand to fan-out on write
+    limit = settings.TIMELINE["FANOUT_LIMIT"]
+    crossed = Profile.objects.filter(
+        pk__in=profile_ids,
+        follower_count__lte=limit,
+        follower_count__gt=limit - removed,
+    ).values_list("id", flat=True)
+    for author_id in crossed:
+        tasks.backfill_followers.delay(author_id)
+
+
+def change_follow_counts(profile_id: int, other_ids: set[int],
+                         reverse: bool, delta: int) -> None:
+    """Move stored follow counters by delta for each edge to other_ids
+
+    Edges go from profile_id to other_ids, or the other way when reverse.
+    """
+    if not other_ids:
+        return
+    if reverse:
+        own, others = "follower_count", "following_count"
+    else:
+        own, others = "following_count", "follower_count"
+    _shift(Profile.objects.filter(pk=profile_id), own,
+           delta * len(other_ids))
+    _shift(Profile.objects.filter(pk__in=other_ids), others, delta)
+    if delta < 0:
+        if reverse:
+            _backfill_shrunk_audiences([profile_id], -delta * len(other_ids))
+        else:
+            _backfill_shrunk_audiences(other_ids, -delta)
+
+
+def release_follow_counts(profile: Profile) -> None:
+    """Drop the edges of a profile about to be deleted from the counters"""
+    with transaction.atomic():
+        followed = followed_ids(profile, False)
+        _shift(
+            Profile.objects.filter(id__in=followed),
+            "follower_count",
+            -1,
+        )
+        _backfill_shrunk_audiences(followed, 1)
+        _shift(
+            Profile.objects.filter(id__in=followed_ids(profile, True)),
+            "following_count",
+            -1,
+        )
+
+
+def release_post_counts(profile: Profile) -> None:
+    """Drop the likes and comments of a profile about to be deleted
+
+    They go with it by cascade, which bypasses the F() updates of the
+    like and comment endpoints.
+    """
+    with transaction.atomic():
+        _shift(
+            Post.objects.filter(
+                id__in=PostLike.objects.filter(profile_id=profile.pk)
+                .values("post_id")
+            ),
+            "like_count",
+            -1,
+        )
+        per_post = (Commentary.objects.filter(user_id=profile.pk)
+                    .order_by().values("post_id")
+                    .annotate(comments=Count("id"))
+                    .values_list("post_id", "comments"))
+        post_ids_by_count: dict[int, list[int]] = {}
+        for post_id, comments in per_post:
+            post_ids_by_count.setdefault(comments, []).append(post_id)
+        for comments, post_ids in post_ids_by_count.items():
+            _shift(Post.objects.filter(id__in=post_ids),
+                   "comment_count", -comments)
+
+
+def like_posts(profile: Profile, post_ids: list[int]) -> dict[int, str]:
+    """Like every listed post that exists and is not liked yet"""
+    with transaction.atomic():
+        _lock(profile)
+        found = set(
+            Post.objects.filter(id__in=post_ids).values_list("id", flat=True)
+        )
+        liked = set(
+            PostLike.objects.filter(profile=profile, post_id__in=post_ids)
+            .values_list("post_id", flat=True)
+        )
+        added = found - liked
+        if added:
+            _send_m2m_changed(PostLike, profile, "pre_add", Post, added)
+            PostLike.objects.bulk_create(
+                [PostLike(profile=profile, post_id=pk) for pk in added],
+                ignore_conflicts=True,
+            )
+            Post.objects.filter(id__in=added).update(
+                like_count=F("like_count") + 1
+            )
+            _send_m2m_changed(PostLike, profile, "post_add", Post, added)
+
+    if added:
+        tasks.record_likes(list(added))
+
+    return {
+        pk: "not_found" if pk not in found
+        else "already_liked" if pk in liked else "liked"
+        for pk in post_ids
+    }
+
+
+def unlike_posts(profile: Profile, post_ids: list[int]) -> dict[int, str]:
+    """Remove likes from every listed post that is currently liked"""
+    with transaction.atomic():
+        _lock(profile)
+        liked = set(
+            PostLike.objects.filter(profile=profile, post_id__in=post_ids)
+            .values_list("post_id", flat=True)
+        )
+        if liked:
+            _send_m2m_changed(PostLike, profile, "pre_remove", Post, liked)
+            PostLike.objects.filter(
+                profile=profile, post_id__in=liked
+            ).delete()
+            Post.objects.filter(id__in=liked, like_count__gt=0).update(
+                like_count=F("like_count") - 1
+            )
+            _send_m2m_changed(PostLike, profile, "post_remove", Post, liked)
+
+    return {
+        pk: "unliked" if pk in liked else "not_liked" for pk in post_ids
+    }
+
+
+def follow_profiles(profile: Profile,
+                    profile_ids: list[int]) -> dict[int, str]:
+    """Follow every listed profile that exists and is not followed yet"""
+    with transaction.atomic():
+        _lock_follow(profile, profile_ids)
+        found = set(
+            Profile.objects.filter(id__in=profile_ids)
+            .values_list("id", flat=True)
+        )
+        followed = set(
+            Follow.objects.filter(
+                from_profile=profile, to_profile_id__in=profile_ids
+            ).values_list("to_profile_id", flat=True)
+        )
+        added = found - followed
+        if added:
+            _send_m2m_changed(Follow, profile, "pre_add", Profile, added)
+            Follow.objects.bulk_create(
+                [Follow(from_profile=profile, to_profile_id=pk)
+                 for pk in added],
+                ignore_conflicts=True,
+            )
+            _send_m2m_changed(Follow, profile, "post_add", Profile, added)
+
+    for pk in added:
+        tasks.sync_follow.delay(profile.id, pk)
+
+    return {
+        pk: "not_found" if pk not in found
+        else "already_following" if pk in followed else "followed"
+        for pk in profile_ids
+    }
+
+
+def unfollow_profiles(profile: Profile,
+                      profile_ids: list[int]) -> dict[int, str]:
+    """Stop following every listed profile that is currently followed"""
+    with transaction.atomic():
+        _lock_follow(profile, profile_ids)
+        followed = set(
+            Follow.objects.filter(
+                from_profile=profile, to_profile_id__in=profile_ids
+            ).values_list("to_profile_id", flat=True)
+        )
+        if followed:
+            _send_m2m_changed(
+                Follow, profile, "pre_remove", Profile, followed
+            )
+            Follow.objects.filter(
+                from_profile=profile, to_profile_id__in=followed
+            ).delete()
+            _send_m2m_changed(
+                Follow, profile, "post_remove", Profile, followed
+            )
+
+    for pk in followed:
+        tasks.sync_follow.delay(profile.id, pk)
+
+    return {
+        pk: "unfollowed" if pk in followed else "not_following"
+        for pk in profile_ids
+    }
+
+
+def toggle_like(profile: Profile, post_id: int) -> tuple[str, int]:
+    """Flip the like on one post, return the result and new like count"""
+    with transaction.atomic():
+        _lock(profile)
+        if PostLike.objects.filter(profile=profile, post_id=post_id).exists():
+            result = unlike_posts(profile, [post_id])[post_id]
+        else:
+            result = like_posts(profile, [post_id])[post_id]
+        like_count = (Post.objects.filter(pk=post_id)
+                      .values_list("like_count", flat=True).first())
+    return result, like_count
+
+
+def toggle_follow(profile: Profile, profile_id: int) -> tuple[str, int]:
+    """Flip the follow of one profile, return the result and its followers"""
+    with transaction.atomic():
+        _lock_follow(profile, [profile_id])
+        following = Follow.objects.filter(
+            from_profile=profile, to_profile_id=profile_id
+        ).exists()
+        if following:
+            result = unfollow_profiles(profile, [profile_id])[profile_id]
+        else:
+            result = follow_profiles(profile, [profile_id])[profile_id]
+        followers = (Profile.objects.filter(pk=profile_id)
+                     .values_list("follower_count", flat=True).first())
+    return result, followers
@@ -0,0 +1,211 @@
+import math
+import re
+import threading
+from collections import defaultdict
+
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+)
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F, Model, QuerySet
+
+from social_media.models import Post, Profile
+
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+def post_vector() -> SearchVector:
+    return (SearchVector("tags", weight="A", config="english")
+            + SearchVector("body", weight="B", config="english"))
+
+
+def profile_vector() -> SearchVector:
+    return (SearchVector("username", weight="A", config="simple")
+            + SearchVector("first_name", "last_name", weight="B",
+                           config="simple"))
+
+
+def tokenize(text: str | None) -> list[str]:
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+
+class InvertedIndex:
+    """Pure-Python term index used where Postgres full-text search is missing
+
+    Fields carry the same weights Postgres gives to A/B labels, results
+    are ranked by weighted tf-idf and every query term has to match.
+    Every change bumps a version in the shared cache, a process that sees
+    a version it did not make itself rebuilds its copy on the next search.
+    """
+
+    def __init__(self, model: type[Model], fields: dict[str, float]) -> None:
+        self.model = model
+        self.fields = fields
+        self.version_key = f"search-index:{model._meta.label_lower}"
+        self._postings: dict[str, dict[int, float]] = defaultdict(dict)
+        self._terms: dict[int, set[str]] = {}
+        self._built = False
+        self._version = None
+        self._lock = threading.RLock()
+
+    def add(self, instance: Model) -> None:
+        with self._lock:
+            if self._built:
+                self._remove(instance.pk)
+                self._add(instance.pk, {
+                    field: getattr(instance, field) for field in self.fields
+                })
+            self._changed()
+
+    def remove(self, pk: int) -> None:
+        with self._lock:
+            self._remove(pk)
+            self._changed()
+
+    def search(self, text: str) -> list[int]:
+        terms = set(tokenize(text))
+        with self._lock:
+            self._build()
+            if not terms:
+                return []
+            postings = [self._postings.get(term, {}) for term in terms]
+            matches = set.intersection(*(set(docs) for docs in postings))
+            total = len(self._terms)
+            scores = {
+                pk: sum(
+                    docs[pk] * math.log(1 + total / len(docs))
+                    for docs in postings
+                )
+                for pk in matches
+            }
+        return sorted(scores, key=lambda pk: (-scores[pk], -pk))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._postings.clear()
+            self._terms.clear()
+            self._built = False
+
+    def _changed(self) -> None:
+        cache.add(self.version_key, 0, None)
+        try:
+            version = cache.incr(self.version_key)
+        except ValueError:
+            version = None
+        # keep the local copy only if no other process changed it since
+        if not self._built or version is None or version != self._version + 1:
+            self.clear()
+        else:
+            self._version = version
+
+    def _build(self) -> None:
+        version = cache.get_or_set(self.version_key, 0, None)
+        if self._built and version == self._version:
+            return
+        self.clear()
+        rows = self.model.objects.values("pk", *self.fields)
+        for row in rows.iterator(chunk_size=2000):
+            self._add(row.pop("pk"), row)
+        self._built = True
+        self._version = version
+
+    def _add(self, pk: int, values: dict) -> None:
+        terms = set()
+        for field, weight in self.fields.items():
+            for term in tokenize(values[field]):
+                docs = self._postings[term]
+                docs[pk] = docs.get(pk, 0) + weight
+                terms.add(term)
+        self._terms[pk] = terms
+
+    def _remove(self, pk: int) -> None:
+        for term in self._terms.pop(pk, ()):
+            docs = self._postings[term]
+            docs.pop(pk, None)
+            if not docs:
+                del self._postings[term]
+
+
+post_index = InvertedIndex(Post, {"tags": 1.0, "body": 0.4})
+profile_index = InvertedIndex(
+    Profile, {"username": 1.0, "first_name": 0.4, "last_name": 0.4}
+)
+
+
+def uses_postgres() -> bool:
+    return connection.vendor == "postgresql"
+
+
+def index_post(post: Post) -> None:
+    if uses_postgres():
+        Post.objects.filter(pk=post.pk).update(search_vector=post_vector())
+    else:
+        post_index.add(post)
+
+
+def unindex_post(pk: int) -> None:
+    if not uses_postgres():
+        post_index.remove(pk)
+
+
+def index_profile(profile: Profile) -> None:
+    if uses_postgres():
+        Profile.objects.filter(pk=profile.pk).update(
+            search_vector=profile_vector()
+        )
+    else:
+        profile_index.add(profile)
+
+
+def unindex_profile(pk: int) -> None:
+    if not uses_postgres():
+        profile_index.remove(pk)
+
+
+class RankedResults:
+    """Ids ranked by an InvertedIndex, loaded from the queryset per slice
+
+    Paginators count it and slice one page out of it, so only the rows
+    of that page are fetched, in rank order.
+    """
+
+    def __init__(self, queryset: QuerySet, ids: list[int]) -> None:
+        self.queryset = queryset
+        self.ids = ids
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        ids = self.ids[key]
+        rows = self.queryset.in_bulk(ids) if ids else {}
+        return [rows[pk] for pk in ids if pk in rows]
+
+
+def search_posts(text: str) -> QuerySet | RankedResults:
+    posts = Post.objects.for_feed()
+    if uses_postgres():
+        query = SearchQuery(text, config="english", search_type="websearch")
+        return (posts.filter(search_vector=query)
+                .annotate(rank=SearchRank(F("search_vector"), query))
+                .order_by("-rank", "-created_at", "-id"))
+    return RankedResults(posts, post_index.search(text))
+
+
+def search_profiles(text: str) -> QuerySet | RankedResults:
+    profiles = Profile.objects.defer("search_vector")
+    if uses_postgres():
+        query = SearchQuery(text, config="simple", search_type="websearch")
+        return (profiles.filter(search_vector=query)
+                .annotate(rank=SearchRank(F("search_vector"), query))
+                .order_by("-rank", "username"))
+    return RankedResults(profiles, profile_index.search(text))
@@ -1,12 +1,31 @@
+from django.conf import settings
 from rest_framework import serializers
 
+from social_media import images
 from social_media.models import (
     Commentary,
     Profile,
     Post,
+    Suggestion,
+    Tag,
 )
 
 
+class ImageVariantsField(serializers.ReadOnlyField):
+    """URLs of the resized copies made from an image field"""
+
+    def __init__(self, image_field: str, **kwargs) -> None:
+        self.image_field = image_field
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        storage = (self.parent.Meta.model._meta
+                   .get_field(self.image_field).storage)
+        return images.variant_urls(
+            value, storage, self.context.get("request")
+        )
+
+
 class CommentarySerializer(serializers.ModelSerializer):
     user = serializers.CharField(source="user.username", read_only=True)
 
@@ -15,14 +34,9 @@ class CommentarySerializer(serializers.ModelSerializer):
         fields = ("id", "user", "created_at", "body")
 
 
-class FollowerSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Profile
-        fields = ("id", "username",)
-        read_only_fields = ("id", "username",)
-
-
 class ProfileSerializer(serializers.ModelSerializer):
+    picture_variants = ImageVariantsField("profile_picture")
+
     class Meta:
         model = Profile
         fields = (
@@ -34,13 +48,11 @@ class ProfileSerializer(serializers.ModelSerializer):
             "location",
             "bio",
             "profile_picture",
+            "picture_variants",
         )
 
 
 class ProfileDetailSerializer(ProfileSerializer):
-    follows = FollowerSerializer(many=True, read_only=True)
-    followed_by = FollowerSerializer(many=True, read_only=True)
-
     class Meta:
         model = Profile
         fields = (
@@ -52,9 +64,19 @@ class ProfileDetailSerializer(ProfileSerializer):
             "location",
             "bio",
             "profile_picture",
-            "follows",
-            "followed_by",
+            "picture_variants",
+            "follower_count",
+            "following_count",
         )
+        read_only_fields = ("follower_count", "following_count")
+
+
+class SuggestionSerializer(serializers.ModelSerializer):
+    profile = ProfileSerializer(read_only=True)
+
+    class Meta:
+        model = Suggestion
+        fields = ("rank", "score", "mutual_follows", "co_likes", "profile")
 
 
 class PostSerializer(serializers.ModelSerializer):
@@ -62,8 +84,12 @@ class PostSerializer(serializers.ModelSerializer):
         source="posted_by.username",
         read_only=True
     )
-    commented = serializers.IntegerField(read_only=True)
-    likes = serializers.IntegerField(read_only=True)
+    commented = serializers.IntegerField(
+        source="comment_count",
+        read_only=True
+    )
+    likes = serializers.IntegerField(source="like_count", read_only=True)
+    attachment_variants = ImageVariantsField("attachment")
 
     class Meta:
         model = Post
@@ -74,6 +100,7 @@ class PostSerializer(serializers.ModelSerializer):
             "body",
             "tags",
             "attachment",
+            "attachment_variants",
             "likes",
             "commented",
         )
@@ -81,12 +108,15 @@ class PostSerializer(serializers.ModelSerializer):
 
 
 class PostDetailSerializer(PostSerializer):
-    comments = CommentarySerializer(many=True, read_only=True)
+    comments = CommentarySerializer(
+        source="latest_comments",
+        many=True,
+        read_only=True
+    )
     posted_by = serializers.CharField(
         source="posted_by.username",
         read_only=True
     )
-    likes = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Post
@@ -97,7 +127,33 @@ class PostDetailSerializer(PostSerializer):
             "body",
             "tags",
             "attachment",
+            "attachment_variants",
             "likes",
+            "commented",
             "comments",
         )
         read_only_fields = ("id", "created_at",)
+
+
+class TagSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Tag
+        fields = ("id", "name", "post_count")
+
+
+class BulkLikeSerializer(serializers.Serializer):
+    action = serializers.ChoiceField(choices=("like", "unlike"))
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BULK_ACTION_MAX_IDS,
+    )
+
+
+class BulkFollowSerializer(serializers.Serializer):
+    action = serializers.ChoiceField(choices=("follow", "unfollow"))
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BULK_ACTION_MAX_IDS,
+    )
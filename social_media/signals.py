@@ -0,0 +1,146 @@
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from social_media import cache, images, relations, search, tags
+from social_media.models import Commentary, Post, Profile
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, **kwargs) -> None:
+    search.index_post(instance)
+
+
+@receiver(post_save, sender=Post)
+def sync_post_tags(sender, instance, created, update_fields, **kwargs) -> None:
+    if update_fields is None or "tags" in update_fields:
+        tags.sync_post_tags(instance, created=created)
+
+
+@receiver(pre_delete, sender=Post)
+def release_post_tags(sender, instance, **kwargs) -> None:
+    tags.release_post_tags(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs) -> None:
+    search.unindex_post(instance.pk)
+
+
+@receiver(pre_save, sender=Post)
+@receiver(pre_save, sender=Profile)
+def strip_image_metadata(sender, instance, **kwargs) -> None:
+    images.strip_upload(instance)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Profile)
+def process_image(sender, instance, update_fields, **kwargs) -> None:
+    if images.needs_processing(instance, update_fields):
+        images.schedule(instance)
+
+
+@receiver(post_save, sender=Profile)
+def index_profile(sender, instance, **kwargs) -> None:
+    search.index_profile(instance)
+
+
+@receiver(pre_delete, sender=Profile)
+def release_follow_counts(sender, instance, **kwargs) -> None:
+    relations.release_follow_counts(instance)
+
+
+@receiver(pre_delete, sender=Profile)
+def release_post_counts(sender, instance, **kwargs) -> None:
+    relations.release_post_counts(instance)
+
+
+@receiver(post_delete, sender=Profile)
+def unindex_profile(sender, instance, **kwargs) -> None:
+    search.unindex_profile(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Post)
+def invalidate_post(sender, instance, **kwargs) -> None:
+    cache.invalidate_posts([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=Commentary)
+def invalidate_commented_post(sender, instance, **kwargs) -> None:
+    cache.invalidate_posts([instance.post_id], lists=False)
+
+
+@receiver(pre_save, sender=Profile)
+def detect_rename(sender, instance, update_fields, **kwargs) -> None:
+    # the username is the only profile field embedded in post payloads
+    instance._renamed = False
+    if instance.pk is None:
+        return
+    if update_fields is not None and "username" not in update_fields:
+        return
+    stored = (Profile.objects.filter(pk=instance.pk)
+              .values_list("username", flat=True).first())
+    instance._renamed = stored is not None and stored != instance.username
+
+
+@receiver(post_save, sender=Profile)
+def invalidate_profile(sender, instance, **kwargs) -> None:
+    cache.invalidate_profiles([instance.pk])
+    if getattr(instance, "_renamed", False):
+        cache.invalidate_posts(instance.posts.values_list("id", flat=True))
+
+
+@receiver(post_delete, sender=Profile)
+def invalidate_deleted_profile(sender, instance, **kwargs) -> None:
+    # its posts are deleted with it and invalidate their own keys
+    cache.invalidate_profiles([instance.pk])
+
+
+INVALIDATING_ACTIONS = ("post_add", "post_remove", "pre_clear")
+
+
+@receiver(m2m_changed, sender=Profile.likes.through)
+def invalidate_liked_posts(sender, instance, action, reverse, pk_set,
+                           **kwargs) -> None:
+    if action not in INVALIDATING_ACTIONS:
+        return
+    if reverse:
+        cache.invalidate_posts([instance.pk], lists=False)
+    elif action == "pre_clear":
+        cache.invalidate_posts(
+            instance.likes.values_list("id", flat=True), lists=False
+        )
+    else:
+        cache.invalidate_posts(pk_set, lists=False)
+
+
+@receiver(m2m_changed, sender=Profile.follows.through)
+def invalidate_follow_graph(sender, instance, action, reverse, pk_set,
+                            **kwargs) -> None:
+    if action not in INVALIDATING_ACTIONS:
+        return
+    if action == "pre_clear":
+        related = instance.followed_by if reverse else instance.follows
+        pk_set = related.values_list("id", flat=True)
+    cache.invalidate_profiles([instance.pk, *pk_set])
+
+
+@receiver(m2m_changed, sender=Profile.follows.through)
+def count_follows(sender, instance, action, reverse, pk_set,
+                  **kwargs) -> None:
+    # removals are counted before the rows go, against the edges that
+    # really exist, since remove() passes on ids that were never followed
+    if action == "post_add":
+        relations.change_follow_counts(instance.pk, pk_set, reverse, 1)
+    elif action in ("pre_remove", "pre_clear"):
+        relations.change_follow_counts(
+            instance.pk,
+            relations.followed_ids(instance, reverse, pk_set),
+            reverse,
+            -1,
+        )
@@ -0,0 +1,209 @@
+import itertools
+from dataclasses import dataclass
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, QuerySet
+from django.utils import timezone
+
+from social_media.models import Profile, Suggestion
+
+
+Follow = Profile.follows.through
+PostLike = Profile.likes.through
+
+
+@dataclass
+class Adjacency:
+    """Compressed sparse rows: row r links to indices[indptr[r]:indptr[r+1]]"""
+    indptr: np.ndarray
+    indices: np.ndarray
+
+    @classmethod
+    def from_edges(cls, rows: np.ndarray, cols: np.ndarray,
+                   size: int) -> "Adjacency":
+        order = np.argsort(rows, kind="stable")
+        indptr = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=size), out=indptr[1:])
+        return cls(indptr, cols[order])
+
+    @property
+    def degree(self) -> np.ndarray:
+        return np.diff(self.indptr)
+
+    def row(self, row: int) -> np.ndarray:
+        return self.indices[self.indptr[row]:self.indptr[row + 1]]
+
+    def gather(self, rows: np.ndarray) -> np.ndarray:
+        """Links of all the rows concatenated, repeats included"""
+        starts = self.indptr[rows]
+        lengths = self.indptr[rows + 1] - starts
+        total = int(lengths.sum())
+        # shift every position of a row's slice by where its row starts
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return self.indices[offsets + np.arange(total)]
+
+
+@dataclass
+class Graph:
+    """Follow and like graphs over dense profile and post indices"""
+    profile_ids: np.ndarray
+    follows: Adjacency
+    likes: Adjacency
+    likers: Adjacency
+    follows_degree: np.ndarray
+    likers_degree: np.ndarray
+
+
+def _load_pairs(queryset: QuerySet, chunk_size: int) -> np.ndarray:
+    pairs = itertools.chain.from_iterable(
+        queryset.iterator(chunk_size=chunk_size)
+    )
+    return np.fromiter(pairs, dtype=np.int64).reshape(-1, 2)
+
+
+def load_graph(chunk_size: int = 10000) -> Graph:
+    """Read the follow and like edge lists into CSR adjacency arrays"""
+    profile_ids = np.fromiter(
+        Profile.objects.order_by("id").values_list("id", flat=True)
+        .iterator(chunk_size=chunk_size),
+        dtype=np.int64,
+    )
+    size = len(profile_ids)
+    follows = _load_pairs(
+        Follow.objects.order_by().values_list(
+            "from_profile_id", "to_profile_id"
+        ),
+        chunk_size,
+    )
+    likes = _load_pairs(
+        PostLike.objects.order_by().values_list("profile_id", "post_id"),
+        chunk_size,
+    )
+
+    # edges of profiles created after the id list was read are dropped
+    def positions(ids: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        found = np.minimum(np.searchsorted(profile_ids, ids), max(size - 1, 0))
+        return found.astype(np.int32), profile_ids[found] == ids
+
+    followers, known_followers = positions(follows[:, 0])
+    followed, known_followed = positions(follows[:, 1])
+    known = known_followers & known_followed
+    follows_adjacency = Adjacency.from_edges(
+        followers[known], followed[known], size
+    )
+
+    likers, known = positions(likes[:, 0])
+    post_ids, posts = np.unique(likes[known, 1], return_inverse=True)
+    posts = posts.astype(np.int32)
+    likes_adjacency = Adjacency.from_edges(likers[known], posts, size)
+    likers_adjacency = Adjacency.from_edges(
+        posts, likers[known], len(post_ids)
+    )
+
+    return Graph(
+        profile_ids=profile_ids,
+        follows=follows_adjacency,
+        likes=likes_adjacency,
+        likers=likers_adjacency,
+        follows_degree=follows_adjacency.degree,
+        likers_degree=likers_adjacency.degree,
+    )
+
+
+def suggest(graph: Graph, profile: int,
+            top_n: int) -> list[tuple[int, float, int, int]]:
+    """Best (profile, score, mutual follows, co-likes) for a dense index
+
+    Friends-of-friends are counted over the profiles it follows, co-likers
+    over the posts it liked; already followed profiles are left out.
+    """
+    config = settings.SUGGESTIONS
+    followed = graph.follows.row(profile)
+    hops = followed[graph.follows_degree[followed] <= config["HUB_LIMIT"]]
+    liked = graph.likes.row(profile)
+    liked = liked[graph.likers_degree[liked] <= config["HUB_LIMIT"]]
+
+    friends_of_friends = graph.follows.gather(hops)
+    co_likers = graph.likers.gather(liked)
+    candidates, inverse = np.unique(
+        np.concatenate([friends_of_friends, co_likers]), return_inverse=True
+    )
+    split = len(friends_of_friends)
+    mutual = np.bincount(inverse[:split], minlength=len(candidates))
+    co_likes = np.bincount(inverse[split:], minlength=len(candidates))
+
+    keep = (candidates != profile) & ~np.isin(
+        candidates, followed, assume_unique=True
+    )
+    candidates, mutual, co_likes = (
+        candidates[keep], mutual[keep], co_likes[keep]
+    )
+    scores = (mutual * config["FOLLOW_WEIGHT"]
+              + co_likes * config["LIKE_WEIGHT"])
+
+    if len(candidates) > top_n:
+        best = np.argpartition(-scores, top_n)[:top_n]
+    else:
+        best = np.arange(len(candidates))
+    # highest score first, lowest index breaks ties
+    best = best[np.lexsort((candidates[best], -scores[best]))]
+    return [
+        (int(candidates[i]), float(scores[i]), int(mutual[i]),
+         int(co_likes[i]))
+        for i in best
+    ]
+
+
+def refresh(batch_size: int = 1000,
+            chunk_size: int = 10000) -> dict[str, int]:
+    """Recompute and store the top suggestions of every profile"""
+    top_n = settings.SUGGESTIONS["TOP_N"]
+    graph = load_graph(chunk_size)
+    profile_ids = graph.profile_ids
+    now = timezone.now()
+    stored = 0
+
+    for start in range(0, len(profile_ids), batch_size):
+        owners = range(start, min(start + batch_size, len(profile_ids)))
+        rows = [
+            Suggestion(
+                owner_id=int(profile_ids[owner]),
+                profile_id=int(profile_ids[candidate]),
+                rank=rank,
+                score=score,
+                mutual_follows=mutual,
+                co_likes=co_likes,
+                refreshed_at=now,
+            )
+            for owner in owners
+            for rank, (candidate, score, mutual, co_likes) in enumerate(
+                suggest(graph, owner, top_n), start=1
+            )
+        ]
+        owner_ids = profile_ids[owners.start:owners.stop].tolist()
+        with transaction.atomic():
+            # profiles deleted since the graph was read cannot be stored
+            existing = set(
+                Profile.objects.filter(
+                    id__in={row.profile_id for row in rows}
+                ).values_list("id", flat=True)
+            )
+            rows = [row for row in rows if row.profile_id in existing]
+            Suggestion.objects.filter(owner_id__in=owner_ids).delete()
+            Suggestion.objects.bulk_create(rows, ignore_conflicts=True)
+        stored += len(rows)
+
+    return {"profiles": len(profile_ids), "suggestions": stored}
+
+
+def for_profile(profile_id: int) -> QuerySet:
+    """Stored suggestions of a profile, minus ones it followed since"""
+    followed = Follow.objects.filter(
+        from_profile_id=profile_id, to_profile_id=OuterRef("profile_id")
+    )
+    return (Suggestion.objects.filter(owner_id=profile_id)
+            .exclude(Exists(followed))
+            .select_related("profile")
+            .order_by("rank"))
@@ -0,0 +1,71 @@
+import re
+
+from django.db import transaction
+from django.db.models import F
+
+from social_media.models import Post, PostTag, Tag
+
+
+TAG_RE = re.compile(r"[\w-]+")
+
+
+def parse_tags(text: str | None) -> list[str]:
+    """Split a free-form tag string ("snow, #winter") into tag names"""
+    names = []
+    for name in TAG_RE.findall(text.lower()) if text else []:
+        name = name[:100]
+        if name not in names:
+            names.append(name)
+    return names
+
+
+def _tag_changes(post: Post, names: set[str],
+                 created: bool) -> tuple[list[int], set[str]]:
+    """Ids of tags to unlink from the post and names of tags to link"""
+    current = {} if created else dict(
+        PostTag.objects.filter(post=post).values_list("tag__name", "tag_id")
+    )
+    removed = [tag_id for name, tag_id in current.items() if name not in names]
+    return removed, names - current.keys()
+
+
+def sync_post_tags(post: Post, created: bool = False) -> None:
+    """Bring PostTag rows and Tag counters in line with post.tags"""
+    names = set(parse_tags(post.tags))
+    removed, added = _tag_changes(post, names, created)
+    if not removed and not added:
+        return
+
+    with transaction.atomic():
+        # serialize syncs of one post and read its rows again under the
+        # lock, so counters only move for rows really inserted or deleted
+        Post.objects.select_for_update().filter(pk=post.pk).exists()
+        removed, added = _tag_changes(post, names, created)
+        if removed:
+            PostTag.objects.filter(post=post, tag_id__in=removed).delete()
+            Tag.objects.filter(id__in=removed, post_count__gt=0).update(
+                post_count=F("post_count") - 1
+            )
+        if added:
+            Tag.objects.bulk_create(
+                [Tag(name=name) for name in added], ignore_conflicts=True
+            )
+            tag_ids = list(
+                Tag.objects.filter(name__in=added).values_list("id", flat=True)
+            )
+            PostTag.objects.bulk_create([
+                PostTag(post=post, tag_id=tag_id, created_at=post.created_at)
+                for tag_id in tag_ids
+            ])
+            Tag.objects.filter(id__in=tag_ids).update(
+                post_count=F("post_count") + 1
+            )
+
+
+def release_post_tags(post: Post) -> None:
+    """Decrement tag counters for a post that is about to be deleted"""
+    tag_ids = list(post.post_tags.values_list("tag_id", flat=True))
+    if tag_ids:
+        Tag.objects.filter(id__in=tag_ids, post_count__gt=0).update(
+            post_count=F("post_count") - 1
+        )
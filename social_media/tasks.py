@@ -0,0 +1,72 @@
+import time
+from datetime import datetime, timezone
+
+from django.apps import apps
+from django.conf import settings
+
+from social_media import images, timeline, trending
+from social_media.models import Post, Profile
+from task_queue.registry import task
+
+
+@task
+def fan_out_post(post_id: int) -> None:
+    """Push a new post into the timelines of the author's followers"""
+    post = (Post.objects.filter(pk=post_id)
+            .only("id", "created_at", "posted_by_id").first())
+    if post is not None:
+        timeline.fan_out_post(post)
+        schedule_trim()
+
+
+@task
+def trim_timelines() -> None:
+    """Drop stored timeline entries past the configured depth"""
+    timeline.get_backend().trim_overflow()
+
+
+def schedule_trim() -> None:
+    # one trim per interval however many posts fan out in it
+    interval = settings.TIMELINE["TRIM_INTERVAL"]
+    slot = int(time.time()) // interval
+    trim_timelines.enqueue(
+        idempotency_key=f"trim-timelines:{slot}", countdown=interval
+    )
+
+
+@task
+def sync_follow(owner_id: int, author_id: int) -> None:
+    """Backfill or prune a timeline to match the current follow state"""
+    following = Profile.follows.through.objects.filter(
+        from_profile_id=owner_id, to_profile_id=author_id
+    ).exists()
+    timeline.follow_changed(owner_id, author_id, following=following)
+
+
+@task
+def backfill_followers(author_id: int) -> None:
+    """Refill follower timelines of an author back under the fan-out limit"""
+    timeline.audience_shrank(author_id)
+
+
+@task
+def process_image(model_label: str, pk: int) -> None:
+    """Generate resized variants of an uploaded image"""
+    images.process(apps.get_model(model_label), pk)
+
+
+@task
+def record_activity(post_ids: list[int], field: str,
+                    timestamp: float) -> None:
+    """Count likes or comments of posts towards trending"""
+    trending.record_activity(
+        post_ids, field, datetime.fromtimestamp(timestamp, tz=timezone.utc)
+    )
+
+
+def record_likes(post_ids: list[int]) -> None:
+    record_activity.delay(post_ids, "likes", time.time())
+
+
+def record_comment(post_id: int) -> None:
+    record_activity.delay([post_id], "comments", time.time())
@@ -1,3 +1,1692 @@
-from django.test import TestCase
+import csv
+import json
+import tempfile
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+from importlib import import_module
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connections
+from django.db.models.signals import m2m_changed
+from django.test import (
+    AsyncClient,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from social_media import (
+    fast_serializers,
+    relations,
+    search,
+    tags,
+    tasks,
+    timeline,
+    trending,
+)
+from social_media.models import (
+    ActivityBucket,
+    Commentary,
+    Post,
+    PostTag,
+    Profile,
+    Tag,
+    TimelineEntry,
+    TrendingItem,
+)
+from social_media.serializers import (
+    CommentarySerializer,
+    PostSerializer,
+    ProfileSerializer,
+)
+from social_media_api import throttling
+from task_queue.models import Task
+from task_queue.worker import execute
+from user.authentication import ClaimsRefreshToken
+
+
+TAGS_URL = reverse("social:tag-list")
+POSTS_URL = reverse("social:post-list-create")
+# an id no row in the test database gets
+MISSING = 10 ** 9
+
+
+def create_profile(username: str) -> Profile:
+    # no password, hashing one would dominate the seeding time
+    user = get_user_model().objects.create_user(
+        email=f"{username}@example.com"
+    )
+    return Profile.objects.create(user=user, username=username)
+
+
+def bearer(profile: Profile) -> str:
+    token = ClaimsRefreshToken.for_user(profile.user).access_token
+    return f"Bearer {token}"
+
+
+@override_settings(REPLICA_ROUTING={
+    **settings.REPLICA_ROUTING, "DATABASES": ["replica"],
+})
+class ReplicaRoutingTests(TransactionTestCase):
+    # the replica mirrors default, so it only sees committed rows
+    databases = {"default", "replica"}
+
+    def setUp(self) -> None:
+        caches[settings.REPLICA_ROUTING["CACHE_ALIAS"]].clear()
+        self.profile = create_profile("reader")
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=bearer(self.profile))
+
+    def request(self, method: str, url: str, client=None,
+                **kwargs) -> tuple[int, int]:
+        """Queries the request ran on the primary and on the replica"""
+        client = client or self.client
+        with CaptureQueriesContext(connections["default"]) as primary, \
+                CaptureQueriesContext(connections["replica"]) as replica:
+            response = getattr(client, method)(url, **kwargs)
+        self.assertLess(response.status_code, 400)
+        return len(primary), len(replica)
+
+    def test_reads_go_to_the_replica(self) -> None:
+        primary, replica = self.request("get", TAGS_URL)
+
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+    def test_writes_go_to_the_primary(self) -> None:
+        primary, replica = self.request(
+            "post", POSTS_URL, data={"body": "hello"}
+        )
+
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+    def test_reads_stay_on_the_primary_after_a_write(self) -> None:
+        self.request("post", POSTS_URL, data={"body": "hello"})
+
+        primary, replica = self.request("get", TAGS_URL)
+
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+    def test_stickiness_is_per_user(self) -> None:
+        other = APIClient()
+        other.credentials(HTTP_AUTHORIZATION=bearer(create_profile("other")))
+        self.request("post", POSTS_URL, data={"body": "hello"})
+
+        primary, replica = self.request("get", TAGS_URL, client=other)
+
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+    def test_reads_return_to_the_replica_after_the_sticky_window(
+        self
+    ) -> None:
+        with override_settings(REPLICA_ROUTING={
+            **settings.REPLICA_ROUTING, "STICKY_SECONDS": -1,
+        }):
+            self.request("post", POSTS_URL, data={"body": "hello"})
+
+        primary, replica = self.request("get", TAGS_URL)
+
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+    def test_refill_after_invalidation_reads_the_primary(self) -> None:
+        post = Post.objects.create(posted_by=self.profile, body="hello")
+        detail = reverse("social:post-detail", kwargs={"pk": post.pk})
+        reader = APIClient()
+        reader.credentials(
+            HTTP_AUTHORIZATION=bearer(create_profile("other"))
+        )
+        self.request("get", detail, client=reader)
+        self.request("post", reverse("social:post-comment",
+                                     kwargs={"pk": post.pk}),
+                     data={"body": "nice"})
+
+        primary, replica = self.request("get", detail, client=reader)
+
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+    def test_refill_returns_to_the_replica_once_it_caught_up(self) -> None:
+        post = Post.objects.create(posted_by=self.profile, body="hello")
+        detail = reverse("social:post-detail", kwargs={"pk": post.pk})
+        reader = APIClient()
+        reader.credentials(
+            HTTP_AUTHORIZATION=bearer(create_profile("other"))
+        )
+        with override_settings(REPLICA_ROUTING={
+            **settings.REPLICA_ROUTING, "STICKY_SECONDS": -1,
+        }):
+            self.request("post", reverse("social:post-comment",
+                                         kwargs={"pk": post.pk}),
+                         data={"body": "nice"})
+
+        primary, replica = self.request("get", detail, client=reader)
+
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+
+class QueryBudgetTests(TestCase):
+    """Every endpoint with a budget stays within it (strict in tests)"""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.profile = create_profile("reader")
+        cls.author = create_profile("author")
+        cls.profile.follows.add(cls.author)
+        for number in range(3):
+            post = Post.objects.create(
+                posted_by=cls.author, body=f"hello {number}", tags="news"
+            )
+            cls.profile.likes.add(post)
+            cls.comment = Commentary.objects.create(
+                user=cls.profile, post=post, body="nice"
+            )
+        cls.post = post
+        Post.objects.create(posted_by=cls.profile, body="hello mine")
+
+    def setUp(self) -> None:
+        self.authorization = bearer(self.profile)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=self.authorization)
+
+    def url_arguments(self) -> dict[str, dict]:
+        post = {"pk": self.post.pk}
+        profile = {"pk": self.author.pk}
+        return {
+            "social:post-detail": post,
+            "social:post-comment": post,
+            "social:comment-detail": {
+                "pi": self.post.pk, "pk": self.comment.pk,
+            },
+            "social:profile-detail": profile,
+            "social:profile-followers": profile,
+            "social:profile-following": {"pk": self.profile.pk},
+            "social-async:post-detail": post,
+            "social-async:post-comment": post,
+        }
+
+    def test_endpoints_stay_within_their_budget(self) -> None:
+        arguments = self.url_arguments()
+        for endpoint in settings.QUERY_INSTRUMENTATION["BUDGETS"]:
+            method, name = endpoint.split(" ")
+            url = reverse(name, kwargs=arguments.get(name))
+            with self.subTest(endpoint=endpoint):
+                # sync and async views share cached responses
+                caches[settings.RESPONSE_CACHE["ALIAS"]].clear()
+                response = self.client.generic(
+                    method, url, QUERY_STRING="q=hello"
+                )
+
+                self.assertEqual(response.status_code, 200)
+                self.assertNotIn("X-Query-Budget-Exceeded", response)
+
+    async def test_async_views_count_their_queries_under_asgi(self) -> None:
+        # their ORM calls run in other threads than the middleware
+        client = AsyncClient()
+        headers = {"authorization": self.authorization}
+        arguments = self.url_arguments()
+        budgets = settings.QUERY_INSTRUMENTATION["BUDGETS"]
+        for endpoint, budget in budgets.items():
+            method, name = endpoint.split(" ")
+            if not name.startswith("social-async:"):
+                continue
+            url = reverse(name, kwargs=arguments.get(name))
+            with self.subTest(endpoint=endpoint):
+                caches[settings.RESPONSE_CACHE["ALIAS"]].clear()
+                response = await client.generic(
+                    method, url, QUERY_STRING="q=hello", headers=headers
+                )
+
+                self.assertEqual(response.status_code, 200)
+                self.assertGreater(int(response["X-Query-Count"]), 0)
+                self.assertLessEqual(int(response["X-Query-Count"]), budget)
+
+
+class ConstantQueryTests(TestCase):
+    """List endpoints run as many queries for 10N rows as for N"""
+    ROWS = 3
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.profile = create_profile("reader")
+        cls.post = Post.objects.create(posted_by=cls.profile, body="thread")
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=bearer(self.profile))
+        self.seeded = 0
+
+    def seed(self, count: int) -> None:
+        """Add posts, likes and comments, each from a new followed author"""
+        for number in range(self.seeded, self.seeded + count):
+            author = create_profile(f"author{number}")
+            self.profile.follows.add(author)
+            post = Post.objects.create(
+                posted_by=author, body=f"post {number}", tags=f"tag{number}"
+            )
+            self.profile.likes.add(post)
+            Post.objects.create(posted_by=self.profile, body=f"own {number}")
+            Commentary.objects.create(
+                user=author, post=self.post, body=f"comment {number}"
+            )
+        self.seeded += count
+        # fan-out runs in tasks after commit, which tests never reach
+        timeline.rebuild(self.profile)
+
+    def get(self, url: str) -> list:
+        # sync and async views share cached responses
+        caches[settings.RESPONSE_CACHE["ALIAS"]].clear()
+        response = self.client.get(url, {"page_size": 100})
+        self.assertEqual(response.status_code, 200)
+        return response.json()["results"]
+
+    def assert_constant_queries(self, url: str) -> None:
+        self.seed(self.ROWS)
+        with CaptureQueriesContext(connections["default"]) as few:
+            self.assertGreaterEqual(len(self.get(url)), self.ROWS)
+
+        self.seed(self.ROWS * 9)
+        with self.assertNumQueries(len(few)):
+            self.assertGreaterEqual(len(self.get(url)), self.ROWS * 10)
+
+    def test_post_list(self) -> None:
+        self.assert_constant_queries(POSTS_URL)
+
+    def test_followed_posts(self) -> None:
+        self.assert_constant_queries(reverse("social:followed-posts"))
+
+    def test_liked_posts(self) -> None:
+        self.assert_constant_queries(reverse("social:liked-posts"))
+
+    def test_user_posts(self) -> None:
+        self.assert_constant_queries(reverse("social:user-posts"))
+
+    def test_comments(self) -> None:
+        self.assert_constant_queries(
+            reverse("social:post-comment", kwargs={"pk": self.post.pk})
+        )
+
+    def test_async_post_list(self) -> None:
+        self.assert_constant_queries(reverse("social-async:post-list"))
+
+    def test_async_followed_posts(self) -> None:
+        self.assert_constant_queries(reverse("social-async:followed-posts"))
+
+    def test_async_comments(self) -> None:
+        self.assert_constant_queries(
+            reverse("social-async:post-comment", kwargs={"pk": self.post.pk})
+        )
+
+    def test_following(self) -> None:
+        self.assert_constant_queries(reverse(
+            "social:profile-following", kwargs={"pk": self.profile.pk}
+        ))
+
+
+@override_settings(FAST_LIST_SERIALIZATION=False)
+class ModelSerializerConstantQueryTests(ConstantQueryTests):
+    """The same through the model serializers instead of values() rows"""
+
+
+class TokenBucketTests(SimpleTestCase):
+    rate = throttling.parse_rate("3/min")
+
+    def test_parse_rate(self) -> None:
+        self.assertEqual(throttling.parse_rate("30/min"),
+                         throttling.Rate(30, 60))
+        self.assertEqual(throttling.parse_rate("5/hour"),
+                         throttling.Rate(5, 3600))
+
+    def test_refill_adds_tokens_for_the_elapsed_time(self) -> None:
+        # one token every 20 seconds at 3/min
+        tokens, allowed, wait = throttling.refill(0, 100, self.rate, 130)
+
+        self.assertTrue(allowed)
+        self.assertAlmostEqual(tokens, 0.5)
+        self.assertEqual(wait, 0)
+
+    def test_refill_stops_at_capacity(self) -> None:
+        tokens, allowed, _ = throttling.refill(2, 0, self.rate, 3600)
+
+        self.assertTrue(allowed)
+        self.assertEqual(tokens, self.rate.capacity - 1)
+
+    def test_refill_reports_the_wait_for_the_next_token(self) -> None:
+        tokens, allowed, wait = throttling.refill(0.25, 100, self.rate, 100)
+
+        self.assertFalse(allowed)
+        self.assertEqual(tokens, 0.25)
+        self.assertAlmostEqual(wait, 15)
+
+    @mock.patch("social_media_api.throttling.time.time")
+    def test_burst_up_to_capacity_then_average_rate(self, now) -> None:
+        buckets = throttling.LocalTokenBuckets()
+        now.return_value = 1000
+
+        burst = [buckets.take("key", self.rate)[0] for _ in range(4)]
+        self.assertEqual(burst, [True, True, True, False])
+        self.assertEqual(buckets.take("other", self.rate), (True, 0.0))
+
+        now.return_value = 1019
+        allowed, wait = buckets.take("key", self.rate)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 1)
+
+        now.return_value = 1020
+        self.assertTrue(buckets.take("key", self.rate)[0])
+
+    def test_least_recently_used_buckets_are_dropped(self) -> None:
+        buckets = throttling.LocalTokenBuckets(max_entries=2)
+        for key in ("a", "b", "c"):
+            buckets.take(key, self.rate)
+
+        self.assertEqual(list(buckets._buckets), ["b", "c"])
+
+    def test_a_denying_bucket_leaves_the_others_full(self) -> None:
+        narrow = throttling.parse_rate("1/min")
+        caches[settings.THROTTLING["CACHE_ALIAS"]].clear()
+        for buckets in (throttling.LocalTokenBuckets(),
+                        throttling.CacheTokenBuckets()):
+            with self.subTest(backend=type(buckets).__name__):
+                both = [("wide", self.rate), ("narrow", narrow)]
+                self.assertTrue(buckets.take_all(both)[0])
+
+                allowed, wait = buckets.take_all(both)
+
+                self.assertFalse(allowed)
+                self.assertAlmostEqual(wait, 60, delta=1)
+                # only the first request took a token of "wide"
+                wide = [buckets.take("wide", self.rate)[0]
+                        for _ in range(3)]
+                self.assertEqual(wide, [True, True, False])
+
+
+class ScopeIdentTests(SimpleTestCase):
+    def request(self, user) -> Request:
+        request = Request(APIRequestFactory().get(
+            "/", REMOTE_ADDR="10.0.0.1"
+        ))
+        request.user = user
+        return request
+
+    def test_user_scope_keys_on_the_authenticated_user(self) -> None:
+        request = self.request(get_user_model()(pk=7))
+
+        ident = throttling.TokenBucketThrottle().scope_ident(request, "user")
+
+        self.assertEqual(ident, "user-7")
+
+    def test_user_scope_keys_anonymous_requests_on_the_ip(self) -> None:
+        request = self.request(AnonymousUser())
+
+        ident = throttling.TokenBucketThrottle().scope_ident(request, "user")
+
+        self.assertEqual(ident, "ip-10.0.0.1")
+
+    def test_ip_scope_keys_on_the_ip_even_when_authenticated(self) -> None:
+        request = self.request(get_user_model()(pk=7))
+
+        ident = throttling.TokenBucketThrottle().scope_ident(request, "ip")
+
+        self.assertEqual(ident, "ip-10.0.0.1")
+
+
+@override_settings(THROTTLING={
+    **settings.THROTTLING,
+    "ENABLED": True,
+    "BACKEND": "social_media_api.throttling.CacheTokenBuckets",
+    "RATES": {
+        "GET social:tag-list": {"user": "2/min"},
+        "GET social-async:post-list": {"user": "2/min"},
+    },
+})
+class ThrottledEndpointTests(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.profile = create_profile("reader")
+
+    def setUp(self) -> None:
+        caches[settings.THROTTLING["CACHE_ALIAS"]].clear()
+        throttling.get_buckets.cache_clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=bearer(self.profile))
+
+    def tearDown(self) -> None:
+        throttling.get_buckets.cache_clear()
+
+    def test_requests_over_the_rate_get_429_with_retry_after(self) -> None:
+        statuses = [self.client.get(TAGS_URL).status_code for _ in range(2)]
+        response = self.client.get(TAGS_URL)
+
+        self.assertEqual(statuses, [200, 200])
+        self.assertEqual(response.status_code, 429)
+        # the next token arrives 30 seconds after the bucket ran dry
+        self.assertEqual(response["Retry-After"], "30")
+
+    def test_async_views_are_throttled_too(self) -> None:
+        url = reverse("social-async:post-list")
+        statuses = [self.client.get(url).status_code for _ in range(2)]
+        response = self.client.get(url)
+
+        self.assertEqual(statuses, [200, 200])
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "30")
+        self.assertIn("detail", response.json())
+
+    def test_users_have_buckets_of_their_own(self) -> None:
+        for _ in range(3):
+            self.client.get(TAGS_URL)
+        other = APIClient()
+        other.credentials(HTTP_AUTHORIZATION=bearer(create_profile("other")))
+
+        response = other.get(TAGS_URL)
+
+        self.assertEqual(response.status_code, 200)
+
+
+class FollowListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.profile = create_profile("star")
+        cls.fans = [create_profile(f"fan{number}") for number in range(5)]
+        for fan in cls.fans:
+            fan.follows.add(cls.profile)
+            cls.profile.follows.add(fan)
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=bearer(self.profile))
+
+    def pages(self, name: str) -> list[dict]:
+        url = reverse(name, kwargs={"pk": self.profile.pk})
+        response = self.client.get(url, {"page_size": 2})
+        pages = [response.json()]
+        while pages[-1]["next"]:
+            pages.append(self.client.get(pages[-1]["next"]).json())
+        return pages
+
+    def assert_latest_first(self, name: str) -> None:
+        pages = self.pages(name)
+
+        self.assertEqual(len(pages), 3)
+        self.assertNotIn("count", pages[0])
+        self.assertEqual(
+            [row["username"] for page in pages for row in page["results"]],
+            [fan.username for fan in reversed(self.fans)],
+        )
+
+    def test_followers_latest_first(self) -> None:
+        self.assert_latest_first("social:profile-followers")
+
+    def test_following_latest_first(self) -> None:
+        self.assert_latest_first("social:profile-following")
+
+    def test_fast_and_model_serializers_agree(self) -> None:
+        fast = self.pages("social:profile-followers")
+        with override_settings(FAST_LIST_SERIALIZATION=False):
+            model = self.pages("social:profile-followers")
+
+        self.assertEqual(
+            [page["results"] for page in fast],
+            [page["results"] for page in model],
+        )
+
+    def test_unknown_profile(self) -> None:
+        url = reverse("social:profile-followers", kwargs={"pk": 0})
+
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class FollowedPostsPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.profile = create_profile("reader")
+        cls.author = create_profile("author")
+        cls.profile.follows.add(cls.author)
+        cls.posts = [
+            Post.objects.create(posted_by=cls.author, body=f"post {number}")
+            for number in range(7)
+        ]
+        # posts created in the same instant are ordered by id
+        tied = [post.pk for post in cls.posts[2:5]]
+        Post.objects.filter(pk__in=tied).update(
+            created_at=cls.posts[2].created_at
+        )
+        timeline.rebuild(cls.profile)
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=bearer(self.profile))
+
+    def pages(self, page_size: int) -> list[list[int]]:
+        response = self.client.get(
+            reverse("social:followed-posts"), {"page_size": page_size}
+        )
+        pages = [response.json()]
+        while pages[-1]["next"]:
+            pages.append(self.client.get(pages[-1]["next"]).json())
+        return [[row["id"] for row in page["results"]] for page in pages]
+
+    def expected_order(self) -> list[int]:
+        return list(
+            Post.objects.filter(posted_by=self.author)
+            .order_by("-created_at", "-id").values_list("id", flat=True)
+        )
+
+    def test_pages_walk_every_post_once_newest_first(self) -> None:
+        for page_size in (1, 2, 3, 7):
+            with self.subTest(page_size=page_size):
+                pages = self.pages(page_size)
+
+                self.assertTrue(all(len(page) <= page_size for page in pages))
+                self.assertEqual(sum(pages, []), self.expected_order())
+
+    def test_new_posts_do_not_shift_later_pages(self) -> None:
+        response = self.client.get(
+            reverse("social:followed-posts"), {"page_size": 3}
+        )
+        first = [row["id"] for row in response.json()["results"]]
+        newer = Post.objects.create(posted_by=self.author, body="newer")
+        timeline.rebuild(self.profile)
+
+        rest = self.client.get(response.json()["next"]).json()["results"]
+
+        seen = first + [row["id"] for row in rest]
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertNotIn(newer.pk, seen)
+        self.assertEqual(seen, self.expected_order()[1:7])
+
+
+@override_settings(TASK_QUEUE={**settings.TASK_QUEUE, "EAGER": True})
+class HomeFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.profile = create_profile("reader")
+        cls.author = create_profile("author")
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=bearer(self.profile))
+
+    def as_author(self, author: Profile) -> APIClient:
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=bearer(author))
+        return client
+
+    def toggle_follow(self, author: Profile) -> None:
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.get(reverse(
+                "social:profile-toggle-follow", kwargs={"pk": author.pk}
+            ))
+        self.assertEqual(response.status_code, 200)
+
+    def publish(self, author: Profile, body: str) -> int:
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.as_author(author).post(POSTS_URL, {"body": body})
+        self.assertEqual(response.status_code, 201)
+        return response.data["id"]
+
+    def feed(self) -> list[int]:
+        response = self.client.get(reverse("social:followed-posts"))
+        self.assertEqual(response.status_code, 200)
+        return [row["id"] for row in response.data["results"]]
+
+    def stored(self) -> set[int]:
+        return set(
+            TimelineEntry.objects.filter(owner=self.profile)
+            .values_list("post_id", flat=True)
+        )
+
+    def test_followed_posts_are_pushed_into_the_timeline(self) -> None:
+        older = self.publish(self.author, "before the follow")
+        self.toggle_follow(self.author)
+        newer = self.publish(self.author, "after the follow")
+
+        self.assertEqual(self.stored(), {older, newer})
+        self.assertEqual(self.feed(), [newer, older])
+
+    def test_unfollow_prunes_the_author(self) -> None:
+        other = create_profile("other")
+        self.toggle_follow(other)
+        kept = self.publish(other, "kept")
+        self.toggle_follow(self.author)
+        self.publish(self.author, "pruned")
+
+        self.toggle_follow(self.author)
+
+        self.assertEqual(self.stored(), {kept})
+        self.assertEqual(self.feed(), [kept])
+
+    @override_settings(TIMELINE={**settings.TIMELINE, "FANOUT_LIMIT": 1})
+    def test_authors_over_the_fanout_limit_are_read_on_demand(self) -> None:
+        popular = create_profile("popular")
+        create_profile("fan").follows.add(popular)
+        self.toggle_follow(self.author)
+        self.toggle_follow(popular)
+        pushed = self.publish(self.author, "pushed")
+        pulled = self.publish(popular, "pulled")
+
+        self.assertEqual(self.stored(), {pushed})
+        self.assertEqual(self.feed(), [pulled, pushed])
+
+    @override_settings(TASK_QUEUE={**settings.TASK_QUEUE, "EAGER": False})
+    def test_timeline_not_filled_yet_reads_followed_authors(self) -> None:
+        # follows and posts queued for a worker that has not run
+        self.toggle_follow(self.author)
+        post = self.publish(self.author, "queued fan-out")
+
+        self.assertEqual(self.stored(), set())
+        self.assertEqual(self.feed(), [post])
+
+
+class TimelineTrimTests(TestCase):
+    def test_trim_overflow_cuts_only_timelines_past_the_depth(self) -> None:
+        backend = timeline.DatabaseTimelineBackend(depth=2)
+        reader, other = create_profile("reader"), create_profile("other")
+        author = create_profile("author")
+        posts = [
+            Post.objects.create(posted_by=author, body=f"post {number}")
+            for number in range(3)
+        ]
+        for post in posts:
+            backend.push([reader.pk], post)
+        backend.push([other.pk], posts[0])
+
+        self.assertEqual(backend.overflowing_owners(), [reader.pk])
+        self.assertEqual(backend.trim_overflow(), 1)
+        self.assertEqual(
+            list(backend.post_ids(reader.pk).values_list("post_id",
+                                                         flat=True)),
+            [posts[2].pk, posts[1].pk],
+        )
+        self.assertEqual(TimelineEntry.objects.filter(owner=other).count(), 1)
+
+
+class CounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.author = create_profile("author")
+        cls.fan = create_profile("fan")
+        cls.posts = [
+            Post.objects.create(posted_by=cls.author, body=f"post {number}")
+            for number in range(2)
+        ]
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=bearer(self.fan))
+
+    def counts(self, post: Post) -> tuple[int, int]:
+        post.refresh_from_db(fields=["like_count", "comment_count"])
+        return post.like_count, post.comment_count
+
+    def comment(self, post: Post, body: str) -> int:
+        url = reverse("social:post-comment", kwargs={"pk": post.pk})
+        response = self.client.post(url, {"body": body})
+        self.assertEqual(response.status_code, 201)
+        return response.data["id"]
+
+    def test_like_and_unlike_move_the_like_count(self) -> None:
+        post = self.posts[0]
+
+        relations.like_posts(self.fan, [post.pk])
+        relations.like_posts(self.fan, [post.pk])
+        self.assertEqual(self.counts(post), (1, 0))
+
+        relations.unlike_posts(self.fan, [post.pk])
+        relations.unlike_posts(self.fan, [post.pk])
+        self.assertEqual(self.counts(post), (0, 0))
+
+    def test_comment_create_and_delete_move_the_comment_count(self) -> None:
+        post = self.posts[0]
+        comment_id = self.comment(post, "first")
+        self.comment(post, "second")
+        self.assertEqual(self.counts(post), (0, 2))
+
+        response = self.client.delete(reverse(
+            "social:comment-detail", kwargs={"pi": post.pk, "pk": comment_id}
+        ))
+
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.counts(post), (0, 1))
+
+    def test_deleting_a_profile_releases_its_likes_and_comments(self) -> None:
+        first, second = self.posts
+        other = create_profile("other")
+        relations.like_posts(self.fan, [first.pk, second.pk])
+        relations.like_posts(other, [first.pk])
+        self.comment(first, "one")
+        self.comment(first, "two")
+        self.comment(second, "three")
+
+        self.fan.delete()
+
+        self.assertEqual(self.counts(first), (1, 0))
+        self.assertEqual(self.counts(second), (0, 0))
+
+    def test_deleting_the_user_releases_its_likes(self) -> None:
+        relations.like_posts(self.fan, [self.posts[0].pk])
+
+        self.fan.user.delete()
+
+        self.assertEqual(self.counts(self.posts[0]), (0, 0))
+
+    def test_reconcile_counters_repairs_drift(self) -> None:
+        first, second = self.posts
+        relations.like_posts(self.fan, [first.pk])
+        self.fan.follows.add(self.author)
+        Commentary.objects.create(user=self.fan, post=first, body="hi")
+        Post.objects.filter(pk=first.pk).update(like_count=7, comment_count=0)
+        Post.objects.filter(pk=second.pk).update(like_count=3)
+        Profile.objects.filter(pk=self.author.pk).update(follower_count=0)
+        out = StringIO()
+
+        call_command("reconcile_counters", "--batch-size", 1, stdout=out)
+
+        self.assertIn("reconciled 2 posts and 1 profiles", out.getvalue())
+        self.assertEqual(self.counts(first), (1, 1))
+        self.assertEqual(self.counts(second), (0, 0))
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.follower_count, 1)
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.profile = create_profile("hiker")
+        cls.tagged = Post.objects.create(
+            posted_by=cls.profile, body="long day out", tags="snow"
+        )
+        cls.mentioned = Post.objects.create(
+            posted_by=cls.profile, body="snow on the trip", tags="trip"
+        )
+        Post.objects.create(posted_by=cls.profile, body="sunny beach")
+        create_profile("snowboarder")
+
+    def setUp(self) -> None:
+        search.post_index.clear()
+        search.profile_index.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=bearer(self.profile))
+
+    def found(self, name: str, text: str, **params) -> list:
+        response = self.client.get(reverse(name), {"q": text, **params})
+        self.assertEqual(response.status_code, 200)
+        key = "username" if name == "social:search-profiles" else "id"
+        return [row[key] for row in response.data["results"]]
+
+    def assert_ranks_tags_above_body(self) -> None:
+        self.assertEqual(
+            self.found("social:search-posts", "snow"),
+            [self.tagged.pk, self.mentioned.pk],
+        )
+        self.assertEqual(
+            self.found("social:search-posts", "snow trip"),
+            [self.mentioned.pk],
+        )
+        self.assertEqual(self.found("social:search-posts", "rain"), [])
+        self.assertEqual(
+            self.found("social:search-profiles", "hiker"), ["hiker"]
+        )
+
+    def test_postgres_full_text_search(self) -> None:
+        self.assert_ranks_tags_above_body()
+
+    def test_in_process_index_fallback(self) -> None:
+        with mock.patch.object(search, "uses_postgres", return_value=False):
+            self.assert_ranks_tags_above_body()
+
+    def test_fallback_loads_only_the_requested_page(self) -> None:
+        with mock.patch.object(search, "uses_postgres", return_value=False):
+            with CaptureQueriesContext(connections["default"]) as queries:
+                second = self.found("social:search-posts", "snow",
+                                    limit=1, offset=1)
+
+        self.assertEqual(second, [self.mentioned.pk])
+        loaded = [query["sql"] for query in queries
+                  if 'FROM "social_media_post"' in query["sql"]
+                  and "search_vector" not in query["sql"]]
+        self.assertTrue(any(
+            f'IN ({self.mentioned.pk})' in sql for sql in loaded
+        ))
+
+    def test_fallback_index_follows_changes_from_other_processes(self) -> None:
+        with mock.patch.object(search, "uses_postgres", return_value=False):
+            self.assertEqual(self.found("social:search-posts", "glacier"), [])
+            # written by another process: no signal here, only the version
+            post = Post.objects.bulk_create([
+                Post(posted_by=self.profile, body="glacier walk")
+            ])[0]
+            caches["default"].incr(search.post_index.version_key)
+
+            self.assertEqual(
+                self.found("social:search-posts", "glacier"), [post.pk]
+            )
+
+    def test_fallback_index_follows_local_saves_and_deletes(self) -> None:
+        with mock.patch.object(search, "uses_postgres", return_value=False):
+            self.assertEqual(self.found("social:search-posts", "snow"),
+                             [self.tagged.pk, self.mentioned.pk])
+            self.tagged.tags = "ice"
+            self.tagged.save()
+            self.mentioned.delete()
+
+            self.assertEqual(self.found("social:search-posts", "snow"), [])
+            self.assertEqual(self.found("social:search-posts", "ice"),
+                             [self.tagged.pk])
+
+
+class TagTests(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.profile = create_profile("hiker")
+
+    def counts(self) -> dict[str, int]:
+        return dict(Tag.objects.values_list("name", "post_count"))
+
+    def linked(self, post: Post) -> set[str]:
+        return set(post.post_tags.values_list("tag__name", flat=True))
+
+    def test_parse_tags(self) -> None:
+        self.assertEqual(
+            tags.parse_tags("Snow, #winter snow  x-country"),
+            ["snow", "winter", "x-country"],
+        )
+        self.assertEqual(tags.parse_tags(None), [])
+
+    def test_saving_a_post_syncs_its_tags(self) -> None:
+        post = Post.objects.create(
+            posted_by=self.profile, body="out", tags="snow, winter"
+        )
+        Post.objects.create(posted_by=self.profile, body="in", tags="snow")
+        self.assertEqual(self.linked(post), {"snow", "winter"})
+        self.assertEqual(self.counts(), {"snow": 2, "winter": 1})
+
+        post.tags = "winter #ice"
+        post.save()
+
+        self.assertEqual(self.linked(post), {"winter", "ice"})
+        self.assertEqual(
+            self.counts(), {"snow": 1, "winter": 1, "ice": 1}
+        )
+
+    def test_saving_other_fields_leaves_tags_alone(self) -> None:
+        post = Post.objects.create(
+            posted_by=self.profile, body="out", tags="snow"
+        )
+
+        with CaptureQueriesContext(connections["default"]) as queries:
+            post.body = "edited"
+            post.save(update_fields=["body"])
+
+        self.assertFalse(any("social_media_tag" in query["sql"]
+                             for query in queries))
+        self.assertEqual(self.counts(), {"snow": 1})
+
+    def test_deleting_a_post_releases_its_tags(self) -> None:
+        post = Post.objects.create(
+            posted_by=self.profile, body="out", tags="snow, winter"
+        )
+        Post.objects.create(posted_by=self.profile, body="in", tags="snow")
+
+        post.delete()
+
+        self.assertEqual(self.counts(), {"snow": 1, "winter": 0})
+        self.assertFalse(PostTag.objects.filter(post_id=post.pk).exists())
+
+    def test_migration_splits_existing_tags(self) -> None:
+        # rows from before the Tag tables, saved without signals
+        Post.objects.bulk_create([
+            Post(posted_by=self.profile, body="one", tags="Snow, winter"),
+            Post(posted_by=self.profile, body="two", tags="#snow"),
+            Post(posted_by=self.profile, body="three", tags=""),
+        ])
+        migration = import_module("social_media.migrations.0006_tags")
+
+        with self.assertNumQueries(5):
+            migration.split_tags(django_apps, None)
+
+        self.assertEqual(self.counts(), {"snow": 2, "winter": 1})
+        self.assertEqual(PostTag.objects.count(), 3)
+
+
+class TrendingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.profile = create_profile("hiker")
+        cls.snowy = Post.objects.create(
+            posted_by=cls.profile, body="out", tags="snow"
+        )
+        cls.plain = Post.objects.create(posted_by=cls.profile, body="in")
+        cls.now = datetime(2026, 1, 10, 12, 30, tzinfo=dt_timezone.utc)
+
+    def buckets(self) -> dict[tuple, tuple]:
+        return {
+            (kind, object_id, bucket): (likes, comments)
+            for kind, object_id, bucket, likes, comments
+            in ActivityBucket.objects.values_list(
+                "kind", "object_id", "bucket", "likes", "comments"
+            )
+        }
+
+    def test_likes_are_recorded_by_the_task_queue(self) -> None:
+        relations.like_posts(self.profile, [self.snowy.pk])
+
+        self.assertFalse(ActivityBucket.objects.exists())
+        queued = Task.objects.get(name="social_media.tasks.record_activity")
+        self.assertEqual(queued.args[:2], [[self.snowy.pk], "likes"])
+
+        execute(queued)
+
+        hour = trending.bucket_start(timezone.now())
+        tag_id = Tag.objects.get(name="snow").pk
+        self.assertEqual(self.buckets(), {
+            ("post", self.snowy.pk, hour): (1, 0),
+            ("tag", tag_id, hour): (1, 0),
+        })
+
+    def test_late_runs_count_in_the_bucket_of_the_activity(self) -> None:
+        earlier = timezone.now() - timedelta(hours=3)
+
+        tasks.record_activity([self.plain.pk], "comments",
+                              earlier.timestamp())
+
+        self.assertEqual(self.buckets(), {
+            ("post", self.plain.pk, trending.bucket_start(earlier)): (0, 1),
+        })
+
+    def test_buckets_roll_over_each_slot(self) -> None:
+        hour = datetime(2026, 1, 10, 12, tzinfo=dt_timezone.utc)
+        for minute in (0, 59):
+            trending.record_activity([self.plain.pk], "likes",
+                                     hour + timedelta(minutes=minute))
+        trending.record_activity([self.plain.pk, self.plain.pk], "likes",
+                                 hour + timedelta(minutes=60))
+
+        self.assertEqual(self.buckets(), {
+            ("post", self.plain.pk, hour): (2, 0),
+            ("post", self.plain.pk, hour + timedelta(hours=1)): (2, 0),
+        })
+
+    @override_settings(TRENDING={**settings.TRENDING, "TOP_K": 1})
+    def test_refresh_ranks_decayed_scores_and_drops_old_buckets(self) -> None:
+        recent = self.now - timedelta(minutes=30)
+        old = self.now - timedelta(hours=12)
+        expired = self.now - timedelta(
+            hours=settings.TRENDING["WINDOW_HOURS"] + 1
+        )
+        trending.record_activity([self.plain.pk], "likes", expired)
+        trending.record_activity([self.plain.pk] * 3, "likes", old)
+        trending.record_activity([self.snowy.pk], "comments", recent)
+
+        counts = trending.refresh(now=self.now)
+
+        self.assertEqual(counts, {"post": 2, "tag": 1})
+        self.assertFalse(ActivityBucket.objects.filter(
+            bucket__lt=trending.bucket_start(old)
+        ).exists())
+        # 2 points half an hour ago beat 3 points two half-lives ago
+        self.assertEqual(
+            list(TrendingItem.objects.values_list("kind", "object_id")),
+            [("post", self.snowy.pk), ("tag", Tag.objects.get().pk)],
+        )
+
+
+class ResponseCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.author = create_profile("author")
+        cls.fan = create_profile("fan")
+        cls.posts = [
+            Post.objects.create(posted_by=cls.author, body=f"post {number}")
+            for number in range(2)
+        ]
+
+    def setUp(self) -> None:
+        caches[settings.RESPONSE_CACHE["ALIAS"]].clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=bearer(self.fan))
+        self.detail = reverse(
+            "social:post-detail", kwargs={"pk": self.posts[0].pk}
+        )
+
+    def get(self, url: str, **extra):
+        response = self.client.get(url, **extra)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def assert_cache(self, url: str, expected: str, **extra):
+        response = self.get(url, **extra)
+        self.assertEqual(response["X-Cache"], expected)
+        return response
+
+    def test_likes_and_comments_refresh_the_post_detail(self) -> None:
+        self.assert_cache(self.detail, "MISS")
+        self.assert_cache(self.detail, "HIT")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            relations.like_posts(self.fan, [self.posts[0].pk])
+        response = self.assert_cache(self.detail, "MISS")
+        self.assertEqual(response.data["likes"], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse("social:post-comment",
+                        kwargs={"pk": self.posts[0].pk}),
+                {"body": "nice"},
+            )
+        response = self.assert_cache(self.detail, "MISS")
+        self.assertEqual(response.data["commented"], 1)
+
+    def test_likes_leave_post_list_pages_in_place(self) -> None:
+        self.assert_cache(POSTS_URL, "MISS")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            relations.like_posts(self.fan, [self.posts[0].pk])
+
+        self.assert_cache(POSTS_URL, "HIT")
+        self.assert_cache(self.detail, "MISS")
+
+    def test_new_and_edited_posts_drop_post_list_pages(self) -> None:
+        self.assert_cache(POSTS_URL, "MISS")
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(posted_by=self.author, body="fresh")
+        self.assert_cache(POSTS_URL, "MISS")
+        self.assert_cache(POSTS_URL, "HIT")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.posts[1].body = "edited"
+            self.posts[1].save()
+
+        results = self.assert_cache(POSTS_URL, "MISS").data["results"]
+        self.assertIn("edited", [row["body"] for row in results])
+
+    def test_follows_and_renames_refresh_profiles_and_posts(self) -> None:
+        profile = reverse("social:profile-detail",
+                          kwargs={"pk": self.author.pk})
+        self.assert_cache(profile, "MISS")
+        self.assert_cache(self.detail, "MISS")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            relations.follow_profiles(self.fan, [self.author.pk])
+        self.assert_cache(profile, "MISS")
+        self.assert_cache(self.detail, "HIT")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.username = "renamed"
+            self.author.save()
+        self.assert_cache(profile, "MISS")
+        response = self.assert_cache(self.detail, "MISS")
+        self.assertEqual(response.data["posted_by"], "renamed")
+
+    def test_sync_and_async_post_detail_share_their_entry(self) -> None:
+        async_detail = reverse(
+            "social-async:post-detail", kwargs={"pk": self.posts[0].pk}
+        )
+        sync = self.assert_cache(self.detail, "MISS")
+        self.assertEqual(
+            self.assert_cache(async_detail, "HIT").json(), sync.json()
+        )
+
+        caches[settings.RESPONSE_CACHE["ALIAS"]].clear()
+        filled = self.assert_cache(async_detail, "MISS")
+        self.assertEqual(
+            self.assert_cache(self.detail, "HIT").json(), filled.json()
+        )
+
+    @override_settings(ALLOWED_HOSTS=["testserver", "api.example.com"])
+    def test_entries_are_kept_per_host(self) -> None:
+        page = f"{POSTS_URL}?page_size=1"
+        local = self.assert_cache(page, "MISS")
+        public = self.assert_cache(page, "MISS",
+                                   HTTP_HOST="api.example.com")
+
+        self.assertTrue(
+            local.data["next"].startswith("http://testserver/")
+        )
+        self.assertTrue(
+            public.data["next"].startswith("http://api.example.com/")
+        )
+        self.assertEqual(
+            self.assert_cache(page, "HIT").data["next"], local.data["next"]
+        )
+        self.assertEqual(
+            self.assert_cache(page, "HIT",
+                              HTTP_HOST="api.example.com").data["next"],
+            public.data["next"],
+        )
+
+
+class FastSerializerTests(TestCase):
+    """Every converter renders what the matching DRF serializer does"""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        variants = {
+            name: {"name": f"upload/{name}.jpg", "width": 4, "height": 3}
+            for name in settings.IMAGE_PROCESSING["VARIANTS"]
+        }
+        cls.profile = create_profile("pictured")
+        Profile.objects.filter(pk=cls.profile.pk).update(
+            first_name="Ann",
+            profile_picture="upload/users/pictured.jpg",
+            picture_variants=variants,
+        )
+        cls.plain = create_profile("plain")
+        cls.plain.follows.add(cls.profile)
+        Post.objects.bulk_create([
+            Post(posted_by=cls.profile, body="with picture", tags="snow",
+                 attachment="upload/attachments/post.jpg",
+                 attachment_variants=variants, like_count=3),
+            Post(posted_by=cls.plain, body="bare"),
+        ])
+        post = Post.objects.first()
+        Commentary.objects.create(user=cls.plain, post=post, body="hi")
+
+    def setUp(self) -> None:
+        self.request = APIRequestFactory().get("/")
+
+    def assert_same(self, queryset, serializer_class, fast) -> None:
+        drf = serializer_class(
+            queryset, many=True, context={"request": self.request}
+        ).data
+        rows = fast.serialize(fast.values(queryset), self.request)
+
+        self.assertEqual(rows, [dict(row) for row in drf])
+        self.assertEqual(JSONRenderer().render(rows),
+                         JSONRenderer().render(drf))
+
+    def test_posts(self) -> None:
+        self.assert_same(Post.objects.select_related("posted_by"),
+                         PostSerializer, fast_serializers.POSTS)
+
+    def test_comments(self) -> None:
+        self.assert_same(Commentary.objects.select_related("user"),
+                         CommentarySerializer, fast_serializers.COMMENTS)
+
+    def test_profiles(self) -> None:
+        self.assert_same(Profile.objects.all(), ProfileSerializer,
+                         fast_serializers.PROFILES)
+
+    def test_profiles_through_follow_rows(self) -> None:
+        follows = Profile.follows.through.objects.all()
+        fast = fast_serializers.PROFILES.related("to_profile")
+        drf = ProfileSerializer(
+            [follow.to_profile for follow in follows], many=True,
+            context={"request": self.request},
+        ).data
+
+        self.assertEqual(fast.serialize(follows.values(*fast.sources),
+                                        self.request), drf)
+
+    def test_without_request_urls_stay_relative(self) -> None:
+        queryset = Post.objects.select_related("posted_by")
+        drf = PostSerializer(queryset, many=True).data
+
+        self.assertEqual(
+            fast_serializers.POSTS.serialize(
+                fast_serializers.POSTS.values(queryset)
+            ),
+            drf,
+        )
+        self.assertIn("/media/upload/attachments/post.jpg",
+                      [row["attachment"] for row in drf])
+
+    def test_datetime_formats_and_time_zones(self) -> None:
+        for output_format in (settings.REST_FRAMEWORK["DATETIME_FORMAT"],
+                              "iso-8601", None):
+            for zone in ("UTC", "America/New_York"):
+                rest_framework = {**settings.REST_FRAMEWORK,
+                                  "DATETIME_FORMAT": output_format}
+                with (self.subTest(format=output_format, zone=zone),
+                      override_settings(TIME_ZONE=zone,
+                                        REST_FRAMEWORK=rest_framework)):
+                    self.assert_same(
+                        Commentary.objects.select_related("user"),
+                        CommentarySerializer,
+                        fast_serializers.COMMENTS,
+                    )
+
+    @override_settings(REST_FRAMEWORK={
+        **settings.REST_FRAMEWORK, "UPLOADED_FILES_USE_URL": False,
+    })
+    def test_file_names_instead_of_urls(self) -> None:
+        self.assert_same(Post.objects.select_related("posted_by"),
+                         PostSerializer, fast_serializers.POSTS)
+
+
+class BulkRelationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.profile = create_profile("fan")
+        cls.authors = [create_profile(f"author{number}")
+                       for number in range(2)]
+        cls.posts = [
+            Post.objects.create(posted_by=cls.authors[0], body=f"post {n}")
+            for n in range(2)
+        ]
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=bearer(self.profile))
+        self.signals = []
+
+    def record_signals(self, sender) -> None:
+        def receiver(action, pk_set, **kwargs) -> None:
+            self.signals.append((action, pk_set))
+
+        m2m_changed.connect(receiver, sender=sender, weak=False)
+        self.addCleanup(m2m_changed.disconnect, receiver, sender=sender)
+
+    def post(self, url: str, action: str, ids: list[int]) -> dict:
+        response = self.client.post(
+            url, {"action": action, "ids": ids}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        return {row["id"]: row["result"] for row in response.data["results"]}
+
+    def like_counts(self) -> list[int]:
+        return [Post.objects.get(pk=post.pk).like_count
+                for post in self.posts]
+
+    def follow_counts(self) -> list[tuple[int, int]]:
+        return [
+            tuple(Profile.objects.filter(pk=profile.pk).values_list(
+                "follower_count", "following_count"
+            ).get())
+            for profile in (self.profile, *self.authors)
+        ]
+
+    def test_bulk_like_skips_duplicates(self) -> None:
+        url = reverse("social:bulk-like-posts")
+        first, second = (post.pk for post in self.posts)
+        self.record_signals(Profile.likes.through)
+        relations.like_posts(self.profile, [first])
+        self.signals.clear()
+
+        results = self.post(url, "like", [first, second, second, MISSING])
+
+        self.assertEqual(results, {first: "already_liked",
+                                   second: "liked", MISSING: "not_found"})
+        self.assertEqual(self.signals, [("pre_add", {second}),
+                                        ("post_add", {second})])
+        self.assertEqual(self.like_counts(), [1, 1])
+        self.assertEqual(self.profile.likes.count(), 2)
+
+    def test_bulk_unlike_removes_only_existing_likes(self) -> None:
+        url = reverse("social:bulk-like-posts")
+        first, second = (post.pk for post in self.posts)
+        relations.like_posts(self.profile, [first])
+        self.record_signals(Profile.likes.through)
+
+        results = self.post(url, "unlike", [first, first, second])
+        again = self.post(url, "unlike", [first])
+
+        self.assertEqual(results, {first: "unliked", second: "not_liked"})
+        self.assertEqual(again, {first: "not_liked"})
+        self.assertEqual(self.signals, [("pre_remove", {first}),
+                                        ("post_remove", {first})])
+        self.assertEqual(self.like_counts(), [0, 0])
+
+    def test_bulk_follow_skips_duplicates(self) -> None:
+        url = reverse("social:profile-bulk-follow")
+        first, second = (author.pk for author in self.authors)
+        relations.follow_profiles(self.profile, [first])
+        self.record_signals(Profile.follows.through)
+
+        results = self.post(url, "follow", [first, second, second, MISSING])
+
+        self.assertEqual(results, {first: "already_following",
+                                   second: "followed", MISSING: "not_found"})
+        self.assertEqual(self.signals, [("pre_add", {second}),
+                                        ("post_add", {second})])
+        self.assertEqual(self.follow_counts(), [(0, 2), (1, 0), (1, 0)])
+
+    def test_bulk_unfollow_keeps_counters_right(self) -> None:
+        url = reverse("social:profile-bulk-follow")
+        first, second = (author.pk for author in self.authors)
+        relations.follow_profiles(self.profile, [first, second])
+        self.record_signals(Profile.follows.through)
+
+        results = self.post(url, "unfollow", [first, first])
+        again = self.post(url, "unfollow", [first])
+
+        self.assertEqual(results, {first: "unfollowed"})
+        self.assertEqual(again, {first: "not_following"})
+        self.assertEqual(self.signals, [("pre_remove", {first}),
+                                        ("post_remove", {first})])
+        self.assertEqual(self.follow_counts(), [(0, 1), (0, 0), (1, 0)])
+
+
+class ConcurrentFollowTests(TransactionTestCase):
+    ROUNDS = 10
+
+    def test_mutual_follows_do_not_deadlock(self) -> None:
+        first, second = create_profile("first"), create_profile("second")
+        barrier = threading.Barrier(2)
+        errors = []
+
+        def toggle(profile: Profile, other: Profile) -> None:
+            try:
+                for _ in range(self.ROUNDS):
+                    barrier.wait()
+                    relations.toggle_follow(profile, other.pk)
+            except Exception as error:
+                errors.append(error)
+                barrier.abort()
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=toggle, args=pair)
+                   for pair in ((first, second), (second, first))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        # an even number of toggles leaves nobody following anybody
+        self.assertEqual(
+            list(Profile.objects.order_by("pk").values_list(
+                "follower_count", "following_count"
+            )),
+            [(0, 0), (0, 0)],
+        )
+
+
+class ImageMetadataTests(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.profile = create_profile("photographer")
+
+    def setUp(self) -> None:
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        override = override_settings(MEDIA_ROOT=media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=bearer(self.profile))
+
+    @staticmethod
+    def image(image_format: str, exif: bool) -> bytes:
+        image = Image.new("RGB", (20, 10), "red")
+        options = {}
+        if exif:
+            tags = image.getexif()
+            tags[0x010F] = "PhoneMaker"
+            tags[0x0112] = 6  # rotate 90 degrees to display
+            tags.get_ifd(0x8825)[2] = (50.0, 27.0, 0.0)  # GPS latitude
+            options["exif"] = tags.tobytes()
+        buffer = BytesIO()
+        image.save(buffer, image_format, **options)
+        return buffer.getvalue()
+
+    def upload(self, content: bytes, name: str) -> Post:
+        response = self.client.post(
+            POSTS_URL,
+            {"body": "look", "attachment": SimpleUploadedFile(name, content)},
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, 201)
+        return Post.objects.get(pk=response.data["id"])
+
+    def test_stored_original_has_no_exif(self) -> None:
+        for image_format, name in (("JPEG", "photo.jpg"),
+                                   ("PNG", "photo.png")):
+            with self.subTest(image_format=image_format):
+                post = self.upload(self.image(image_format, True), name)
+
+                with post.attachment.open() as file, Image.open(file) as image:
+                    self.assertEqual(dict(image.getexif()), {})
+                    self.assertEqual(image.format, image_format)
+                    self.assertEqual(image.size, (10, 20))
+
+    def test_upload_without_metadata_is_stored_as_is(self) -> None:
+        content = self.image("PNG", False)
+
+        post = self.upload(content, "plain.png")
+
+        with post.attachment.open() as file:
+            self.assertEqual(file.read(), content)
+
+    def test_profile_picture_is_stripped_too(self) -> None:
+        self.profile.profile_picture = SimpleUploadedFile(
+            "me.jpg", self.image("JPEG", True)
+        )
+        self.profile.save()
+
+        with (self.profile.profile_picture.open() as file,
+              Image.open(file) as image):
+            self.assertEqual(dict(image.getexif()), {})
+
+    def test_process_images_strips_older_originals(self) -> None:
+        storage = Post._meta.get_field("attachment").storage
+        old_name = storage.save("upload/attachments/old.jpg",
+                                ContentFile(self.image("JPEG", True)))
+        post = Post.objects.bulk_create([
+            Post(posted_by=self.profile, body="old", attachment=old_name)
+        ])[0]
+
+        call_command("process_images", "--strip-originals", stdout=StringIO())
+
+        post.refresh_from_db()
+        self.assertNotEqual(post.attachment.name, old_name)
+        self.assertFalse(storage.exists(old_name))
+        self.assertEqual(post.attachment_variants["source"],
+                         post.attachment.name)
+        with post.attachment.open() as file, Image.open(file) as image:
+            self.assertEqual(dict(image.getexif()), {})
+
+
+class SuggestionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.profile = create_profile("me")
+        cls.friends = [create_profile(f"friend{n}") for n in range(2)]
+        cls.known = create_profile("known")
+        cls.popular = create_profile("popular")
+        cls.niche = create_profile("niche")
+        cls.liker = create_profile("liker")
+        cls.profile.follows.add(*cls.friends, cls.known)
+        for friend in cls.friends:
+            # the profile itself and one it follows already are no news
+            friend.follows.add(cls.profile, cls.known, cls.popular)
+        cls.friends[0].follows.add(cls.niche)
+        post = Post.objects.create(posted_by=cls.known, body="liked")
+        cls.profile.likes.add(post)
+        cls.liker.likes.add(post)
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=bearer(self.profile))
+        self.url = reverse("social:profile-get-suggestions")
+
+    def suggested(self) -> list[tuple[int, int, int]]:
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return [
+            (row["profile"]["id"], row["mutual_follows"], row["co_likes"])
+            for row in response.data["results"]
+        ]
+
+    def test_friends_of_friends_then_co_likers(self) -> None:
+        call_command("refresh_suggestions", stdout=StringIO())
+
+        self.assertEqual(self.suggested(), [
+            (self.popular.pk, 2, 0),
+            (self.niche.pk, 1, 0),
+            (self.liker.pk, 0, 1),
+        ])
+
+    def test_profiles_followed_since_the_refresh_are_left_out(self) -> None:
+        call_command("refresh_suggestions", stdout=StringIO())
+
+        relations.follow_profiles(self.profile, [self.popular.pk])
+
+        self.assertEqual(
+            [pk for pk, _, _ in self.suggested()],
+            [self.niche.pk, self.liker.pk],
+        )
+
+    def test_nothing_before_the_first_refresh(self) -> None:
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.data,
+                         {"refreshed_at": None, "results": []})
+
+
+@override_settings(POST_DETAIL_COMMENTS=2)
+class PostDetailCommentsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.profile = create_profile("reader")
+        cls.post = Post.objects.create(posted_by=cls.profile, body="viral")
+        other = Post.objects.create(posted_by=cls.profile, body="other")
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=bearer(cls.profile))
+        # through the endpoint, which keeps the comment count
+        for post, body in [(cls.post, f"comment {number}")
+                           for number in range(4)] + [(other, "away")]:
+            client.post(reverse("social:post-comment",
+                                kwargs={"pk": post.pk}), {"body": body})
+
+    def setUp(self) -> None:
+        caches[settings.RESPONSE_CACHE["ALIAS"]].clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=bearer(self.profile))
+
+    def test_newest_comments_and_the_total_are_embedded(self) -> None:
+        for name in ("social:post-detail", "social-async:post-detail"):
+            with self.subTest(view=name):
+                caches[settings.RESPONSE_CACHE["ALIAS"]].clear()
+                response = self.client.get(
+                    reverse(name, kwargs={"pk": self.post.pk})
+                )
+
+                self.assertEqual(response.status_code, 200)
+                data = response.json()
+                self.assertEqual(
+                    [comment["body"] for comment in data["comments"]],
+                    ["comment 3", "comment 2"],
+                )
+                self.assertEqual(data["commented"], 4)
+
+    def test_comment_list_pages_through_all_of_them(self) -> None:
+        url = reverse("social:post-comment", kwargs={"pk": self.post.pk})
+        url = f"{url}?page_size=3"
+        bodies = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            bodies += [row["body"] for row in response.data["results"]]
+            url = response.data["next"]
+
+        self.assertEqual(bodies, [f"comment {n}" for n in range(4)])
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.profile = create_profile("me")
+        cls.other = create_profile("other")
+        cls.posts = [
+            Post.objects.create(posted_by=cls.profile, body=f"mine {n}",
+                                tags="news" if n else "")
+            for n in range(2)
+        ]
+        theirs = Post.objects.create(posted_by=cls.other, body="theirs")
+        cls.comment = Commentary.objects.create(
+            user=cls.profile, post=theirs, body="nice"
+        )
+        Commentary.objects.create(
+            user=cls.other, post=cls.posts[0], body="not mine"
+        )
+        cls.profile.likes.add(theirs)
+        cls.other.likes.add(cls.posts[0])
+        cls.profile.follows.add(cls.other)
+        cls.other.follows.add(cls.profile)
+        cls.theirs = theirs
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=bearer(self.profile))
+        self.url = reverse("social:export-data")
+
+    def download(self, output: str) -> str:
+        response = self.client.get(self.url, {"output": output})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertIn(f"export.{output}", response["Content-Disposition"])
+        return b"".join(response.streaming_content).decode()
+
+    def expected(self) -> list[tuple]:
+        newest_first = sorted(
+            self.posts, key=lambda post: (post.created_at, post.pk),
+            reverse=True,
+        )
+        return [
+            ("profile", str(self.profile.pk), self.profile.username),
+            *[("post", str(post.pk), post.body) for post in newest_first],
+            ("comment", str(self.comment.pk), self.comment.body),
+            ("like", str(self.theirs.pk), ""),
+            ("following", str(self.other.pk), self.other.username),
+            ("follower", str(self.other.pk), self.other.username),
+        ]
+
+    @staticmethod
+    def summary(row: dict) -> tuple:
+        """Type, the id that row is about and its text, as strings"""
+        ident = {"like": "post_id", "following": "profile_id",
+                 "follower": "profile_id"}.get(row["type"], "id")
+        text = row.get("body") or row.get("username") or ""
+        return row["type"], str(row[ident]), text
+
+    def test_ndjson_holds_the_rows_of_the_user(self) -> None:
+        rows = [json.loads(line)
+                for line in self.download("ndjson").splitlines()]
+
+        self.assertEqual([self.summary(row) for row in rows],
+                         self.expected())
+        # the newest post, posts[1], carries the tag
+        self.assertEqual(rows[1]["tags"], "news")
+
+    def test_csv_holds_the_same_rows(self) -> None:
+        rows = list(csv.DictReader(StringIO(self.download("csv"))))
+
+        self.assertEqual([self.summary(row) for row in rows],
+                         self.expected())
+
+    def test_command_writes_what_the_endpoint_streams(self) -> None:
+        out = StringIO()
+
+        call_command("export_user_data", "--user", self.profile.user.email,
+                     "--output", "csv", "--chunk-size", "1", stdout=out)
+
+        self.assertEqual(out.getvalue(), self.download("csv"))
+
+    def test_unknown_format(self) -> None:
+        response = self.client.get(self.url, {"output": "xml"})
+
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,303 @@
+import threading
+from functools import lru_cache
+from typing import Iterable
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import RowNumber
+from django.utils.module_loading import import_string
+
+from social_media.models import Post, Profile, TimelineEntry
+
+
+class BaseTimelineBackend:
+    """Store of precomputed home timelines, newest post first"""
+
+    def __init__(self, depth: int) -> None:
+        self.depth = depth
+
+    def push(self, owner_ids: Iterable[int], post: Post) -> None:
+        raise NotImplementedError
+
+    def backfill(self, owner_id: int, posts: Iterable[Post]) -> None:
+        raise NotImplementedError
+
+    def prune(self, owner_id: int, author_id: int) -> None:
+        raise NotImplementedError
+
+    def post_ids(self, owner_id: int) -> Iterable[int]:
+        raise NotImplementedError
+
+    def is_empty(self, owner_id: int) -> bool:
+        raise NotImplementedError
+
+    def trim_overflow(self) -> int:
+        """Drop entries past the depth, for backends that do not on write"""
+        return 0
+
+
+class DatabaseTimelineBackend(BaseTimelineBackend):
+    """Timelines kept in the TimelineEntry table (works on SQLite too)
+
+    Pushes only insert, trimming every follower's timeline on each post
+    would cost followers x depth rows per write. Timelines grow past the
+    depth until trim_overflow runs (scheduled after fan-out), reads stop
+    at the depth meanwhile.
+    """
+    # owners whose timelines are filled and trimmed per statement
+    BATCH_SIZE = 1000
+
+    def push(self, owner_ids: Iterable[int], post: Post) -> None:
+        TimelineEntry.objects.bulk_create(
+            [self._entry(owner_id, post) for owner_id in owner_ids],
+            batch_size=self.BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+
+    def backfill(self, owner_id: int, posts: Iterable[Post]) -> None:
+        TimelineEntry.objects.bulk_create(
+            [self._entry(owner_id, post) for post in posts],
+            batch_size=self.BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+        self.trim([owner_id])
+
+    def prune(self, owner_id: int, author_id: int) -> None:
+        TimelineEntry.objects.filter(
+            owner_id=owner_id, author_id=author_id
+        ).delete()
+
+    def post_ids(self, owner_id: int) -> Iterable[int]:
+        return (TimelineEntry.objects.filter(owner_id=owner_id)
+                .values("post_id")[:self.depth])
+
+    def is_empty(self, owner_id: int) -> bool:
+        return not TimelineEntry.objects.filter(owner_id=owner_id).exists()
+
+    def overflowing_owners(self) -> list[int]:
+        """Owners holding more entries than the depth"""
+        return list(
+            TimelineEntry.objects.order_by().values("owner_id")
+            .annotate(entries=Count("id"))
+            .filter(entries__gt=self.depth)
+            .values_list("owner_id", flat=True)
+        )
+
+    def trim_overflow(self) -> int:
+        owner_ids = self.overflowing_owners()
+        removed = 0
+        for start in range(0, len(owner_ids), self.BATCH_SIZE):
+            removed += self.trim(owner_ids[start:start + self.BATCH_SIZE])
+        return removed
+
+    def trim(self, owner_ids: Iterable[int]) -> int:
+        """Drop rows past the depth of the given timelines"""
+        overflow = list(
+            TimelineEntry.objects.filter(owner_id__in=list(owner_ids))
+            .annotate(
+                position=Window(
+                    RowNumber(),
+                    partition_by=[F("owner_id")],
+                    order_by=[F("created_at").desc(), F("post_id").desc()],
+                )
+            )
+            .filter(position__gt=self.depth)
+            .values_list("pk", flat=True)
+        )
+        if overflow:
+            TimelineEntry.objects.filter(pk__in=overflow).delete()
+        return len(overflow)
+
+    @staticmethod
+    def _entry(owner_id: int, post: Post) -> TimelineEntry:
+        return TimelineEntry(
+            owner_id=owner_id,
+            post_id=post.id,
+            author_id=post.posted_by_id,
+            created_at=post.created_at,
+        )
+
+
+class InMemoryTimelineBackend(BaseTimelineBackend):
+    """Process-local timelines, for tests and single-process development"""
+
+    def __init__(self, depth: int) -> None:
+        super().__init__(depth)
+        self._timelines: dict[int, list[tuple]] = {}
+        self._lock = threading.Lock()
+
+    def push(self, owner_ids: Iterable[int], post: Post) -> None:
+        entry = (post.created_at, post.id, post.posted_by_id)
+        with self._lock:
+            for owner_id in owner_ids:
+                self._insert(owner_id, [entry])
+
+    def backfill(self, owner_id: int, posts: Iterable[Post]) -> None:
+        entries = [
+            (post.created_at, post.id, post.posted_by_id) for post in posts
+        ]
+        with self._lock:
+            self._insert(owner_id, entries)
+
+    def prune(self, owner_id: int, author_id: int) -> None:
+        with self._lock:
+            timeline = self._timelines.get(owner_id, [])
+            self._timelines[owner_id] = [
+                entry for entry in timeline if entry[2] != author_id
+            ]
+
+    def post_ids(self, owner_id: int) -> Iterable[int]:
+        with self._lock:
+            return [entry[1] for entry in self._timelines.get(owner_id, [])]
+
+    def is_empty(self, owner_id: int) -> bool:
+        with self._lock:
+            return not self._timelines.get(owner_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._timelines.clear()
+
+    def _insert(self, owner_id: int, entries: list[tuple]) -> None:
+        timeline = self._timelines.get(owner_id, [])
+        known = {entry[1] for entry in timeline}
+        timeline.extend(entry for entry in entries if entry[1] not in known)
+        timeline.sort(reverse=True)
+        self._timelines[owner_id] = timeline[:self.depth]
+
+
+class RedisTimelineBackend(BaseTimelineBackend):
+    """Timelines kept in Redis sorted sets scored by post timestamp"""
+
+    def __init__(self, depth: int) -> None:
+        super().__init__(depth)
+        try:
+            import redis
+        except ImportError as error:
+            raise ImproperlyConfigured(
+                "RedisTimelineBackend requires the redis package"
+            ) from error
+        self.client = redis.Redis.from_url(settings.TIMELINE["REDIS_URL"])
+
+    def push(self, owner_ids: Iterable[int], post: Post) -> None:
+        member = self._member(post)
+        score = post.created_at.timestamp()
+        pipe = self.client.pipeline(transaction=False)
+        for owner_id in owner_ids:
+            pipe.zadd(self._key(owner_id), {member: score})
+            pipe.zremrangebyrank(self._key(owner_id), 0, -self.depth - 1)
+        pipe.execute()
+
+    def backfill(self, owner_id: int, posts: Iterable[Post]) -> None:
+        mapping = {
+            self._member(post): post.created_at.timestamp() for post in posts
+        }
+        if not mapping:
+            return
+        pipe = self.client.pipeline()
+        pipe.zadd(self._key(owner_id), mapping)
+        pipe.zremrangebyrank(self._key(owner_id), 0, -self.depth - 1)
+        pipe.execute()
+
+    def prune(self, owner_id: int, author_id: int) -> None:
+        members = [
+            member for member in self.client.zrange(self._key(owner_id), 0, -1)
+            if int(member.split(b":")[1]) == author_id
+        ]
+        if members:
+            self.client.zrem(self._key(owner_id), *members)
+
+    def post_ids(self, owner_id: int) -> Iterable[int]:
+        members = self.client.zrevrange(self._key(owner_id), 0, self.depth - 1)
+        return [int(member.split(b":")[0]) for member in members]
+
+    def is_empty(self, owner_id: int) -> bool:
+        return not self.client.exists(self._key(owner_id))
+
+    @staticmethod
+    def _key(owner_id: int) -> str:
+        return f"timeline:{owner_id}"
+
+    @staticmethod
+    def _member(post: Post) -> str:
+        return f"{post.id}:{post.posted_by_id}"
+
+
+@lru_cache(maxsize=None)
+def get_backend() -> BaseTimelineBackend:
+    backend_class = import_string(settings.TIMELINE["BACKEND"])
+    return backend_class(depth=settings.TIMELINE["DEPTH"])
+
+
+def follower_ids(profile_id: int) -> list[int]:
+    return list(
+        Profile.follows.through.objects.filter(to_profile_id=profile_id)
+        .values_list("from_profile_id", flat=True)
+    )
+
+
+def uses_fanout_on_write(profile_id: int) -> bool:
+    """Whether new posts of the author are pushed into follower timelines
+
+    Authors with more than FANOUT_LIMIT followers are read on demand
+    instead, see followed_posts_filter.
+    """
+    limit = settings.TIMELINE["FANOUT_LIMIT"]
+    return Profile.objects.filter(
+        pk=profile_id, follower_count__lte=limit
+    ).exists()
+
+
+def fan_out_post(post: Post) -> None:
+    """Push a new post into the timelines of the author's followers"""
+    if uses_fanout_on_write(post.posted_by_id):
+        get_backend().push(follower_ids(post.posted_by_id), post)
+
+
+def follow_changed(owner_id: int, author_id: int, following: bool) -> None:
+    """Backfill or prune a timeline after a follow or unfollow"""
+    backend = get_backend()
+    if not following:
+        backend.prune(owner_id, author_id)
+    elif uses_fanout_on_write(author_id):
+        posts = (Post.objects.filter(posted_by_id=author_id)
+                 .only("id", "created_at", "posted_by_id")[:backend.depth])
+        backend.backfill(owner_id, posts)
+
+
+def audience_shrank(author_id: int) -> None:
+    """Backfill followers of an author back under the fan-out limit
+
+    Posts made while the author was over the limit were never pushed
+    and are no longer read on demand, so copy them in like a new follow.
+    """
+    for owner_id in follower_ids(author_id):
+        follow_changed(owner_id, author_id, following=True)
+
+
+def rebuild(profile: Profile) -> None:
+    """Refill a timeline from scratch out of the current follow graph"""
+    backend = get_backend()
+    for author_id in profile.follows.values_list("id", flat=True):
+        backend.prune(profile.id, author_id)
+        follow_changed(profile.id, author_id, following=True)
+
+
+def followed_posts_filter(profile: Profile) -> Q:
+    """Home feed filter: stored timeline plus fan-out-on-read authors
+
+    Timelines are filled by the task worker. One with nothing stored yet,
+    as for data older than the timelines or with no worker running, is
+    read from every followed author on demand instead.
+    """
+    backend = get_backend()
+    if backend.is_empty(profile.id):
+        return Q(posted_by__in=profile.follows.values("id"))
+    limit = settings.TIMELINE["FANOUT_LIMIT"]
+    fan_in_authors = (profile.follows.filter(follower_count__gt=limit)
+                      .values("id"))
+    return (
+        Q(id__in=backend.post_ids(profile.id))
+        | Q(posted_by__in=fan_in_authors)
+    )
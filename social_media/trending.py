@@ -0,0 +1,98 @@
+import heapq
+import math
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from social_media.models import ActivityBucket, PostTag, TrendingItem
+
+
+def bucket_start(moment: datetime) -> datetime:
+    minutes = settings.TRENDING["BUCKET_MINUTES"]
+    slot = int(moment.timestamp()) // (minutes * 60) * minutes * 60
+    return datetime.fromtimestamp(slot, tz=moment.tzinfo)
+
+
+def record_activity(post_ids: list[int], field: str,
+                    moment: datetime | None = None) -> None:
+    """Count a like or comment for each post and each of their tags
+
+    Runs from the task queue, moment is when the likes or comments were
+    made so late runs still count them in their own bucket.
+    """
+    bucket = bucket_start(moment or timezone.now())
+    counts = Counter(("post", post_id) for post_id in post_ids)
+    tag_ids = PostTag.objects.filter(post_id__in=post_ids).values_list(
+        "tag_id", flat=True
+    )
+    counts.update(("tag", tag_id) for tag_id in tag_ids)
+
+    groups = defaultdict(list)
+    for (kind, object_id), amount in counts.items():
+        groups[kind, amount].append(object_id)
+
+    # make sure every counter row exists, then bump them with one UPDATE
+    # per kind and amount instead of one upsert per object; all or none,
+    # so a retried task does not count twice
+    with transaction.atomic():
+        ActivityBucket.objects.bulk_create(
+            [
+                ActivityBucket(kind=kind, object_id=object_id, bucket=bucket)
+                for kind, object_id in counts
+            ],
+            ignore_conflicts=True,
+        )
+        for (kind, amount), object_ids in groups.items():
+            ActivityBucket.objects.filter(
+                kind=kind, object_id__in=object_ids, bucket=bucket
+            ).update(**{field: F(field) + amount})
+
+
+def refresh(now: datetime | None = None) -> dict[str, int]:
+    """Drop expired buckets and recompute the decayed top-K per kind"""
+    config = settings.TRENDING
+    now = now or timezone.now()
+    window_start = now - timedelta(hours=config["WINDOW_HOURS"])
+    decay = math.log(2) / (config["HALF_LIFE_HOURS"] * 3600)
+
+    ActivityBucket.objects.filter(bucket__lt=window_start).delete()
+
+    scores = {"post": {}, "tag": {}}
+    buckets = ActivityBucket.objects.values_list(
+        "kind", "object_id", "bucket", "likes", "comments"
+    )
+    for kind, object_id, bucket, likes, comments in buckets.iterator(
+        chunk_size=5000
+    ):
+        age = max((now - bucket).total_seconds(), 0)
+        weight = (likes * config["LIKE_WEIGHT"]
+                  + comments * config["COMMENT_WEIGHT"])
+        kind_scores = scores[kind]
+        kind_scores[object_id] = (kind_scores.get(object_id, 0)
+                                  + weight * math.exp(-decay * age))
+
+    items = []
+    for kind, kind_scores in scores.items():
+        top = heapq.nlargest(
+            config["TOP_K"], kind_scores.items(), key=lambda item: item[1]
+        )
+        items.extend(
+            TrendingItem(
+                kind=kind,
+                object_id=object_id,
+                rank=rank,
+                score=score,
+                refreshed_at=now,
+            )
+            for rank, (object_id, score) in enumerate(top, start=1)
+        )
+
+    with transaction.atomic():
+        TrendingItem.objects.all().delete()
+        TrendingItem.objects.bulk_create(items)
+
+    return {kind: len(kind_scores) for kind, kind_scores in scores.items()}
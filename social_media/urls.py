@@ -7,9 +7,18 @@ from social_media.views import (
     PostDetailUpdateView,
     CommentListCreateView,
     CommentDetailUpdateView,
+    SearchPostsView,
+    SearchProfilesView,
+    TagListView,
     get_user_posts,
     get_liked_posts,
+    bulk_like_posts,
+    export_data,
+    get_cache_stats,
+    get_db_pool_stats,
+    get_throttle_stats,
     get_followed_posts,
+    get_trending,
     like_post,
 )
 
@@ -33,12 +42,25 @@ urlpatterns = [
     path(
         "posts/<int:pi>/comments/<int:pk>/",
         CommentDetailUpdateView.as_view(),
-        name="post-detail"
+        name="comment-detail"
     ),
     path("posts/<int:pk>/toggle-like/", like_post, name="like-post"),
+    path("posts/bulk-like/", bulk_like_posts, name="bulk-like-posts"),
     path("posts/user-posts/", get_user_posts, name="user-posts"),
     path("posts/liked-posts/", get_liked_posts, name="liked-posts"),
     path("posts/followed-posts/", get_followed_posts, name="followed-posts"),
+    path("tags/", TagListView.as_view(), name="tag-list"),
+    path("trending/", get_trending, name="trending"),
+    path("export/", export_data, name="export-data"),
+    path("cache-stats/", get_cache_stats, name="cache-stats"),
+    path("throttle-stats/", get_throttle_stats, name="throttle-stats"),
+    path("db-pool-stats/", get_db_pool_stats, name="db-pool-stats"),
+    path("search/posts/", SearchPostsView.as_view(), name="search-posts"),
+    path(
+        "search/profiles/",
+        SearchProfilesView.as_view(),
+        name="search-profiles"
+    ),
 ]
 
 app_name = "social"
@@ -1,37 +1,68 @@
-from django.db.models import Count, QuerySet
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, QuerySet
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from rest_framework import generics, viewsets, status
 from rest_framework.decorators import action, api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.serializers import Serializer
 
+from social_media import (
+    cache,
+    export,
+    fast_serializers,
+    relations,
+    search,
+    suggestions,
+    tasks,
+    timeline,
+)
 from social_media.models import (
     Commentary,
     Profile,
-    Post
+    Post,
+    Tag,
+    TrendingItem,
 )
 from social_media.serializers import (
+    BulkFollowSerializer,
+    BulkLikeSerializer,
     CommentarySerializer,
     ProfileSerializer,
     ProfileDetailSerializer,
     PostSerializer,
-    PostDetailSerializer
+    PostDetailSerializer,
+    SuggestionSerializer,
+    TagSerializer,
 )
 
+from social_media.pagination import (
+    TAGGED_AT,
+    CappedLimitOffsetPagination,
+    CommentCursorPagination,
+    FollowCursorPagination,
+    PostCursorPagination,
+)
 from social_media.permissions import (
     IsOwnerOrReadOnlyComment,
     IsOwnerOrReadOnlyProfile,
     IsOwnerOrReadOnlyPost,
 )
+from social_media_api import throttling
+from social_media_api.db_pool.pool import pool_stats
+
+
+Follow = Profile.follows.through
 
 
 class ProfileViewSet(viewsets.ModelViewSet):
-    queryset = (Profile.objects.select_related("user")
-                .prefetch_related("follows"))
+    queryset = Profile.objects.select_related("user")
     permission_classes = (IsOwnerOrReadOnlyProfile,)
+    pagination_class = CappedLimitOffsetPagination
 
     def get_serializer_class(self) -> type[Serializer]:
         if self.action == "retrieve":
@@ -58,6 +89,15 @@ class ProfileViewSet(viewsets.ModelViewSet):
 
         return queryset.distinct()
 
+    def retrieve(self, request, *args, **kwargs):
+        return cache.cached_response(
+            cache.profile_key(kwargs["pk"]),
+            request,
+            lambda: super(ProfileViewSet, self).retrieve(
+                request, *args, **kwargs
+            ),
+        )
+
     def create(self, request, *args, **kwargs):
         if Profile.objects.filter(user=request.user).exists():
             return Response(
@@ -94,7 +134,7 @@ class ProfileViewSet(viewsets.ModelViewSet):
         ]
     )
     def list(self, request, *args, **kwargs):
-        return super().list(request, *args, **kwargs)
+        return self.fast_list(self.filter_queryset(self.get_queryset()))
 
     @action(
         methods=["POST"],
@@ -116,21 +156,58 @@ class ProfileViewSet(viewsets.ModelViewSet):
     )
     def toggle_follow(self, request, pk=None) -> Response:
         """Toggle to follow/unfollow user profile"""
-        own_profile = request.user.profile
-        follow_user = get_object_or_404(Profile, pk=pk)
-        if follow_user in own_profile.follows.all():
-            own_profile.follows.remove(follow_user)
-            return Response(
-                {"message": f"you are no longer following {follow_user}"},
-                status=status.HTTP_200_OK
-            )
+        follow_user = get_object_or_404(
+            Profile.objects.only("username"), pk=pk
+        )
+        result, followers = relations.toggle_follow(
+            request.user.profile, follow_user.id
+        )
+        if result == "unfollowed":
+            message = f"you are no longer following {follow_user}"
         else:
-            own_profile.follows.add(follow_user)
+            message = f"you are following {follow_user}"
+        return Response(
+            {
+                "message": message,
+                "following": result == "followed",
+                "followers": followers,
+            },
+            status=status.HTTP_200_OK
+        )
+
+    @extend_schema(request=BulkFollowSerializer)
+    @action(
+        methods=["POST"],
+        detail=False,
+        url_path="bulk-follow",
+    )
+    def bulk_follow(self, request) -> Response:
+        """Follow or unfollow many profiles at once"""
+        serializer = BulkFollowSerializer(data=request.data)
+        if not serializer.is_valid():
             return Response(
-                {"message": f"you are following {follow_user}"},
-                status=status.HTTP_200_OK
+                serializer.errors,
+                status=status.HTTP_400_BAD_REQUEST
             )
 
+        if serializer.validated_data["action"] == "follow":
+            apply = relations.follow_profiles
+        else:
+            apply = relations.unfollow_profiles
+        results = apply(
+            request.user.profile, serializer.validated_data["ids"]
+        )
+        return Response(
+            {
+                "action": serializer.validated_data["action"],
+                "results": [
+                    {"id": pk, "result": result}
+                    for pk, result in results.items()
+                ],
+            },
+            status=status.HTTP_200_OK
+        )
+
     @action(
         methods=["GET"],
         detail=False,
@@ -138,9 +215,84 @@ class ProfileViewSet(viewsets.ModelViewSet):
     )
     def get_user_profile(self, request) -> Response:
         """Get your profile"""
-        serializer = ProfileDetailSerializer(request.user.profile)
+        # loaded by id, request.user.profile may hold only the id claim
+        profile = get_object_or_404(Profile, user_id=request.user.pk)
+        serializer = ProfileDetailSerializer(profile)
         return Response(serializer.data)
 
+    def fast_list(self, queryset: QuerySet) -> Response:
+        if not settings.FAST_LIST_SERIALIZATION:
+            page = self.paginate_queryset(queryset)
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        fast = fast_serializers.PROFILES
+        page = self.paginate_queryset(fast.values(queryset))
+        return self.get_paginated_response(
+            fast.serialize(page, self.request)
+        )
+
+    def follow_list(self, follows: QuerySet, side: str) -> Response:
+        """Page the profiles on one side of follow rows"""
+        if not settings.FAST_LIST_SERIALIZATION:
+            page = self.paginate_queryset(follows.select_related(side))
+            serializer = self.get_serializer(
+                [getattr(follow, side) for follow in page], many=True
+            )
+            return self.get_paginated_response(serializer.data)
+
+        fast = fast_serializers.PROFILES.related(side)
+        page = self.paginate_queryset(follows.values("id", *fast.sources))
+        return self.get_paginated_response(
+            fast.serialize(page, self.request)
+        )
+
+    @action(
+        methods=["GET"],
+        detail=True,
+        url_path="followers",
+        pagination_class=FollowCursorPagination,
+    )
+    def followers(self, request, pk=None) -> Response:
+        """Get profiles following this profile, latest follower first"""
+        profile = get_object_or_404(Profile.objects.only("id"), pk=pk)
+        return self.follow_list(
+            Follow.objects.filter(to_profile_id=profile.id), "from_profile"
+        )
+
+    @action(
+        methods=["GET"],
+        detail=True,
+        url_path="following",
+        pagination_class=FollowCursorPagination,
+    )
+    def following(self, request, pk=None) -> Response:
+        """Get profiles this profile follows, latest followed first"""
+        profile = get_object_or_404(Profile.objects.only("id"), pk=pk)
+        return self.follow_list(
+            Follow.objects.filter(from_profile_id=profile.id), "to_profile"
+        )
+
+    @action(
+        methods=["GET"],
+        detail=False,
+        url_path="suggestions",
+    )
+    def get_suggestions(self, request) -> Response:
+        """Get profiles you may want to follow, best first
+
+        Ranked by refresh_suggestions from friends-of-friends and people
+        liking the same posts.
+        """
+        items = list(suggestions.for_profile(request.user.profile.id))
+        serializer = SuggestionSerializer(
+            items, many=True, context={"request": request}
+        )
+        return Response({
+            "refreshed_at": items[0].refreshed_at if items else None,
+            "results": serializer.data,
+        })
+
     @action(
         methods=["GET"],
         detail=False,
@@ -149,8 +301,7 @@ class ProfileViewSet(viewsets.ModelViewSet):
     def get_followed_profiles(self, request) -> Response:
         """Get profiles of users who you follow"""
         profiles = request.user.profile.follows.all()
-        serializer = self.get_serializer(profiles, many=True)
-        return Response(serializer.data)
+        return self.fast_list(profiles)
 
     @action(
         methods=["GET"],
@@ -160,38 +311,58 @@ class ProfileViewSet(viewsets.ModelViewSet):
     def get_following_profiles(self, request) -> Response:
         """Get profiles of users who are following you"""
         profiles = request.user.profile.followed_by.all()
-        serializer = self.get_serializer(profiles, many=True)
-        return Response(serializer.data)
+        return self.fast_list(profiles)
+
+
+def filter_posts(queryset: QuerySet, params) -> QuerySet:
+    """Apply the ?tags= and ?user= filters of the post list"""
+    tag = params.get("tags")
+    user = params.get("user")
+
+    if tag:
+        tag_id = (Tag.objects.filter(name=tag.lower())
+                  .values_list("id", flat=True).first())
+        if tag_id is None:
+            return queryset.none()
+        queryset = queryset.filter(post_tags__tag_id=tag_id).annotate(
+            **{TAGGED_AT: F("post_tags__created_at")}
+        )
+    if user:
+        queryset = queryset.filter(posted_by__username__icontains=user)
+
+    return queryset
 
 
 class PostListCreateView(generics.ListCreateAPIView):
-    queryset = (Post.objects.select_related("posted_by")
-                .annotate(commented=Count("comments"), likes=Count("liked")))
+    queryset = Post.objects.for_feed()
     serializer_class = PostSerializer
     permission_classes = (IsAuthenticated,)
+    pagination_class = PostCursorPagination
 
     def perform_create(self, serializer) -> None:
-        serializer.save(posted_by=self.request.user.profile)
-
-    def get_queryset(self) -> QuerySet:
-        tag = self.request.query_params.get("tags")
-        user = self.request.query_params.get("user")
+        post = serializer.save(posted_by=self.request.user.profile)
+        tasks.fan_out_post.enqueue(
+            args=(post.id,), idempotency_key=f"fan-out-post:{post.id}"
+        )
 
-        queryset = self.queryset
+    def list(self, request, *args, **kwargs):
+        if not settings.FAST_LIST_SERIALIZATION:
+            return super().list(request, *args, **kwargs)
 
-        if tag:
-            queryset = queryset.filter(tags__icontains=tag)
-        if user:
-            queryset = queryset.filter(posted_by__username__icontains=user)
+        fast = fast_serializers.POSTS
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(fast.values(queryset))
+        return self.get_paginated_response(fast.serialize(page, request))
 
-        return queryset.distinct()
+    def get_queryset(self) -> QuerySet:
+        return filter_posts(super().get_queryset(), self.request.query_params)
 
     @extend_schema(
         parameters=[
             OpenApiParameter(
                 "tags",
                 type=OpenApiTypes.STR,
-                description="Filter by tag in posts (ex. ?tags=snow)",
+                description="Filter by exact tag name (ex. ?tags=snow)",
             ),
             OpenApiParameter(
                 "user",
@@ -201,87 +372,312 @@ class PostListCreateView(generics.ListCreateAPIView):
         ]
     )
     def get(self, request, *args, **kwargs):
-        return super().get(request, *args, **kwargs)
+        return cache.cached_response(
+            cache.post_list_key(request.get_full_path()),
+            request,
+            lambda: super(PostListCreateView, self).get(
+                request, *args, **kwargs
+            ),
+            timeout=settings.RESPONSE_CACHE["LIST_TIMEOUT"],
+        )
 
 
 class PostDetailUpdateView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = (Post.objects.prefetch_related("comments__user")
-                .annotate(likes=Count("liked")))
     serializer_class = PostDetailSerializer
     permission_classes = (IsOwnerOrReadOnlyPost,)
 
+    def get_queryset(self) -> QuerySet:
+        # built per request, POST_DETAIL_COMMENTS is read from settings
+        return Post.objects.for_detail()
+
+    def retrieve(self, request, *args, **kwargs):
+        return cache.cached_response(
+            cache.post_key(kwargs["pk"]),
+            request,
+            lambda: super(PostDetailUpdateView, self).retrieve(
+                request, *args, **kwargs
+            ),
+        )
+
+
+def paginated_posts(request, posts: QuerySet) -> Response:
+    paginator = PostCursorPagination()
+    if settings.FAST_LIST_SERIALIZATION:
+        fast = fast_serializers.POSTS
+        page = paginator.paginate_queryset(fast.values(posts), request)
+        return paginator.get_paginated_response(fast.serialize(page))
+
+    page = paginator.paginate_queryset(posts, request)
+    serializer = PostSerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
+
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated, ])
 def get_user_posts(request) -> Response:
     """Get all posts by created by you"""
-    own_posts = request.user.profile.posts.all()
-    serializer = PostSerializer(own_posts, many=True)
-    return Response(serializer.data)
+    own_posts = request.user.profile.posts.for_feed()
+    return paginated_posts(request, own_posts)
 
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated, ])
 def get_liked_posts(request) -> Response:
     """Get all posts by liked by you"""
-    liked_posts = request.user.profile.likes.all()
-    serializer = PostSerializer(liked_posts, many=True)
-    return Response(serializer.data)
+    liked_posts = request.user.profile.likes.for_feed()
+    return paginated_posts(request, liked_posts)
 
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated, ])
 def get_followed_posts(request) -> Response:
-    """Get all posts by users followed by you"""
-    posts = (Post.objects.select_related("posted_by")
-             .annotate(commented=Count("comments"), likes=Count("liked")))
-    followed_profiles = request.user.profile.follows.all()
-    posts = posts.filter(posted_by__in=followed_profiles)
-    serializer = PostSerializer(posts, many=True)
-    return Response(serializer.data)
+    """Get posts by users followed by you, newest first, page by page"""
+    posts = Post.objects.for_feed().filter(
+        timeline.followed_posts_filter(request.user.profile)
+    )
+    return paginated_posts(request, posts)
+
+
+@extend_schema(
+    parameters=[
+        OpenApiParameter(
+            "output",
+            type=OpenApiTypes.STR,
+            enum=list(export.FORMATS),
+            description="File format (ex. ?output=csv), ndjson by default",
+        ),
+    ]
+)
+@api_view(["GET"])
+@permission_classes([IsAuthenticated, ])
+def export_data(request):
+    """Download your profile, posts, comments, likes and follows"""
+    output = request.query_params.get("output", "ndjson")
+    if output not in export.FORMATS:
+        return Response(
+            {"message": f"output must be one of: {', '.join(export.FORMATS)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    content_type, _ = export.FORMATS[output]
+    response = StreamingHttpResponse(
+        export.stream(request.user.profile.id, output),
+        content_type=content_type,
+    )
+    response["Content-Disposition"] = (
+        f'attachment; filename="social-media-export.{output}"'
+    )
+    return response
 
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated, ])
 def like_post(request, pk) -> Response:
     """Toggle to like/unlike posts"""
-    own_profile = request.user.profile
-    post = get_object_or_404(Post, pk=pk)
-    if post in own_profile.likes.all():
-        own_profile.likes.remove(post)
-        return Response(
-            {"message": f"you are no longer liking post# {post.id}"},
-            status=status.HTTP_200_OK
-        )
+    result, likes = relations.toggle_like(request.user.profile, pk)
+    if result == "not_found":
+        raise Http404
+    if result == "unliked":
+        message = f"you are no longer liking post# {pk}"
     else:
-        own_profile.likes.add(post)
+        message = f"you are liking post# {pk}"
+    return Response(
+        {"message": message, "liked": result == "liked", "likes": likes},
+        status=status.HTTP_200_OK
+    )
+
+
+class TagListView(generics.ListAPIView):
+    """Tags with the number of posts using them, most used first"""
+    queryset = Tag.objects.order_by("-post_count", "name")
+    serializer_class = TagSerializer
+    permission_classes = (IsAuthenticated,)
+    pagination_class = CappedLimitOffsetPagination
+
+
+@extend_schema(
+    parameters=[
+        OpenApiParameter(
+            "kind",
+            type=OpenApiTypes.STR,
+            enum=["posts", "tags"],
+            description="What to rank (ex. ?kind=tags), posts by default",
+        ),
+    ]
+)
+@api_view(["GET"])
+@permission_classes([IsAuthenticated, ])
+def get_trending(request) -> Response:
+    """Get top trending posts or tags by recent likes and comments"""
+    kind = request.query_params.get("kind", "posts")
+    if kind not in ("posts", "tags"):
         return Response(
-            {"message": f"you are liking post# {post.id}"},
-            status=status.HTTP_200_OK
+            {"message": "kind must be one of: posts, tags"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    items = list(TrendingItem.objects.filter(kind=kind[:-1]))
+    if kind == "posts":
+        objects = Post.objects.for_feed().in_bulk(
+            [item.object_id for item in items]
         )
+        serializer_class = PostSerializer
+    else:
+        objects = Tag.objects.in_bulk([item.object_id for item in items])
+        serializer_class = TagSerializer
+
+    results = [
+        {
+            "rank": item.rank,
+            "score": round(item.score, 3),
+            kind[:-1]: serializer_class(objects[item.object_id]).data,
+        }
+        for item in items
+        if item.object_id in objects
+    ]
+    return Response({
+        "kind": kind,
+        "refreshed_at": items[0].refreshed_at if items else None,
+        "results": results,
+    })
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser, ])
+def get_cache_stats(request) -> Response:
+    """Get response cache hit/miss counters"""
+    return Response(cache.stats())
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser, ])
+def get_throttle_stats(request) -> Response:
+    """Get allowed/throttled counters of every rate limiting rule"""
+    return Response(throttling.stats())
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser, ])
+def get_db_pool_stats(request) -> Response:
+    """Get size, wait and timeout counters of the database connection pools"""
+    return Response(pool_stats())
+
+
+class SearchPostsView(generics.ListAPIView):
+    serializer_class = PostSerializer
+    permission_classes = (IsAuthenticated,)
+    pagination_class = CappedLimitOffsetPagination
+
+    def get_queryset(self) -> QuerySet:
+        text = self.request.query_params.get("q", "").strip()
+        if not text:
+            return Post.objects.none()
+        return search.search_posts(text)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "q",
+                type=OpenApiTypes.STR,
+                description="Full-text search in post body and tags, "
+                            "best matches first (ex. ?q=snow trip)",
+            ),
+        ]
+    )
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+
+class SearchProfilesView(generics.ListAPIView):
+    serializer_class = ProfileSerializer
+    permission_classes = (IsAuthenticated,)
+    pagination_class = CappedLimitOffsetPagination
+
+    def get_queryset(self) -> QuerySet:
+        text = self.request.query_params.get("q", "").strip()
+        if not text:
+            return Profile.objects.none()
+        return search.search_profiles(text)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "q",
+                type=OpenApiTypes.STR,
+                description="Full-text search in username and names, "
+                            "best matches first (ex. ?q=leo)",
+            ),
+        ]
+    )
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+
+@extend_schema(request=BulkLikeSerializer)
+@api_view(["POST"])
+@permission_classes([IsAuthenticated, ])
+def bulk_like_posts(request) -> Response:
+    """Like or unlike many posts at once"""
+    serializer = BulkLikeSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    if serializer.validated_data["action"] == "like":
+        apply = relations.like_posts
+    else:
+        apply = relations.unlike_posts
+    results = apply(request.user.profile, serializer.validated_data["ids"])
+    return Response(
+        {
+            "action": serializer.validated_data["action"],
+            "results": [
+                {"id": pk, "result": result} for pk, result in results.items()
+            ],
+        },
+        status=status.HTTP_200_OK
+    )
 
 
 class CommentListCreateView(generics.ListCreateAPIView):
     serializer_class = CommentarySerializer
-    queryset = Commentary.objects.select_related("post", "user")
+    queryset = Commentary.objects.select_related("user")
     permission_classes = (IsAuthenticated,)
+    pagination_class = CommentCursorPagination
 
     def perform_create(self, serializer) -> None:
         post = get_object_or_404(Post, pk=self.kwargs.get("pk"))
-        serializer.save(post=post, user=self.request.user.profile)
+        with transaction.atomic():
+            serializer.save(post=post, user=self.request.user.profile)
+            Post.objects.filter(pk=post.pk).update(
+                comment_count=F("comment_count") + 1
+            )
+        tasks.record_comment(post.id)
 
     def list(self, request, *args, **kwargs) -> Response:
         queryset = self.get_queryset()
         queryset = queryset.filter(post_id=kwargs.get("pk"))
-        serializer = CommentarySerializer(queryset, many=True)
-        return Response(serializer.data)
+        if settings.FAST_LIST_SERIALIZATION:
+            fast = fast_serializers.COMMENTS
+            page = self.paginate_queryset(fast.values(queryset))
+            return self.get_paginated_response(fast.serialize(page))
+
+        page = self.paginate_queryset(queryset)
+        serializer = CommentarySerializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
 
 class CommentDetailUpdateView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = CommentarySerializer
-    queryset = Commentary.objects.select_related("post", "user")
+    queryset = Commentary.objects.select_related("user")
     permission_classes = (IsOwnerOrReadOnlyComment,)
 
     def get_queryset(self) -> QuerySet:
         queryset = self.queryset.filter(post_id=self.kwargs.get("pi"))
         return queryset
+
+    def perform_destroy(self, instance) -> None:
+        with transaction.atomic():
+            instance.delete()
+            Post.objects.filter(
+                pk=instance.post_id, comment_count__gt=0
+            ).update(comment_count=F("comment_count") - 1)
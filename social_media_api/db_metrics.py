@@ -0,0 +1,47 @@
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from django.db.backends.signals import connection_created
+
+
+@dataclass
+class ConnectionMetrics:
+    """Database connection work done while serving one request"""
+    opened: int = 0
+    pool_wait: float = 0.0
+
+
+_current: ContextVar[ConnectionMetrics | None] = ContextVar(
+    "db_connection_metrics", default=None
+)
+
+
+def start():
+    return _current.set(ConnectionMetrics())
+
+
+def finish(token) -> ConnectionMetrics:
+    metrics = _current.get()
+    _current.reset(token)
+    return metrics
+
+
+def record_pool_wait(seconds: float) -> None:
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.pool_wait += seconds
+
+
+def record_opened() -> None:
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.opened += 1
+
+
+def count_opened(sender, connection, **kwargs) -> None:
+    # pooled backends record only the connections they really open
+    if not getattr(connection, "pooled", False):
+        record_opened()
+
+
+connection_created.connect(count_opened)
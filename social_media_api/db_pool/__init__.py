@@ -0,0 +1,5 @@
+"""PostgreSQL backend that keeps connections in an in-process pool
+
+Set ``ENGINE`` to ``social_media_api.db_pool`` and size the pool with the
+``POOL`` key of the database settings.
+"""
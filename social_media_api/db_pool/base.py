@@ -0,0 +1,110 @@
+import atexit
+from typing import Callable
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.psycopg_any import (
+    IsolationLevel,
+    is_psycopg3,
+)
+
+from social_media_api import db_metrics
+from social_media_api.db_pool.pool import ConnectionPool, pools, pools_lock
+
+
+if is_psycopg3:
+    raise ImproperlyConfigured("the pooled backend supports psycopg2 only")
+
+DEFAULT_POOL = {
+    "MIN_SIZE": 0,
+    "MAX_SIZE": 10,
+    "TIMEOUT": 10,
+    "MAX_LIFETIME": 3600,
+    "CHECK_AFTER": 30,
+}
+
+
+def get_pool(alias: str, settings_dict: dict,
+             connect: Callable | None = None) -> ConnectionPool:
+    """Pool of the alias, created on first use
+
+    A new pool opens MIN_SIZE connections with ``connect`` right away and
+    closes its idle connections when the process exits.
+    """
+    with pools_lock:
+        pool = pools.get(alias)
+        created = pool is None
+        if created:
+            config = {**DEFAULT_POOL, **settings_dict.get("POOL", {})}
+            pool = pools[alias] = ConnectionPool(
+                check=is_usable,
+                min_size=config["MIN_SIZE"],
+                max_size=config["MAX_SIZE"],
+                timeout=config["TIMEOUT"],
+                max_lifetime=config["MAX_LIFETIME"],
+                check_after=config["CHECK_AFTER"],
+            )
+            atexit.register(pool.close_all)
+    # connect outside the registry lock, other aliases need not wait
+    if created and connect is not None:
+        pool.fill(connect)
+    return pool
+
+
+def is_usable(connection) -> bool:
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1")
+    return True
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """PostgreSQL wrapper that borrows connections from a shared pool
+
+    Closing hands the connection back instead of disconnecting, so keep
+    CONN_MAX_AGE at 0: connections return to the pool after every
+    request and idle ones are shared by all threads of the process.
+    """
+
+    # connection_created fires on every borrow, db_metrics counts the
+    # connections this backend really opens instead
+    pooled = True
+
+    def get_new_connection(self, conn_params):
+        def connect():
+            connection = super(DatabaseWrapper, self).get_new_connection(
+                conn_params
+            )
+            db_metrics.record_opened()
+            return connection
+
+        pool = get_pool(self.alias, self.settings_dict, connect)
+        # normally recorded while connecting, reused connections skip that
+        self.isolation_level = IsolationLevel(
+            self.settings_dict["OPTIONS"].get(
+                "isolation_level", IsolationLevel.READ_COMMITTED
+            )
+        )
+        connection, waited = pool.acquire(connect)
+        db_metrics.record_pool_wait(waited)
+        return connection
+
+    def _close(self):
+        if self.connection is None:
+            return
+        with self.wrap_database_errors:
+            get_pool(self.alias, self.settings_dict).release(
+                self.connection, reusable=self._reset_for_reuse()
+            )
+
+    def _reset_for_reuse(self) -> bool:
+        connection = self.connection
+        if connection.closed:
+            return False
+        try:
+            # never hand an open transaction to the next borrower
+            if (connection.get_transaction_status()
+                    != base.Database.extensions.TRANSACTION_STATUS_IDLE):
+                connection.rollback()
+        except base.Database.Error:
+            return False
+        return not connection.closed
@@ -0,0 +1,147 @@
+import threading
+import time
+from collections import deque
+from typing import Callable
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+# pools of the process by database alias
+pools: dict[str, "ConnectionPool"] = {}
+pools_lock = threading.Lock()
+
+
+def pool_stats() -> dict[str, dict]:
+    with pools_lock:
+        return {alias: pool.stats() for alias, pool in pools.items()}
+
+
+class ConnectionPool:
+    """Thread-safe pool of DB-API connections with a bounded size
+
+    Callers block up to ``timeout`` seconds for a free connection once
+    ``max_size`` connections are out. Idle connections are checked with
+    ``check`` before reuse when they sat longer than ``check_after``
+    seconds, connections older than ``max_lifetime`` are replaced.
+    """
+
+    def __init__(self, check: Callable, min_size: int, max_size: int,
+                 timeout: float, max_lifetime: float,
+                 check_after: float) -> None:
+        self.check = check
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.check_after = check_after
+        # (connection, created at, returned at), most recently used last
+        self._idle = deque()
+        self._created = {}
+        self._size = 0
+        self._condition = threading.Condition()
+        self.waits = 0
+        self.timeouts = 0
+        self.opened = 0
+
+    def acquire(self, connect: Callable) -> tuple[object, float]:
+        """Take a connection, return it with the seconds spent waiting
+
+        ``connect`` opens a new connection when none is idle.
+        """
+        started = time.monotonic()
+        deadline = started + self.timeout
+        while True:
+            with self._condition:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        raise PoolTimeout(
+                            f"no connection free after {self.timeout}s "
+                            f"({self.max_size} in use)"
+                        )
+                    self.waits += 1
+                    self._condition.wait(remaining)
+                if self._idle:
+                    connection, created, returned = self._idle.pop()
+                else:
+                    connection = None
+                    # reserve the slot before connecting outside the lock
+                    self._size += 1
+
+            if connection is None:
+                return self._open(connect), time.monotonic() - started
+            now = time.monotonic()
+            if (now - created > self.max_lifetime
+                    or (now - returned > self.check_after
+                        and not self._usable(connection))):
+                self._discard(connection)
+                continue
+            return connection, time.monotonic() - started
+
+    def release(self, connection, reusable: bool = True) -> None:
+        if not reusable:
+            self._discard(connection)
+            return
+        with self._condition:
+            created = self._created.get(id(connection), time.monotonic())
+            self._idle.append((connection, created, time.monotonic()))
+            self._condition.notify()
+
+    def fill(self, connect: Callable) -> None:
+        """Open connections until min_size of them exist"""
+        while True:
+            with self._condition:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            self.release(self._open(connect))
+
+    def close_all(self) -> None:
+        with self._condition:
+            idle, self._idle = list(self._idle), deque()
+        for connection, _, _ in idle:
+            self._discard(connection)
+
+    def stats(self) -> dict:
+        with self._condition:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "max_size": self.max_size,
+                "opened": self.opened,
+                "waits": self.waits,
+                "timeouts": self.timeouts,
+            }
+
+    def _open(self, connect: Callable):
+        try:
+            connection = connect()
+        except BaseException:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._created[id(connection)] = time.monotonic()
+            self.opened += 1
+        return connection
+
+    def _usable(self, connection) -> bool:
+        try:
+            return self.check(connection)
+        except Exception:
+            return False
+
+    def _discard(self, connection) -> None:
+        try:
+            connection.close()
+        except Exception:
+            pass
+        with self._condition:
+            self._created.pop(id(connection), None)
+            self._size -= 1
+            self._condition.notify()
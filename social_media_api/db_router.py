@@ -0,0 +1,105 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+@dataclass
+class RoutingState:
+    """How the request being served may use the database"""
+    use_replica: bool = False
+    wrote: bool = False
+
+
+# commands, workers and anything outside a request read from the primary
+_state: ContextVar[RoutingState | None] = ContextVar(
+    "db_routing_state", default=None
+)
+
+
+def replica_aliases() -> list[str]:
+    return settings.REPLICA_ROUTING["DATABASES"]
+
+
+def start(use_replica: bool):
+    return _state.set(RoutingState(use_replica=use_replica))
+
+
+def finish(token) -> RoutingState:
+    state = _state.get()
+    _state.reset(token)
+    return state
+
+
+def _sticky_key(user_key: str) -> str:
+    return f"replica-routing:sticky:{user_key}"
+
+
+def _cache():
+    return caches[settings.REPLICA_ROUTING["CACHE_ALIAS"]]
+
+
+def is_sticky(user_key: str | None) -> bool:
+    """Whether this user wrote recently enough to need the primary"""
+    return user_key is not None and bool(_cache().get(_sticky_key(user_key)))
+
+
+def make_sticky(user_key: str | None) -> None:
+    if user_key is not None:
+        _cache().set(
+            _sticky_key(user_key),
+            True,
+            settings.REPLICA_ROUTING["STICKY_SECONDS"],
+        )
+
+
+@contextmanager
+def primary_reads():
+    """Read from the primary inside the block, for data just changed"""
+    state = _state.get()
+    if state is None or not state.use_replica:
+        yield
+        return
+    state.use_replica = False
+    try:
+        yield
+    finally:
+        state.use_replica = True
+
+
+class ReplicaRouter:
+    """Send reads of safe requests to a replica, everything else to default
+
+    Reads stay on the primary inside transactions, outside requests and
+    for users who wrote within the stickiness window, so nobody reads a
+    replica that has not caught up with their own change yet.
+    """
+
+    def db_for_read(self, model, **hints) -> str | None:
+        state = _state.get()
+        replicas = replica_aliases()
+        if (not replicas or state is None or not state.use_replica
+                or state.wrote
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints) -> str:
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints) -> bool:
+        # replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None,
+                      **hints) -> bool | None:
+        if db in replica_aliases():
+            return False
+        return None
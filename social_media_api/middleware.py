@@ -0,0 +1,192 @@
+import logging
+
+import jwt
+from asgiref.sync import (
+    iscoroutinefunction,
+    markcoroutinefunction,
+    sync_to_async,
+)
+from django.conf import settings
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from social_media_api import db_metrics, db_router, query_metrics
+
+
+logger = logging.getLogger("social_media_api.db")
+query_logger = logging.getLogger("social_media_api.queries")
+
+
+class DatabaseConnectionMetricsMiddleware:
+    """Report connections opened and pool wait time of every request
+
+    Adds ``X-DB-Connections-Opened`` (0 when a persistent or pooled
+    connection was reused) and ``X-DB-Pool-Wait-Ms`` headers.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response) -> None:
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = db_metrics.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics = db_metrics.finish(token)
+        return self.report(request, response, metrics)
+
+    async def __acall__(self, request):
+        token = db_metrics.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics = db_metrics.finish(token)
+        return self.report(request, response, metrics)
+
+    @staticmethod
+    def report(request, response, metrics):
+        response["X-DB-Connections-Opened"] = str(metrics.opened)
+        response["X-DB-Pool-Wait-Ms"] = f"{metrics.pool_wait * 1000:.1f}"
+        logger.debug(
+            "%s %s opened=%d pool_wait=%.1fms",
+            request.method, request.path,
+            metrics.opened, metrics.pool_wait * 1000,
+        )
+        return response
+
+
+def request_user_key(request) -> str | None:
+    """Id of the requesting user, read before DRF authenticates the request
+
+    The JWT is only decoded, not verified: the id picks the database to
+    read from, the view still authenticates the request as usual.
+    """
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        return str(user.pk)
+    header = request.META.get(jwt_settings.AUTH_HEADER_NAME, "").split()
+    if len(header) != 2 or header[0] not in jwt_settings.AUTH_HEADER_TYPES:
+        return None
+    try:
+        payload = jwt.decode(header[1], options={"verify_signature": False})
+    except jwt.PyJWTError:
+        return None
+    user_id = payload.get(jwt_settings.USER_ID_CLAIM)
+    return None if user_id is None else str(user_id)
+
+
+class ReplicaRoutingMiddleware:
+    """Let safe requests read from replicas unless the user just wrote
+
+    Any request that writes makes its user stick to the primary for
+    REPLICA_ROUTING["STICKY_SECONDS"] so they read their own changes.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response) -> None:
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = db_router.start(self.use_replica(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            state = db_router.finish(token)
+        if state.wrote:
+            db_router.make_sticky(request_user_key(request))
+        return response
+
+    async def __acall__(self, request):
+        use_replica = await sync_to_async(self.use_replica)(request)
+        token = db_router.start(use_replica)
+        try:
+            response = await self.get_response(request)
+        finally:
+            state = db_router.finish(token)
+        if state.wrote:
+            await sync_to_async(db_router.make_sticky)(
+                request_user_key(request)
+            )
+        return response
+
+    @staticmethod
+    def use_replica(request) -> bool:
+        if not db_router.replica_aliases():
+            return False
+        if request.method not in SAFE_METHODS:
+            return False
+        return not db_router.is_sticky(request_user_key(request))
+
+
+class QueryInstrumentationMiddleware:
+    """Count SQL of every request and hold endpoints to a query budget
+
+    Adds ``X-Query-Count``, ``X-Query-Time-Ms`` and ``X-Query-Repeated``
+    (most runs of one statement) headers. Statements repeated
+    REPEAT_THRESHOLD times are logged as a likely N+1, going over the
+    budget of the endpoint ("<METHOD> <URL name>") is logged or, in
+    strict mode, raised.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response) -> None:
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with query_metrics.capture() as metrics:
+            response = self.get_response(request)
+        return self.report(request, response, metrics)
+
+    async def __acall__(self, request):
+        with query_metrics.capture() as metrics:
+            response = await self.get_response(request)
+        return self.report(request, response, metrics)
+
+    @staticmethod
+    def report(request, response, metrics):
+        config = settings.QUERY_INSTRUMENTATION
+        repeated = metrics.repeated(config["REPEAT_THRESHOLD"])
+        response["X-Query-Count"] = str(metrics.count)
+        response["X-Query-Time-Ms"] = f"{metrics.duration * 1000:.1f}"
+        response["X-Query-Repeated"] = str(
+            max(metrics.fingerprints.values(), default=0)
+        )
+        query_logger.debug(
+            "%s %s queries=%d time=%.1fms", request.method, request.path,
+            metrics.count, metrics.duration * 1000,
+        )
+        for statement, times in repeated:
+            query_logger.warning(
+                "possible N+1 in %s %s, ran %d times: %s",
+                request.method, request.path, times, statement,
+            )
+
+        match = request.resolver_match
+        endpoint = f"{request.method} {match.view_name}" if match else None
+        budget = config["BUDGETS"].get(endpoint)
+        if budget is not None and metrics.count > budget:
+            message = (
+                f"{endpoint} ({request.path}) ran {metrics.count} queries, "
+                f"budget is {budget}"
+            )
+            if config["STRICT"]:
+                raise query_metrics.QueryBudgetExceeded(message)
+            query_logger.warning(message)
+            response["X-Query-Budget-Exceeded"] = str(budget)
+        return response
@@ -0,0 +1,96 @@
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+
+IN_LIST_RE = re.compile(r"\((?:%s, )+%s\)")
+SPACES_RE = re.compile(r"\s+")
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def fingerprint(sql: str) -> str:
+    """SQL with the parts that vary between repeats of a statement folded"""
+    return SPACES_RE.sub(" ", IN_LIST_RE.sub("(...)", sql)).strip()
+
+
+@dataclass
+class QueryMetrics:
+    """Queries run while serving one request"""
+    count: int = 0
+    duration: float = 0.0
+    fingerprints: Counter = field(default_factory=Counter)
+    # enclosing capture() block, which counts the same queries
+    parent: "QueryMetrics | None" = field(default=None, repr=False)
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        return [
+            (statement, times)
+            for statement, times in self.fingerprints.most_common()
+            if times >= threshold
+        ]
+
+
+_current: ContextVar[QueryMetrics | None] = ContextVar(
+    "query_metrics", default=None
+)
+
+
+def record(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - start
+        statement = fingerprint(sql)
+        while metrics is not None:
+            metrics.duration += duration
+            metrics.count += 1
+            metrics.fingerprints[statement] += 1
+            metrics = metrics.parent
+
+
+def install(connection) -> None:
+    """Wrap the queries of a connection with record, once"""
+    if record not in connection.execute_wrappers:
+        # outermost, execute_wrapper() blocks pop the last wrapper
+        connection.execute_wrappers.insert(0, record)
+
+
+def install_on_connect(sender, connection, **kwargs) -> None:
+    # connections are per thread, under ASGI the ORM calls of async views
+    # run in threads of sync_to_async that capture() never sees
+    install(connection)
+
+
+connection_created.connect(install_on_connect)
+
+
+class capture:
+    """Collect QueryMetrics of every database alias inside the block
+
+    Queries count on any thread the context of the block reaches, as
+    sync_to_async copies it.
+    """
+
+    def __enter__(self) -> QueryMetrics:
+        parent = _current.get()
+        self.metrics = QueryMetrics(parent=parent)
+        self._token = _current.set(self.metrics)
+        # connections of this thread may have been opened before import
+        for connection in connections.all():
+            install(connection)
+        return self.metrics
+
+    def __exit__(self, *exc_info) -> None:
+        _current.reset(self._token)
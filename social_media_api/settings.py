@@ -45,14 +45,18 @@ INSTALLED_APPS = [
     "drf_spectacular",
     "user",
     "social_media",
+    "task_queue",
 ]
 
 MIDDLEWARE = [
+    "social_media_api.middleware.DatabaseConnectionMetricsMiddleware",
+    "social_media_api.middleware.QueryInstrumentationMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "social_media_api.middleware.ReplicaRoutingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -81,15 +85,93 @@ WSGI_APPLICATION = "social_media_api.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# DB_POOL=True borrows connections from an in-process pool instead of
+# keeping one persistent connection per thread
+DB_POOL = os.getenv("DB_POOL", "False").lower() == "true"
+
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
+        "ENGINE": (
+            "social_media_api.db_pool" if DB_POOL
+            else "django.db.backends.postgresql"
+        ),
         "NAME": os.getenv("POSTGRES_DB"),
         "USER": os.getenv("POSTGRES_USER"),
         "PASSWORD": os.getenv("POSTGRES_PASSWORD"),
         "HOST": os.getenv("POSTGRES_HOST"),
         "PORT": os.getenv("POSTGRES_PORT"),
+        # pooled connections go back to the pool after each request
+        "CONN_MAX_AGE": (
+            0 if DB_POOL else int(os.getenv("DB_CONN_MAX_AGE", 60))
+        ),
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            "connect_timeout": int(os.getenv("DB_CONNECT_TIMEOUT", 5)),
+        },
+        "POOL": {
+            "MIN_SIZE": int(os.getenv("DB_POOL_MIN_SIZE", 0)),
+            "MAX_SIZE": int(os.getenv("DB_POOL_MAX_SIZE", 10)),
+            # seconds to wait for a free connection before failing
+            "TIMEOUT": float(os.getenv("DB_POOL_TIMEOUT", 10)),
+            "MAX_LIFETIME": int(os.getenv("DB_POOL_MAX_LIFETIME", 3600)),
+            "CHECK_AFTER": int(os.getenv("DB_POOL_CHECK_AFTER", 30)),
+        },
+    }
+}
+
+# read replicas, comma separated host[:port] list
+REPLICA_HOSTS = [
+    host.strip()
+    for host in os.getenv("POSTGRES_REPLICA_HOSTS", "").split(",")
+    if host.strip()
+]
+for number, replica in enumerate(REPLICA_HOSTS, start=1):
+    host, _, port = replica.partition(":")
+    DATABASES[f"replica_{number}"] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "PORT": port or DATABASES["default"]["PORT"],
+        # tests read the test database of default through every replica
+        "TEST": {"MIRROR": "default"},
     }
+
+DATABASE_ROUTERS = ["social_media_api.db_router.ReplicaRouter"]
+
+REPLICA_ROUTING = {
+    "DATABASES": [
+        f"replica_{number}" for number in range(1, len(REPLICA_HOSTS) + 1)
+    ],
+    # seconds a user reads from the primary after writing anything, and
+    # cached responses dropped by a write are refilled from the primary
+    "STICKY_SECONDS": int(os.getenv("REPLICA_STICKY_SECONDS", 5)),
+    "CACHE_ALIAS": "default",
+}
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND",
+            "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", "social-media-api"),
+    }
+}
+
+if os.getenv("REDIS_URL"):
+    CACHES["default"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.getenv("REDIS_URL"),
+    }
+
+RESPONSE_CACHE = {
+    "ALIAS": "default",
+    "TIMEOUT": int(os.getenv("RESPONSE_CACHE_TIMEOUT", 300)),
+    # post list pages are not dropped when likes or comments change
+    # counters, they show them up to this many seconds late
+    "LIST_TIMEOUT": int(os.getenv("RESPONSE_CACHE_LIST_TIMEOUT", 60)),
 }
 
 
@@ -142,8 +224,62 @@ REST_FRAMEWORK = {
     "DATETIME_FORMAT": "%Y-%m-%d %H:%M:%S",
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
-    )
+        "user.authentication.ClaimsJWTAuthentication",
+    ),
+    "DEFAULT_THROTTLE_CLASSES": (
+        "social_media_api.throttling.TokenBucketThrottle",
+    ),
+    "DEFAULT_PAGINATION_CLASS": (
+        "social_media.pagination.CappedLimitOffsetPagination"
+    ),
+    "PAGE_SIZE": int(os.getenv("PAGE_SIZE", 20)),
+}
+
+# upper bound for ?page_size= / ?limit= requested by clients
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", 100))
+
+# newest comments embedded in the post detail, the rest are paged
+POST_DETAIL_COMMENTS = int(os.getenv("POST_DETAIL_COMMENTS", 10))
+
+# most ids accepted by one bulk like/follow request
+BULK_ACTION_MAX_IDS = int(os.getenv("BULK_ACTION_MAX_IDS", 500))
+
+# serialize read-only list pages from .values() rows instead of models
+FAST_LIST_SERIALIZATION = (
+    os.getenv("FAST_LIST_SERIALIZATION", "True").lower() == "true"
+)
+
+QUERY_INSTRUMENTATION = {
+    # raise instead of logging when an endpoint goes over its budget,
+    # turn on in tests so a new N+1 fails them
+    "STRICT": os.getenv("QUERY_BUDGET_STRICT", "False").lower() == "true",
+    # one statement run this many times in a request is logged as N+1
+    "REPEAT_THRESHOLD": int(os.getenv("QUERY_REPEAT_THRESHOLD", 5)),
+    # most queries allowed per request, by "<METHOD> <URL name>"
+    "BUDGETS": {
+        "GET social:post-list-create": 4,
+        "GET social:post-detail": 5,
+        "GET social:post-comment": 4,
+        "GET social:comment-detail": 4,
+        "GET social:user-posts": 4,
+        "GET social:liked-posts": 4,
+        "GET social:followed-posts": 5,
+        "GET social:profile-list": 5,
+        "GET social:profile-detail": 4,
+        "GET social:profile-followers": 3,
+        "GET social:profile-following": 3,
+        "GET social:profile-get-suggestions": 4,
+        "GET social:profile-get-followed-profiles": 5,
+        "GET social:profile-get-following-profiles": 5,
+        "GET social:tag-list": 4,
+        "GET social:trending": 4,
+        "GET social:search-posts": 5,
+        "GET social:search-profiles": 4,
+        "GET social-async:post-list": 4,
+        "GET social-async:post-detail": 5,
+        "GET social-async:post-comment": 4,
+        "GET social-async:followed-posts": 5,
+    },
 }
 
 SPECTACULAR_SETTINGS = {
@@ -159,8 +295,99 @@ SPECTACULAR_SETTINGS = {
     },
 }
 
+TIMELINE = {
+    "BACKEND": os.getenv(
+        "TIMELINE_BACKEND",
+        "social_media.timeline.DatabaseTimelineBackend"
+    ),
+    "DEPTH": int(os.getenv("TIMELINE_DEPTH", 800)),
+    "FANOUT_LIMIT": int(os.getenv("TIMELINE_FANOUT_LIMIT", 10000)),
+    # seconds between trims of timelines grown past DEPTH
+    "TRIM_INTERVAL": int(os.getenv("TIMELINE_TRIM_INTERVAL", 300)),
+    "REDIS_URL": os.getenv("REDIS_URL"),
+}
+
+TRENDING = {
+    "BUCKET_MINUTES": int(os.getenv("TRENDING_BUCKET_MINUTES", 60)),
+    "WINDOW_HOURS": int(os.getenv("TRENDING_WINDOW_HOURS", 48)),
+    "HALF_LIFE_HOURS": float(os.getenv("TRENDING_HALF_LIFE_HOURS", 6)),
+    "TOP_K": int(os.getenv("TRENDING_TOP_K", 50)),
+    "LIKE_WEIGHT": 1,
+    "COMMENT_WEIGHT": 2,
+}
+
+SUGGESTIONS = {
+    "TOP_N": int(os.getenv("SUGGESTIONS_TOP_N", 20)),
+    # profiles following more than this many others, and posts with more
+    # likers, say little about taste and are skipped as intermediate hops
+    "HUB_LIMIT": int(os.getenv("SUGGESTIONS_HUB_LIMIT", 5000)),
+    "FOLLOW_WEIGHT": 1.0,
+    "LIKE_WEIGHT": 0.5,
+}
+
+IMAGE_PROCESSING = {
+    "QUALITY": int(os.getenv("IMAGE_QUALITY", 82)),
+    # longest edge in pixels of every generated variant
+    "VARIANTS": {
+        "thumbnail": 160,
+        "feed": 720,
+        "full": 1600,
+    },
+}
+
+TASK_QUEUE = {
+    # run tasks inline once the transaction commits, no worker needed
+    "EAGER": os.getenv("TASK_QUEUE_EAGER", "False").lower() == "true",
+    "MAX_ATTEMPTS": int(os.getenv("TASK_MAX_ATTEMPTS", 5)),
+    "RETRY_BASE_SECONDS": 10,
+    "RETRY_MAX_SECONDS": 3600,
+    # seconds a running task may go silent before it is queued again
+    "VISIBILITY_TIMEOUT": int(os.getenv("TASK_VISIBILITY_TIMEOUT", 600)),
+    "POLL_INTERVAL": float(os.getenv("TASK_POLL_INTERVAL", 1)),
+}
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=60),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=2),
     "ROTATE_REFRESH_TOKENS": False,
 }
+
+THROTTLING = {
+    "ENABLED": os.getenv("THROTTLING_ENABLED", "True").lower() == "true",
+    "BACKEND": (
+        "social_media_api.throttling.RedisTokenBuckets"
+        if os.getenv("REDIS_URL")
+        else "social_media_api.throttling.CacheTokenBuckets"
+    ),
+    "CACHE_ALIAS": "default",
+    "REDIS_URL": os.getenv("REDIS_URL"),
+    # "<METHOD> <view name>": {"user" and/or "ip": "<tokens>/<period>"}
+    "RATES": {
+        "GET social:like-post": {"user": "60/min"},
+        "POST social:bulk-like-posts": {"user": "10/min"},
+        "GET social:profile-toggle-follow": {"user": "30/min"},
+        "POST social:profile-bulk-follow": {"user": "10/min"},
+        "POST social:post-list-create": {"user": "30/min"},
+        "POST social:post-comment": {"user": "60/min"},
+        "POST social:profile-upload-profile-picture": {"user": "10/hour"},
+        "GET social:export-data": {"user": "5/hour"},
+        "POST user:create": {"ip": "5/hour"},
+        "POST user:token-obtain": {"ip": "20/min"},
+        "POST user:token-refresh": {"ip": "60/min"},
+    },
+    # shared by every other write of one user and of one client IP
+    "DEFAULT_WRITE_RATES": {"user": "120/min", "ip": "300/min"},
+}
+
+JWT_AUTH = {
+    # build request.user from the user id and profile id claims instead
+    # of loading the user row on every request
+    "STATELESS": os.getenv("JWT_STATELESS", "True").lower() == "true",
+    # reject tokens revoked through /api/user/token/revoke/
+    "DENYLIST": os.getenv("JWT_DENYLIST", "True").lower() == "true",
+    "DENYLIST_CACHE_ALIAS": os.getenv("JWT_DENYLIST_CACHE_ALIAS", "default"),
+    # seconds a denylist lookup is remembered in-process
+    "DENYLIST_LOCAL_SECONDS": int(
+        os.getenv("JWT_DENYLIST_LOCAL_SECONDS", 5)
+    ),
+}
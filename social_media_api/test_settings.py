@@ -0,0 +1,21 @@
+from social_media_api.settings import *  # noqa: F401, F403
+from social_media_api.settings import (
+    DATABASES,
+    QUERY_INSTRUMENTATION,
+    THROTTLING,
+)
+
+
+# a replica reading the test database of default, tests that cover
+# routing list it in REPLICA_ROUTING["DATABASES"] themselves
+DATABASES["replica"] = {
+    **DATABASES["default"],
+    "TEST": {"MIRROR": "default"},
+}
+
+# a request going over its query budget fails the test
+QUERY_INSTRUMENTATION = {**QUERY_INSTRUMENTATION, "STRICT": True}
+
+# buckets would carry over between tests and make them depend on their
+# order, the throttling tests turn it on for themselves
+THROTTLING = {**THROTTLING, "ENABLED": False}
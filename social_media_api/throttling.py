@@ -0,0 +1,297 @@
+"""Token bucket rate limiting of API endpoints
+
+Rules in ``THROTTLING["RATES"]`` are keyed "<METHOD> <view name>" and
+give a rate per scope: "user" buckets are per authenticated user (or
+client IP for anonymous requests), "ip" buckets per client IP. Writes
+without a rule of their own share the ``DEFAULT_WRITE_RATES`` buckets.
+A bucket holds up to N tokens and refills N per period, so a client may
+burst N requests and then continues at the average rate.
+"""
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import BaseThrottle
+
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+WRITE_RULE = "write"
+
+
+@dataclass(frozen=True)
+class Rate:
+    capacity: int
+    seconds: int
+
+    @property
+    def per_second(self) -> float:
+        return self.capacity / self.seconds
+
+
+@lru_cache(maxsize=None)
+def parse_rate(rate: str) -> Rate:
+    """"30/min" -> Rate(30, 60); the period is read from its first letter"""
+    count, period = rate.split("/")
+    return Rate(int(count), PERIODS[period[0]])
+
+
+def refill(tokens: float, updated: float, rate: Rate,
+           now: float) -> tuple[float, bool, float]:
+    """Tokens left after taking one, whether one was taken, seconds to wait"""
+    tokens = min(rate.capacity, tokens + max(now - updated, 0)
+                 * rate.per_second)
+    if tokens >= 1:
+        return tokens - 1, True, 0.0
+    return tokens, False, (1 - tokens) / rate.per_second
+
+
+def take_tokens(buckets: list[tuple[str, Rate]], states: list,
+                now: float) -> tuple[list | None, float]:
+    """New (tokens, updated) of every bucket after taking a token from each
+
+    None and the longest wait when one of them is empty, nothing may be
+    taken then.
+    """
+    taken, allowed, wait = [], True, 0.0
+    for (_, rate), state in zip(buckets, states):
+        tokens, updated = state or (rate.capacity, now)
+        tokens, ok, bucket_wait = refill(tokens, updated, rate, now)
+        if not ok:
+            allowed, wait = False, max(wait, bucket_wait)
+        taken.append((tokens, now))
+    return (taken, 0.0) if allowed else (None, wait)
+
+
+class BaseTokenBuckets:
+    def take_all(self, buckets: list[tuple[str, Rate]]) -> tuple[bool, float]:
+        """Take a token from every bucket or, when one is empty, from none:
+        (allowed, seconds to wait)"""
+        raise NotImplementedError
+
+    def take(self, key: str, rate: Rate) -> tuple[bool, float]:
+        """Take a token from the bucket: (allowed, seconds to wait)"""
+        return self.take_all([(key, rate)])
+
+
+class LocalTokenBuckets(BaseTokenBuckets):
+    """Process-local buckets, also the fallback when the shared store fails"""
+
+    def __init__(self, max_entries: int = 10000) -> None:
+        self.max_entries = max_entries
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take_all(self, buckets: list[tuple[str, Rate]]) -> tuple[bool, float]:
+        now = time.time()
+        with self._lock:
+            states = [self._buckets.pop(key, None) for key, _ in buckets]
+            taken, wait = take_tokens(buckets, states, now)
+            for (key, _), state in zip(buckets, taken or states):
+                if state is not None:
+                    self._buckets[key] = state
+            while len(self._buckets) > self.max_entries:
+                self._buckets.popitem(last=False)
+        return taken is not None, wait
+
+
+class CacheTokenBuckets(BaseTokenBuckets):
+    """Buckets in a Django cache shared by all processes
+
+    Read and write are separate cache calls, so concurrent requests of
+    one client may each take the same token; use RedisTokenBuckets where
+    that matters.
+    """
+
+    def __init__(self) -> None:
+        self.cache = caches[settings.THROTTLING["CACHE_ALIAS"]]
+
+    def take_all(self, buckets: list[tuple[str, Rate]]) -> tuple[bool, float]:
+        now = time.time()
+        stored = self.cache.get_many([key for key, _ in buckets])
+        taken, wait = take_tokens(
+            buckets, [stored.get(key) for key, _ in buckets], now
+        )
+        if taken is None:
+            return False, wait
+        self.cache.set_many(
+            {key: state for (key, _), state in zip(buckets, taken)},
+            max(rate.seconds for _, rate in buckets) + 1,
+        )
+        return True, 0.0
+
+
+# refill every bucket, then take a token from each or from none, in one
+# atomic step on the Redis server; ARGV is now, then capacity, tokens
+# per second and expiry of each key
+TAKE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local levels = {}
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[3 * i - 1])
+    local per_second = tonumber(ARGV[3 * i])
+    local state = redis.call("HMGET", key, "tokens", "updated")
+    local tokens = tonumber(state[1]) or capacity
+    local updated = tonumber(state[2]) or now
+    tokens = math.min(capacity,
+                      tokens + math.max(now - updated, 0) * per_second)
+    if tokens < 1 then
+        wait = math.max(wait, (1 - tokens) / per_second)
+    end
+    levels[i] = tokens
+end
+if wait > 0 then
+    return {0, tostring(wait)}
+end
+for i, key in ipairs(KEYS) do
+    redis.call("HSET", key, "tokens", tostring(levels[i] - 1),
+               "updated", ARGV[1])
+    redis.call("EXPIRE", key, ARGV[3 * i + 1])
+end
+return {1, "0"}
+"""
+
+
+class RedisTokenBuckets(BaseTokenBuckets):
+    """Buckets in Redis hashes, updated atomically by a Lua script"""
+
+    def __init__(self) -> None:
+        try:
+            import redis
+        except ImportError as error:
+            raise ImproperlyConfigured(
+                "RedisTokenBuckets requires the redis package"
+            ) from error
+        client = redis.Redis.from_url(settings.THROTTLING["REDIS_URL"])
+        self.script = client.register_script(TAKE_SCRIPT)
+
+    def take_all(self, buckets: list[tuple[str, Rate]]) -> tuple[bool, float]:
+        args = [time.time()]
+        for _, rate in buckets:
+            args += [rate.capacity, rate.per_second, rate.seconds + 1]
+        allowed, wait = self.script(
+            keys=[key for key, _ in buckets], args=args
+        )
+        return bool(allowed), float(wait)
+
+
+def cache_key(*parts: str) -> str:
+    # rule names hold a space, which memcached does not accept in keys
+    return ":".join(("throttling", *parts)).replace(" ", "_")
+
+
+@lru_cache(maxsize=None)
+def get_buckets() -> BaseTokenBuckets:
+    return import_string(settings.THROTTLING["BACKEND"])()
+
+
+_fallback = LocalTokenBuckets()
+
+
+def take_all(buckets: list[tuple[str, Rate]]) -> tuple[bool, float]:
+    try:
+        return get_buckets().take_all(buckets)
+    except Exception as error:
+        logger.warning("throttle store failed, limiting in-process: %r",
+                       error)
+        _count("fallbacks")
+        return _fallback.take_all(buckets)
+
+
+# counters for ops, kept next to the response cache counters
+
+def _stats_key(name: str) -> str:
+    return cache_key("stats", name)
+
+
+def _count(name: str) -> None:
+    cache = caches[settings.THROTTLING["CACHE_ALIAS"]]
+    key = _stats_key(name)
+    try:
+        cache.add(key, 0, None)
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+    except Exception:
+        # counting must never fail the request it is counting
+        logger.debug("throttle counter %s not updated", name, exc_info=True)
+
+
+def stats() -> dict:
+    config = settings.THROTTLING
+    rules = [*config["RATES"], WRITE_RULE]
+    names = [f"{outcome}:{rule}" for rule in rules
+             for outcome in ("allowed", "throttled")]
+    cache = caches[config["CACHE_ALIAS"]]
+    values = cache.get_many([_stats_key(name) for name in names])
+    return {
+        "enabled": config["ENABLED"],
+        "fallbacks": cache.get(_stats_key("fallbacks"), 0),
+        "rules": {
+            rule: {
+                outcome: values.get(_stats_key(f"{outcome}:{rule}"), 0)
+                for outcome in ("allowed", "throttled")
+            }
+            for rule in rules
+        },
+    }
+
+
+def rule_for(request) -> tuple[str | None, dict]:
+    """Name and scope rates of the rule limiting this request"""
+    config = settings.THROTTLING
+    match = request.resolver_match
+    if match is not None:
+        rule = f"{request.method} {match.view_name}"
+        if rule in config["RATES"]:
+            return rule, config["RATES"][rule]
+    if request.method not in SAFE_METHODS:
+        return WRITE_RULE, config["DEFAULT_WRITE_RATES"]
+    return None, {}
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """DRF throttle taking a token from every scope bucket of the rule,
+    or from none of them when one is empty"""
+
+    def allow_request(self, request, view) -> bool:
+        self.wait_seconds = None
+        if not settings.THROTTLING["ENABLED"]:
+            return True
+        rule, rates = rule_for(request)
+        if not rates:
+            return True
+
+        buckets = [
+            (cache_key(rule, scope, self.scope_ident(request, scope)),
+             parse_rate(rate))
+            for scope, rate in rates.items()
+        ]
+        # a scope that denies must not cost the others a token
+        allowed, wait = take_all(buckets)
+        if not allowed:
+            self.wait_seconds = wait
+        _count(f"{'allowed' if allowed else 'throttled'}:{rule}")
+        return allowed
+
+    def scope_ident(self, request, scope: str) -> str:
+        user = request.user
+        if scope == "user" and user and user.is_authenticated:
+            return f"user-{user.pk}"
+        return f"ip-{self.get_ident(request)}"
+
+    def wait(self) -> float | None:
+        # DRF sends it rounded up as Retry-After
+        return (math.ceil(self.wait_seconds)
+                if self.wait_seconds is not None else None)
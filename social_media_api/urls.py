@@ -34,4 +34,8 @@ urlpatterns = [
         name="swagger-ui"
     ),
     path("api/social/", include("social_media.urls", namespace="social")),
+    path(
+        "api/social/async/",
+        include("social_media.async_urls", namespace="social-async")
+    ),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,10 @@
+from django.contrib import admin
+
+from task_queue.models import Task
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ("id", "name", "status", "attempts", "run_after")
+    list_filter = ("status", "name")
+    search_fields = ("name", "idempotency_key")
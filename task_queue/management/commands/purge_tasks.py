@@ -0,0 +1,28 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from task_queue.models import Task
+
+
+class Command(BaseCommand):
+    help = "Delete finished tasks older than the given age"
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--older-than-hours", type=int, default=72)
+        parser.add_argument(
+            "--include-failed",
+            action="store_true",
+            help="Delete failed tasks too, not only successful ones",
+        )
+
+    def handle(self, *args, **options) -> None:
+        statuses = [Task.DONE]
+        if options["include_failed"]:
+            statuses.append(Task.FAILED)
+        cutoff = timezone.now() - timedelta(hours=options["older_than_hours"])
+        deleted, _ = Task.objects.filter(
+            status__in=statuses, finished_at__lt=cutoff
+        ).delete()
+        self.stdout.write(self.style.SUCCESS(f"deleted {deleted} tasks"))
@@ -0,0 +1,43 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from task_queue.worker import Worker
+
+
+class Command(BaseCommand):
+    help = "Run queued background tasks until stopped"
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=1,
+            help="Number of tasks run at the same time",
+        )
+        parser.add_argument(
+            "--burst",
+            action="store_true",
+            help="Exit once no queued task is due instead of polling",
+        )
+
+    def handle(self, *args, **options) -> None:
+        worker = Worker(
+            concurrency=options["concurrency"], burst=options["burst"]
+        )
+
+        def shutdown(signum, frame) -> None:
+            self.stdout.write("finishing running tasks before exit...")
+            worker.stop()
+
+        signal.signal(signal.SIGINT, shutdown)
+        signal.signal(signal.SIGTERM, shutdown)
+
+        self.stdout.write(
+            f"worker {worker.name} started with "
+            f"{worker.concurrency} thread(s)"
+        )
+        worker.run()
+        self.stdout.write(self.style.SUCCESS(
+            f"processed {worker.processed} task(s), {worker.failed} failed"
+        ))
@@ -0,0 +1,84 @@
+from datetime import timedelta
+from typing import Callable
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from task_queue.models import Task
+
+
+_registry: dict[str, "RegisteredTask"] = {}
+
+
+class RegisteredTask:
+    """Function that can be run later by a worker
+
+    ``delay()`` queues a call with the given arguments, ``enqueue()``
+    additionally takes queueing options. Arguments are stored as JSON.
+    """
+
+    def __init__(self, func: Callable, name: str,
+                 max_attempts: int | None) -> None:
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, **kwargs) -> Task | None:
+        return enqueue(self.name, args=args, kwargs=kwargs)
+
+    def enqueue(self, args=(), kwargs=None, **options) -> Task | None:
+        return enqueue(self.name, args=args, kwargs=kwargs, **options)
+
+
+def task(func: Callable | None = None, *, name: str | None = None,
+         max_attempts: int | None = None):
+    """Register a function as a task, by default under its dotted path"""
+    def register(func: Callable) -> RegisteredTask:
+        registered = RegisteredTask(
+            func, name or f"{func.__module__}.{func.__name__}", max_attempts
+        )
+        _registry[registered.name] = registered
+        return registered
+
+    return register(func) if func is not None else register
+
+
+def get_task(name: str) -> RegisteredTask:
+    try:
+        return _registry[name]
+    except KeyError:
+        raise LookupError(f"unknown task {name!r}") from None
+
+
+def enqueue(name: str, args=(), kwargs=None,
+            idempotency_key: str | None = None, countdown: float = 0,
+            max_attempts: int | None = None) -> Task | None:
+    """Queue a task run, it becomes visible to workers on commit
+
+    A task queued again under an idempotency key it already used is
+    not queued twice, the existing row is returned instead.
+    """
+    registered = get_task(name)
+    args, kwargs = list(args), dict(kwargs or {})
+    if settings.TASK_QUEUE["EAGER"]:
+        transaction.on_commit(lambda: registered(*args, **kwargs))
+        return None
+
+    fields = {
+        "name": name,
+        "args": args,
+        "kwargs": kwargs,
+        "max_attempts": (max_attempts or registered.max_attempts
+                         or settings.TASK_QUEUE["MAX_ATTEMPTS"]),
+        "run_after": timezone.now() + timedelta(seconds=countdown),
+    }
+    if idempotency_key is None:
+        return Task.objects.create(**fields)
+    queued, _ = Task.objects.get_or_create(
+        idempotency_key=idempotency_key, defaults=fields
+    )
+    return queued
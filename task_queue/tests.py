@@ -0,0 +1,197 @@
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from task_queue.models import Task
+from task_queue.registry import enqueue, task
+from task_queue.worker import (
+    Worker,
+    backoff,
+    claim,
+    execute,
+    requeue_stale,
+)
+
+
+calls = []
+calls_lock = threading.Lock()
+
+
+@task(name="task_queue.tests.record")
+def record(value) -> None:
+    with calls_lock:
+        calls.append(value)
+
+
+@task(name="task_queue.tests.explode")
+def explode() -> None:
+    raise RuntimeError("boom")
+
+
+class EnqueueTests(TestCase):
+    def setUp(self) -> None:
+        calls.clear()
+
+    def test_delay_stores_the_call(self) -> None:
+        queued = record.delay(1)
+
+        self.assertEqual(queued.name, "task_queue.tests.record")
+        self.assertEqual((queued.args, queued.kwargs), ([1], {}))
+        self.assertEqual(queued.status, Task.QUEUED)
+        self.assertEqual(queued.max_attempts,
+                         settings.TASK_QUEUE["MAX_ATTEMPTS"])
+
+    def test_idempotency_key_queues_once(self) -> None:
+        first = record.enqueue(args=(1,), idempotency_key="once")
+        second = record.enqueue(args=(2,), idempotency_key="once")
+
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(Task.objects.get().args, [1])
+
+    def test_countdown_delays_the_run(self) -> None:
+        before = timezone.now()
+
+        queued = record.enqueue(args=(1,), countdown=60)
+
+        self.assertGreaterEqual(queued.run_after,
+                                before + timedelta(seconds=60))
+        self.assertIsNone(claim("worker"))
+
+    def test_unknown_task(self) -> None:
+        with self.assertRaises(LookupError):
+            enqueue("task_queue.tests.missing")
+
+    @override_settings(TASK_QUEUE={**settings.TASK_QUEUE, "EAGER": True})
+    def test_eager_mode_runs_on_commit(self) -> None:
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertIsNone(record.delay(1))
+            self.assertEqual(calls, [])
+
+        for callback in callbacks:
+            callback()
+
+        self.assertEqual(calls, [1])
+        self.assertFalse(Task.objects.exists())
+
+
+class WorkerTests(TestCase):
+    def setUp(self) -> None:
+        calls.clear()
+
+    def test_claim_takes_the_oldest_due_task(self) -> None:
+        now = timezone.now()
+        later = record.delay(2)
+        first = record.delay(1)
+        Task.objects.filter(pk=first.pk).update(
+            run_after=now - timedelta(minutes=1)
+        )
+        record.enqueue(args=(3,), countdown=60)
+
+        claimed = claim("worker")
+
+        self.assertEqual(claimed.pk, first.pk)
+        self.assertEqual(claimed.status, Task.RUNNING)
+        self.assertEqual(claimed.attempts, 1)
+        self.assertEqual(claimed.locked_by, "worker")
+        self.assertEqual(claim("worker").pk, later.pk)
+        self.assertIsNone(claim("worker"))
+
+    def test_claim_locks_one_row(self) -> None:
+        for value in range(3):
+            record.delay(value)
+
+        with CaptureQueriesContext(connections["default"]) as queries:
+            claim("worker")
+
+        locking = [query["sql"] for query in queries
+                   if "FOR UPDATE" in query["sql"]]
+        self.assertEqual(len(locking), 1)
+        self.assertIn("LIMIT 1", locking[0])
+
+    def test_execute_records_success(self) -> None:
+        record.delay(1)
+
+        self.assertTrue(execute(claim("worker")))
+
+        done = Task.objects.get()
+        self.assertEqual(calls, [1])
+        self.assertEqual(done.status, Task.DONE)
+        self.assertIsNotNone(done.finished_at)
+        self.assertEqual(done.locked_by, "")
+
+    def test_failures_retry_with_backoff_then_give_up(self) -> None:
+        explode.enqueue(max_attempts=2)
+
+        before = timezone.now()
+        with self.assertLogs("task_queue.worker", "WARNING") as logs:
+            self.assertFalse(execute(claim("worker")))
+        self.assertIn("retrying", logs.output[0])
+        retried = Task.objects.get()
+        self.assertEqual(retried.status, Task.QUEUED)
+        self.assertIn("RuntimeError: boom", retried.last_error)
+        delay = settings.TASK_QUEUE["RETRY_BASE_SECONDS"]
+        self.assertGreaterEqual(retried.run_after,
+                                before + timedelta(seconds=delay / 2))
+        self.assertIsNone(claim("worker"))
+
+        Task.objects.update(run_after=timezone.now())
+        with self.assertLogs("task_queue.worker", "ERROR") as logs:
+            self.assertFalse(execute(claim("worker")))
+        self.assertIn("failed for good", logs.output[0])
+        failed = Task.objects.get()
+        self.assertEqual(failed.status, Task.FAILED)
+        self.assertEqual(failed.attempts, 2)
+        self.assertIsNotNone(failed.finished_at)
+        self.assertIsNone(claim("worker"))
+
+    def test_backoff_doubles_with_jitter_up_to_the_cap(self) -> None:
+        config = settings.TASK_QUEUE
+        for attempts in (1, 2, 3, 20):
+            delay = min(config["RETRY_BASE_SECONDS"] * 2 ** (attempts - 1),
+                        config["RETRY_MAX_SECONDS"])
+            with self.subTest(attempts=attempts):
+                wait = backoff(attempts).total_seconds()
+                self.assertGreaterEqual(wait, delay / 2)
+                self.assertLessEqual(wait, delay)
+
+    def test_requeue_stale_hands_back_silent_tasks(self) -> None:
+        stale_at = timezone.now() - timedelta(
+            seconds=settings.TASK_QUEUE["VISIBILITY_TIMEOUT"] + 1
+        )
+        stale, exhausted, fresh = (record.delay(value) for value in range(3))
+        Task.objects.update(status=Task.RUNNING, attempts=1,
+                            locked_by="gone", locked_at=stale_at)
+        Task.objects.filter(pk=exhausted.pk).update(attempts=F("max_attempts"))
+        Task.objects.filter(pk=fresh.pk).update(locked_at=timezone.now())
+
+        self.assertEqual(requeue_stale(), 1)
+
+        statuses = dict(Task.objects.values_list("pk", "status"))
+        self.assertEqual(statuses, {
+            stale.pk: Task.QUEUED,
+            exhausted.pk: Task.FAILED,
+            fresh.pk: Task.RUNNING,
+        })
+        self.assertEqual(Task.objects.get(pk=stale.pk).locked_by, "")
+
+
+class ConcurrentWorkerTests(TransactionTestCase):
+    def setUp(self) -> None:
+        calls.clear()
+
+    def test_threads_run_every_task_once(self) -> None:
+        for value in range(20):
+            record.delay(value)
+
+        worker = Worker(concurrency=4, burst=True)
+        worker.run()
+
+        self.assertEqual(sorted(calls), list(range(20)))
+        self.assertEqual(worker.processed, 20)
+        self.assertFalse(Task.objects.exclude(status=Task.DONE).exists())
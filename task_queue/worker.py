@@ -0,0 +1,165 @@
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from task_queue.models import Task
+from task_queue.registry import get_task
+
+
+logger = logging.getLogger(__name__)
+
+
+def backoff(attempts: int) -> timedelta:
+    """Exponential delay before the next try, with jitter against herds"""
+    config = settings.TASK_QUEUE
+    delay = min(
+        config["RETRY_BASE_SECONDS"] * 2 ** (attempts - 1),
+        config["RETRY_MAX_SECONDS"],
+    )
+    return timedelta(seconds=delay / 2 + random.uniform(0, delay / 2))
+
+
+def claim(worker_name: str) -> Task | None:
+    """Take one due task, or None when nothing is due"""
+    now = timezone.now()
+    with transaction.atomic():
+        # lock only the row taken, rows locked by other workers are
+        # skipped on databases with SKIP LOCKED, the conditional update
+        # settles every other race
+        pk = (
+            Task.objects.select_for_update(skip_locked=True)
+            .filter(status=Task.QUEUED, run_after__lte=now)
+            .order_by("run_after", "id")
+            .values_list("id", flat=True)
+            .first()
+        )
+        if pk is None:
+            return None
+        claimed = Task.objects.filter(pk=pk, status=Task.QUEUED).update(
+            status=Task.RUNNING,
+            attempts=F("attempts") + 1,
+            locked_by=worker_name,
+            locked_at=now,
+        )
+        if claimed:
+            return Task.objects.get(pk=pk)
+    return None
+
+
+def execute(task: Task) -> bool:
+    """Run a claimed task and record the outcome, True on success"""
+    try:
+        get_task(task.name)(*task.args, **task.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        if task.attempts >= task.max_attempts:
+            outcome = {"status": Task.FAILED, "finished_at": timezone.now()}
+            logger.error("task %s failed for good:\n%s", task, error)
+        else:
+            outcome = {
+                "status": Task.QUEUED,
+                "run_after": timezone.now() + backoff(task.attempts),
+            }
+            logger.warning("task %s failed, retrying:\n%s", task, error)
+        Task.objects.filter(pk=task.pk, locked_by=task.locked_by).update(
+            last_error=error, locked_by="", locked_at=None, **outcome
+        )
+        return False
+
+    Task.objects.filter(pk=task.pk, locked_by=task.locked_by).update(
+        status=Task.DONE,
+        finished_at=timezone.now(),
+        locked_by="",
+        locked_at=None,
+    )
+    return True
+
+
+def requeue_stale() -> int:
+    """Hand tasks of workers that died mid-run back to the queue"""
+    cutoff = timezone.now() - timedelta(
+        seconds=settings.TASK_QUEUE["VISIBILITY_TIMEOUT"]
+    )
+    stale = Task.objects.filter(status=Task.RUNNING, locked_at__lt=cutoff)
+    stale.filter(attempts__gte=F("max_attempts")).update(
+        status=Task.FAILED,
+        finished_at=timezone.now(),
+        last_error="worker stopped responding",
+    )
+    return stale.update(status=Task.QUEUED, locked_by="", locked_at=None)
+
+
+class Worker:
+    """Pool of threads that claim and run queued tasks"""
+
+    def __init__(self, concurrency: int = 1, burst: bool = False) -> None:
+        self.concurrency = concurrency
+        self.burst = burst
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self.stopping = threading.Event()
+        self.processed = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+
+    def run(self) -> None:
+        requeue_stale()
+        threads = [
+            threading.Thread(
+                target=self._loop,
+                args=(f"{self.name}:{number}",),
+                name=f"task-worker-{number}",
+            )
+            for number in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+
+        checked = time.monotonic()
+        interval = settings.TASK_QUEUE["VISIBILITY_TIMEOUT"] / 2
+        try:
+            while any(thread.is_alive() for thread in threads):
+                time.sleep(settings.TASK_QUEUE["POLL_INTERVAL"])
+                if time.monotonic() - checked > interval:
+                    requeue_stale()
+                    checked = time.monotonic()
+        finally:
+            self.stop()
+            for thread in threads:
+                thread.join()
+            connection.close()
+
+    def stop(self) -> None:
+        self.stopping.set()
+
+    def _loop(self, worker_name: str) -> None:
+        config = settings.TASK_QUEUE
+        try:
+            while not self.stopping.is_set():
+                try:
+                    task = claim(worker_name)
+                except OperationalError:
+                    # e.g. a busy SQLite file, try again on the next poll
+                    logger.exception("claiming a task failed")
+                    task = None
+                if task is None:
+                    if self.burst:
+                        return
+                    self.stopping.wait(config["POLL_INTERVAL"])
+                    continue
+
+                succeeded = execute(task)
+                with self._lock:
+                    self.processed += 1
+                    self.failed += not succeeded
+        finally:
+            connection.close()
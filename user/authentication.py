@@ -0,0 +1,168 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import (
+    AuthenticationFailed,
+    InvalidToken,
+)
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken, Token
+
+from user.models import ClaimsUser
+
+
+PROFILE_ID_CLAIM = "profile_id"
+
+
+def profile_relation():
+    """The reverse one-to-one from users to their profile"""
+    return ClaimsUser.profile.related
+
+
+def claims_user(user_id, profile_id=None) -> ClaimsUser:
+    """User and profile with only their ids loaded, the rest deferred"""
+    # simplejwt stores the user id claim as a string
+    user_id = ClaimsUser._meta.pk.to_python(user_id)
+    user = ClaimsUser.from_db(None, ["id"], [user_id])
+    if profile_id is not None:
+        relation = profile_relation()
+        profile_model = relation.related_model
+        profile = profile_model.from_db(
+            None,
+            ["id", "user_id"],
+            [profile_model._meta.pk.to_python(profile_id), user_id],
+        )
+        relation.set_cached_value(user, profile)
+        relation.field.set_cached_value(profile, user)
+    return user
+
+
+class ClaimsRefreshToken(RefreshToken):
+    """Refresh token whose access tokens carry the profile id"""
+
+    @property
+    def access_token(self):
+        access = super().access_token
+        # looked up on every refresh so a profile created after login
+        # reaches the claims within one access token lifetime
+        profile_id = (
+            profile_relation().related_model.objects
+            .filter(user_id=self[api_settings.USER_ID_CLAIM])
+            .values_list("id", flat=True).first()
+        )
+        if profile_id is None:
+            access.payload.pop(PROFILE_ID_CLAIM, None)
+        else:
+            access[PROFILE_ID_CLAIM] = profile_id
+        return access
+
+
+# revocations are kept in a shared cache until the token would expire
+# anyway; lookups are remembered in-process for LOCAL_SECONDS
+
+_local: dict[str, tuple[float, object]] = {}
+_local_lock = threading.Lock()
+LOCAL_MAX_ENTRIES = 10000
+
+
+def _config() -> dict:
+    return settings.JWT_AUTH
+
+
+def _cache():
+    return caches[_config()["DENYLIST_CACHE_ALIAS"]]
+
+
+def _token_key(jti: str) -> str:
+    return f"jwt-denylist:token:{jti}"
+
+
+def _user_key(user_id) -> str:
+    return f"jwt-denylist:user:{user_id}"
+
+
+def _lookup(keys: list[str]) -> dict:
+    now = time.monotonic()
+    found, missing = {}, []
+    with _local_lock:
+        for key in keys:
+            entry = _local.get(key)
+            if entry is not None and entry[0] > now:
+                found[key] = entry[1]
+            else:
+                missing.append(key)
+    if missing:
+        fetched = _cache().get_many(missing)
+        expires = now + _config()["DENYLIST_LOCAL_SECONDS"]
+        with _local_lock:
+            if len(_local) > LOCAL_MAX_ENTRIES:
+                _local.clear()
+            for key in missing:
+                found[key] = fetched.get(key)
+                _local[key] = (expires, found[key])
+    return found
+
+
+def _forget(key: str) -> None:
+    with _local_lock:
+        _local.pop(key, None)
+
+
+def revoke_token(token: Token) -> None:
+    """Reject this token from now on"""
+    key = _token_key(token[api_settings.JTI_CLAIM])
+    _cache().set(key, True, max(int(token["exp"] - time.time()), 1))
+    _forget(key)
+
+
+def revoke_user(user_id) -> None:
+    """Reject every token issued to the user before now"""
+    key = _user_key(user_id)
+    _cache().set(
+        key,
+        int(time.time()),
+        int(api_settings.REFRESH_TOKEN_LIFETIME.total_seconds()),
+    )
+    _forget(key)
+
+
+def is_revoked(token: Token) -> bool:
+    if not _config()["DENYLIST"]:
+        return False
+    token_key = _token_key(token.get(api_settings.JTI_CLAIM))
+    user_key = _user_key(token.get(api_settings.USER_ID_CLAIM))
+    found = _lookup([token_key, user_key])
+    revoked_at = found[user_key]
+    return bool(found[token_key]) or (
+        revoked_at is not None and token.get("iat", 0) < revoked_at
+    )
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """JWT authentication that trusts the claims instead of loading the user
+
+    With ``JWT_AUTH["STATELESS"]`` the user is a ClaimsUser built from the
+    user id and profile id claims, so authenticating and reaching
+    ``request.user.profile`` costs no query until other fields are read.
+    Revoked tokens are rejected in both modes; as is_active is not read
+    per request, deactivated users have their tokens revoked.
+    """
+
+    def get_user(self, validated_token: Token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(
+                _("Token contained no recognizable user identification")
+            )
+        if is_revoked(validated_token):
+            raise AuthenticationFailed(
+                _("Token has been revoked"), code="token_revoked"
+            )
+        if not _config()["STATELESS"]:
+            return super().get_user(validated_token)
+        return claims_user(user_id, validated_token.get(PROFILE_ID_CLAIM))
@@ -0,0 +1,28 @@
+# Generated by Django 4.2 on 2026-10-18 19:15
+
+from django.db import migrations
+import user.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClaimsUser',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('user.user',),
+            managers=[
+                ('objects', user.models.UserManager()),
+            ],
+        ),
+    ]
@@ -44,3 +44,16 @@ class User(AbstractUser):
     REQUIRED_FIELDS = []
 
     objects = UserManager()
+
+
+class ClaimsUser(User):
+    """User built from the claims of a JWT, its row loaded on first use"""
+
+    class Meta:
+        proxy = True
+
+    def refresh_from_db(self, using=None, fields=None) -> None:
+        # the first field read beyond the claims loads all the others too
+        if fields is not None:
+            fields = list(set(fields) | self.get_deferred_fields())
+        super().refresh_from_db(using=using, fields=fields)
@@ -1,8 +1,17 @@
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from rest_framework import serializers
 from django.utils.text import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer,
+    TokenRefreshSerializer,
+)
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework_simplejwt.tokens import RefreshToken, TokenError
 
+from user.authentication import ClaimsRefreshToken, is_revoked, revoke_user
+
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -20,5 +29,42 @@ class UserSerializer(serializers.ModelSerializer):
         if password:
             user.set_password(password)
             user.save()
+            # sessions holding the old password's tokens end with it
+            transaction.on_commit(lambda: revoke_user(user.pk))
 
         return user
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = ClaimsRefreshToken
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = ClaimsRefreshToken
+
+    def validate(self, attrs):
+        if is_revoked(self.token_class(attrs["refresh"])):
+            raise AuthenticationFailed(
+                _("Token has been revoked"), code="token_revoked"
+            )
+        return super().validate(attrs)
+
+
+class RevokeTokenSerializer(serializers.Serializer):
+    refresh = serializers.CharField(required=False)
+    all = serializers.BooleanField(
+        default=False,
+        help_text="Revoke every token issued to the user so far",
+    )
+
+    def validate_refresh(self, value):
+        try:
+            token = RefreshToken(value)
+        except TokenError as error:
+            raise serializers.ValidationError(str(error))
+        user_id = token.get(api_settings.USER_ID_CLAIM)
+        if str(user_id) != str(self.context["request"].user.pk):
+            raise serializers.ValidationError(
+                _("Token belongs to another user")
+            )
+        return token
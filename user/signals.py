@@ -0,0 +1,22 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from user.authentication import revoke_user
+from user.models import ClaimsUser, User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=ClaimsUser)
+def revoke_inactive_user_tokens(sender, instance, **kwargs) -> None:
+    # stateless authentication does not read is_active on every request
+    if not instance.is_active:
+        transaction.on_commit(lambda: revoke_user(instance.pk))
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=ClaimsUser)
+def revoke_deleted_user_tokens(sender, instance, **kwargs) -> None:
+    # nor whether the user still exists; the pk is cleared after deletion
+    user_id = instance.pk
+    transaction.on_commit(lambda: revoke_user(user_id))
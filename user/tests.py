@@ -1,3 +1,57 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from user.authentication import is_revoked
+
+
+MANAGE_URL = reverse("user:manage")
+
+
+@override_settings(JWT_AUTH={
+    "STATELESS": True,
+    "DENYLIST": True,
+    "DENYLIST_CACHE_ALIAS": "default",
+    "DENYLIST_LOCAL_SECONDS": 0,
+})
+class UserTokenRevocationTests(TestCase):
+    def setUp(self) -> None:
+        caches["default"].clear()
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com"
+        )
+        self.token = AccessToken.for_user(self.user)
+        # revocations cover tokens issued before the second they happen
+        self.token.set_iat(at_time=timezone.now() - timedelta(seconds=5))
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token}")
+
+    def test_tokens_are_accepted_before_revocation(self) -> None:
+        self.assertFalse(is_revoked(self.token))
+
+    def test_deactivation_revokes_tokens(self) -> None:
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+
+        self.assertTrue(is_revoked(self.token))
+
+    def test_deletion_revokes_tokens(self) -> None:
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+
+        self.assertTrue(is_revoked(self.token))
+
+    def test_deleted_user_cannot_authenticate(self) -> None:
+        with self.captureOnCommitCallbacks(execute=True):
+            get_user_model().objects.filter(pk=self.user.pk).delete()
+
+        response = self.client.get(MANAGE_URL)
+
+        self.assertEqual(response.status_code, 401)
@@ -1,12 +1,11 @@
 from django.urls import path
-from rest_framework_simplejwt.views import (
-    TokenObtainPairView,
-    TokenRefreshView,
-)
 
 from user.views import (
+    ClaimsTokenObtainPairView,
+    ClaimsTokenRefreshView,
     CreateUserView,
     ManageUserView,
+    RevokeTokenView,
 )
 
 
@@ -14,7 +13,12 @@ app_name = "user"
 
 urlpatterns = [
     path("register/", CreateUserView.as_view(), name="create"),
-    path("token/", TokenObtainPairView.as_view(), name="token-obtain"),
-    path("token/refresh/", TokenRefreshView.as_view(), name="token-refresh"),
+    path("token/", ClaimsTokenObtainPairView.as_view(), name="token-obtain"),
+    path(
+        "token/refresh/",
+        ClaimsTokenRefreshView.as_view(),
+        name="token-refresh"
+    ),
+    path("token/revoke/", RevokeTokenView.as_view(), name="token-revoke"),
     path("me/", ManageUserView.as_view(), name="manage"),
 ]
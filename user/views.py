@@ -1,8 +1,22 @@
-from rest_framework import generics
+from rest_framework import generics, status
 from rest_framework.permissions import IsAuthenticated
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework.response import Response
+from rest_framework_simplejwt.views import (
+    TokenObtainPairView,
+    TokenRefreshView,
+)
 
-from user.serializers import UserSerializer
+from user.authentication import (
+    ClaimsJWTAuthentication,
+    revoke_token,
+    revoke_user,
+)
+from user.serializers import (
+    ClaimsTokenObtainPairSerializer,
+    ClaimsTokenRefreshSerializer,
+    RevokeTokenSerializer,
+    UserSerializer,
+)
 
 
 class CreateUserView(generics.CreateAPIView):
@@ -11,8 +25,35 @@ class CreateUserView(generics.CreateAPIView):
 
 class ManageUserView(generics.RetrieveUpdateAPIView):
     serializer_class = UserSerializer
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (ClaimsJWTAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     def get_object(self):
         return self.request.user
+
+
+class ClaimsTokenObtainPairView(TokenObtainPairView):
+    """Token pair whose access token also carries the profile id"""
+    serializer_class = ClaimsTokenObtainPairSerializer
+
+
+class ClaimsTokenRefreshView(TokenRefreshView):
+    serializer_class = ClaimsTokenRefreshSerializer
+
+
+class RevokeTokenView(generics.GenericAPIView):
+    """Revoke the access token sent, the given refresh token or all tokens"""
+    serializer_class = RevokeTokenSerializer
+    authentication_classes = (ClaimsJWTAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request) -> Response:
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        if serializer.validated_data["all"]:
+            revoke_user(request.user.pk)
+        else:
+            revoke_token(request.auth)
+            if "refresh" in serializer.validated_data:
+                revoke_token(serializer.validated_data["refresh"])
+        return Response(status=status.HTTP_204_NO_CONTENT)